@@ -0,0 +1,41 @@
+"""add_active_order_status_index
+
+Revision ID: 3b1e6f0c9d42
+Revises: a7ee2c7ab1f2
+Create Date: 2026-10-18 10:12:44.318027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '3b1e6f0c9d42'
+down_revision = 'a7ee2c7ab1f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Partial index of the orders that still need syncing (not SELL_FILLED/SELL_FAILED).
+    # Outside of the migration transaction: SELL_FAILED can't be used in the
+    # transaction that added it, and CONCURRENTLY doesn't lock the order table
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_order_active_status',
+            'order',
+            ['status'],
+            unique=False,
+            postgresql_where=sa.text("status NOT IN ('SELL_FILLED', 'SELL_FAILED')"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_order_active_status',
+            table_name='order',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,59 @@
+"""add_buy_failed_status
+
+Revision ID: 8d2f4b7e1c05
+Revises: 3b1e6f0c9d42
+Create Date: 2026-10-18 14:03:21.507113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2f4b7e1c05'
+down_revision = '3b1e6f0c9d42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Outside of the migration transaction: BUY_FAILED can't be used in the
+    # transaction that added it, and CONCURRENTLY doesn't lock the order table
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE virtualorderstatus ADD VALUE IF NOT EXISTS 'BUY_FAILED'")
+        # BUY_FAILED orders are done too, leave them out of the active order index
+        op.drop_index(
+            'ix_order_active_status',
+            table_name='order',
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_order_active_status',
+            'order',
+            ['status'],
+            unique=False,
+            postgresql_where=sa.text(
+                "status NOT IN ('SELL_FILLED', 'SELL_FAILED', 'BUY_FAILED')"
+            ),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    # Note: PostgreSQL doesn't support removing enum values directly, only the
+    # index goes back
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_order_active_status',
+            table_name='order',
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_order_active_status',
+            'order',
+            ['status'],
+            unique=False,
+            postgresql_where=sa.text("status NOT IN ('SELL_FILLED', 'SELL_FAILED')"),
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,26 @@
+"""add_order_status_changed_at
+
+Revision ID: c41a9e3d7b28
+Revises: 8d2f4b7e1c05
+Create Date: 2026-10-18 14:41:09.226350
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41a9e3d7b28'
+down_revision = '8d2f4b7e1c05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Left NULL for existing orders: only recent changes matter to the scheduler
+    op.add_column('order', sa.Column('status_changed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('order', 'status_changed_at')
@@ -1,13 +1,130 @@
+import hashlib
+from pathlib import Path
 from typing import Annotated
 
-from fastapi import Depends
+from fastapi import Depends, Request
+from sqlmodel import Session
+from starlette.requests import HTTPConnection
 
+from app.clients.live_price_hub import LivePriceHub
+from app.clients.live_price_relay import LivePriceRelay
+from app.clients.my_alpaca_async_client import MyAlpacaAsyncClient
 from app.clients.my_alpaca_client import MyAlpacaClient
+from app.clients.my_alpaca_client_pool import my_alpaca_client_pool
+from app.clients.rate_limiter import (
+    AlpacaRateLimiter,
+    LocalTokenBucket,
+    SharedTokenBucket,
+    TokenBucket,
+)
+from app.clients.stream_manager import AlpacaStreamManager
 from app.core.config.alpaca_settings import AlpacaSettings, alpaca_settings
+from app.core.db import engine
+from app.core.leader_election import LeaderElection
+from app.core.order_events import order_event_broker
+from app.trading.force_sell_scheduler import ForceSellScheduler
+from app.trading.sync_scheduler import OrderSyncScheduler
+
+
+def create_alpaca_rate_limiter(
+    settings: AlpacaSettings = alpaca_settings,
+) -> AlpacaRateLimiter:
+    bucket: TokenBucket
+    if settings.ALPACA_RATE_LIMIT_SHARED:
+        # Alpaca's budget is per account, so is the shared bucket file
+        key_hash = hashlib.sha256(settings.ALPACA_API_KEY.encode()).hexdigest()
+        bucket = SharedTokenBucket(
+            str(
+                Path(settings.ALPACA_RATE_LIMIT_SHARED_DIR)
+                / f"alpaca-rate-limit-{key_hash[:16]}"
+            ),
+            rate_per_minute=settings.ALPACA_RATE_LIMIT_PER_MINUTE,
+            capacity=settings.ALPACA_RATE_LIMIT_BURST,
+        )
+    else:
+        bucket = LocalTokenBucket(
+            rate_per_minute=settings.ALPACA_RATE_LIMIT_PER_MINUTE,
+            capacity=settings.ALPACA_RATE_LIMIT_BURST,
+        )
+    return AlpacaRateLimiter(bucket)
+
+
+alpaca_rate_limiter = create_alpaca_rate_limiter()
 
 
 def get_my_alpaca_client() -> MyAlpacaClient:
-    return MyAlpacaClient(alpaca_settings.credentials)
+    return my_alpaca_client_pool.get(
+        alpaca_settings.credentials,
+        clock_ttl_seconds=alpaca_settings.ALPACA_CLOCK_TTL_SECONDS,
+        quote_ttl_seconds=alpaca_settings.ALPACA_QUOTE_TTL_SECONDS,
+        http_pool_maxsize=alpaca_settings.ALPACA_HTTP_POOL_MAXSIZE,
+        rate_limiter=alpaca_rate_limiter,
+    )
+
+
+# Created and closed by the app lifespan (app/main.py), one per worker
+def create_my_alpaca_async_client() -> MyAlpacaAsyncClient:
+    return MyAlpacaAsyncClient(
+        alpaca_settings.credentials,
+        clock_ttl_seconds=alpaca_settings.ALPACA_CLOCK_TTL_SECONDS,
+        max_connections=alpaca_settings.ALPACA_ASYNC_MAX_CONNECTIONS,
+        max_keepalive_connections=alpaca_settings.ALPACA_HTTP_POOL_MAXSIZE,
+        rate_limiter=alpaca_rate_limiter,
+    )
+
+
+def get_my_alpaca_async_client(request: Request) -> MyAlpacaAsyncClient:
+    client: MyAlpacaAsyncClient = request.app.state.my_alpaca_async_client
+    return client
+
+
+# Created and closed by the app lifespan (app/main.py), one per worker
+def create_live_price_hub() -> LivePriceHub:
+    stream_manager = AlpacaStreamManager.from_client(get_my_alpaca_client())
+    if engine.dialect.name != "postgresql":
+        # A single process (SQLite), which streams itself
+        return LivePriceHub(stream_manager)
+    return LivePriceHub(LivePriceRelay(engine, stream_manager))
+
+
+# Run by the app lifespan (app/main.py), None when the hub streams itself
+def create_live_price_leader_election(hub: LivePriceHub) -> LeaderElection | None:
+    if not isinstance(hub.stream_manager, LivePriceRelay):
+        return None
+    return LeaderElection(engine, "live-prices", hub.stream_manager.lead)
+
+
+def get_live_price_hub(connection: HTTPConnection) -> LivePriceHub:
+    hub: LivePriceHub = connection.app.state.live_price_hub
+    return hub
+
+
+# Run by the app lifespan (app/main.py) in the elected worker only
+def create_order_sync_scheduler() -> OrderSyncScheduler:
+    alpaca_client = get_my_alpaca_client()
+    return OrderSyncScheduler(
+        lambda: Session(engine),
+        alpaca_client,
+        force_sells=ForceSellScheduler(
+            lambda: Session(engine), alpaca_client, order_events=order_event_broker
+        ),
+    )
+
+
+def get_order_sync_leader_election(request: Request) -> LeaderElection | None:
+    """None when ORDER_SYNC_SCHEDULER_ENABLED is off"""
+    election: LeaderElection | None = getattr(
+        request.app.state, "order_sync_leader_election", None
+    )
+    return election
+
+
+def get_order_sync_scheduler(request: Request) -> OrderSyncScheduler | None:
+    """None when ORDER_SYNC_SCHEDULER_ENABLED is off"""
+    scheduler: OrderSyncScheduler | None = getattr(
+        request.app.state, "order_sync_scheduler", None
+    )
+    return scheduler
 
 
 # We do not want any outside calls in test
@@ -22,5 +139,21 @@ def get_my_alpaca_client_test() -> MyAlpacaClient:
 
 
 AlpacaDep = Annotated[MyAlpacaClient, Depends(get_my_alpaca_client)]
+AsyncAlpacaDep = Annotated[MyAlpacaAsyncClient, Depends(get_my_alpaca_async_client)]
+LivePriceHubDep = Annotated[LivePriceHub, Depends(get_live_price_hub)]
 
-__all__ = ["AlpacaDep", "get_my_alpaca_client", "get_my_alpaca_client_test"]
+__all__ = [
+    "AlpacaDep",
+    "alpaca_rate_limiter",
+    "AsyncAlpacaDep",
+    "LivePriceHubDep",
+    "create_live_price_hub",
+    "create_my_alpaca_async_client",
+    "create_order_sync_scheduler",
+    "get_live_price_hub",
+    "get_my_alpaca_async_client",
+    "get_my_alpaca_client",
+    "get_my_alpaca_client_test",
+    "get_order_sync_leader_election",
+    "get_order_sync_scheduler",
+]
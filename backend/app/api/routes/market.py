@@ -1,15 +1,144 @@
-from fastapi import APIRouter
+import asyncio
+import json
+import logging
+from typing import Annotated, Any, Literal
 
-from app.api.deps.alpaca_dep import AlpacaDep
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from pydantic import BaseModel, Field, StringConstraints, ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from app.api.deps import SessionDep, get_current_user
+from app.api.deps.alpaca_dep import AsyncAlpacaDep, LivePriceHubDep
+from app.clients.live_price_hub import (
+    LIVE_PRICE_CHANNELS,
+    LivePriceClient,
+    LivePriceHub,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/market", tags=["market"])
 
+# Symbols one live price message may (un)subscribe per channel
+MAX_SYMBOLS_PER_MESSAGE = 100
+
+LivePriceSymbol = Annotated[
+    str,
+    StringConstraints(
+        strip_whitespace=True, to_upper=True, min_length=1, max_length=16
+    ),
+]
+
+
+class LivePriceMessage(BaseModel):
+    action: Literal["subscribe", "unsubscribe"]
+    bars: list[LivePriceSymbol] = Field(
+        default_factory=list, max_length=MAX_SYMBOLS_PER_MESSAGE
+    )
+    quotes: list[LivePriceSymbol] = Field(
+        default_factory=list, max_length=MAX_SYMBOLS_PER_MESSAGE
+    )
+
 
 @router.get("/next_close_date")
-def next_close_date(alpaca_client: AlpacaDep) -> dict[str, str]:
-    return {"date": alpaca_client.get_next_close().date().isoformat()}
+async def next_close_date(alpaca_client: AsyncAlpacaDep) -> dict[str, str]:
+    next_close = await alpaca_client.get_next_close()
+    return {"date": next_close.date().isoformat()}
 
 
 @router.get("/is_next_close_today")
-def is_next_close_today(alpaca_client: AlpacaDep) -> bool:
-    return alpaca_client.is_next_close_today()
+async def is_next_close_today(alpaca_client: AsyncAlpacaDep) -> bool:
+    return await alpaca_client.is_next_close_today()
+
+
+@router.get("/bars/{symbol}")
+def recent_bars(
+    symbol: str, hub: LivePriceHubDep, limit: int = Query(100, ge=1, le=1000)
+) -> list[dict[str, Any]]:
+    """The last `limit` 1-minute bars of `symbol` kept by this worker, oldest
+    first. Only symbols a live price client subscribed to here have any."""
+    window = hub.bar_store.window(symbol.upper(), limit)
+    return [
+        {
+            "timestamp": f"{timestamp}Z",
+            "open": float(open_),
+            "high": float(high),
+            "low": float(low),
+            "close": float(close),
+            "volume": float(volume),
+        }
+        for timestamp, open_, high, low, close, volume in zip(
+            window.timestamp.astype("datetime64[s]"), *window[1:], strict=True
+        )
+    ]
+
+
+def _error_message(message: str) -> str:
+    return json.dumps({"type": "error", "message": message})
+
+
+async def _handle_live_price_message(
+    hub: LivePriceHub, client: LivePriceClient, text: str
+) -> None:
+    try:
+        message = LivePriceMessage.model_validate_json(text)
+    except ValidationError as error:
+        # Field locations and messages only, not the (client supplied) input
+        details = "; ".join(
+            f"{'.'.join(map(str, e['loc'])) or 'message'}: {e['msg']}"
+            for e in error.errors(include_url=False, include_input=False)
+        )
+        client.put(_error_message(f"invalid message ({details})"))
+        return
+    for channel in LIVE_PRICE_CHANNELS:
+        symbols = getattr(message, channel)
+        if message.action == "subscribe":
+            await hub.subscribe(client, channel, symbols)
+        else:
+            await hub.unsubscribe(client, channel, symbols)
+    client.put(client.subscription_message())
+
+
+@router.websocket("/ws")
+async def live_prices(
+    websocket: WebSocket, token: str, session: SessionDep, hub: LivePriceHubDep
+) -> None:
+    """Live bars and quotes. Browsers can't set headers on websockets, so the
+    access token is the `token` query parameter. Send
+    {"action": "subscribe", "bars": [...], "quotes": [...]} (or "unsubscribe",
+    at most MAX_SYMBOLS_PER_MESSAGE symbols each);
+    messages are {"type": "bar" | "quote" | "subscription" | "error", ...}."""
+    try:
+        await run_in_threadpool(get_current_user, session, token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    # Nothing else is read from the database, don't hold a connection meanwhile
+    await run_in_threadpool(session.close)
+
+    await websocket.accept()
+    client = LivePriceClient()
+
+    async def send() -> None:
+        while True:
+            await websocket.send_text(await client.queue.get())
+
+    sender = asyncio.create_task(send())
+    try:
+        while True:
+            text = await websocket.receive_text()
+            await _handle_live_price_message(hub, client, text)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        await hub.disconnect(client)
+        if client.dropped:
+            logger.info("Live price client dropped %d messages", client.dropped)
@@ -1,18 +1,45 @@
+import asyncio
 import logging
-from collections.abc import Sequence
+from collections.abc import AsyncIterator, Sequence
+from uuid import UUID
 
 from fastapi import APIRouter, HTTPException
-from sqlmodel import select
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
 
 from app.api.deps import CurrentUser, SessionDep
-from app.api.deps.alpaca_dep import AlpacaDep
+from app.api.deps.alpaca_dep import AlpacaDep, AsyncAlpacaDep
+from app.clients.my_alpaca_client import AlpacaOrder, MyAlpacaClient
+from app.core.order_events import order_event_broker
 from app.crud.order_crud import OrderCrud
-from app.models.order import Order, OrderCreate, OrderPublic
+from app.models.order import Order, OrderCreate, OrderPublic, OrdersSyncSummary
+from app.trading.order_sync import OrderBulkSync
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
+# Comment lines keep idle event streams from being closed by proxies
+EVENTS_KEEPALIVE_SECONDS = 15.0
+
+
+def _sync_and_apply_sell_rules(
+    session: Session,
+    order: Order,
+    alpaca_client: MyAlpacaClient,
+    alpaca_orders: dict[UUID, AlpacaOrder] | None = None,
+) -> None:
+    OrderCrud.sync_order_status(
+        order=order, alpaca_client=alpaca_client, alpaca_orders=alpaca_orders
+    )
+    OrderCrud.apply_sell_rules(order=order, alpaca_client=alpaca_client)
+    # One commit for both steps; a sell they placed is found again by its client
+    # order id if this commit is lost (see OrderCrud.sell_client_order_id)
+    session.commit()
+    # Reloaded here, in the threadpool, rather than by the response serialization
+    session.refresh(order)
+
 
 @router.post("/", response_model=OrderPublic)
 def create_order(
@@ -38,6 +65,35 @@ def list_orders(session: SessionDep, current_user: CurrentUser) -> Sequence[Orde
     return orders
 
 
+@router.get(
+    "/events",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def order_events(current_user: CurrentUser) -> StreamingResponse:
+    """Server-sent events: an "order" event with the OrderPublic of each of the
+    user's orders whenever it changes status"""
+
+    async def stream() -> AsyncIterator[str]:
+        async with order_event_broker.subscribe(current_user.id) as queue:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        queue.get(), EVENTS_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: order\ndata: {message}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post(
     "/{id}/sync",
     responses={
@@ -48,20 +104,28 @@ def list_orders(session: SessionDep, current_user: CurrentUser) -> Sequence[Orde
     },
     response_model=OrderPublic,
 )
-def sync_order(
-    id: int, session: SessionDep, alpaca_client: AlpacaDep, current_user: CurrentUser
+async def sync_order(
+    id: int,
+    session: SessionDep,
+    alpaca_client: AlpacaDep,
+    async_alpaca_client: AsyncAlpacaDep,
+    current_user: CurrentUser,
 ) -> Order:
-    order = session.get(Order, id)
+    order = await run_in_threadpool(session.get, Order, id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     if order.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to sync this order")
-    OrderCrud.sync_order_status(order=order, alpaca_client=alpaca_client)
-    session.commit()
-    session.refresh(order)
-    OrderCrud.apply_sell_rules(order=order, alpaca_client=alpaca_client)
-    session.commit()
-    session.refresh(order)
+    # Buy and sell orders are fetched concurrently without holding a worker thread
+    alpaca_order_ids = [
+        alpaca_order_id
+        for alpaca_order_id in (order.alpaca_buy_order_id, order.alpaca_sell_order_id)
+        if alpaca_order_id
+    ]
+    alpaca_orders = await async_alpaca_client.get_orders_by_ids(alpaca_order_ids)
+    await run_in_threadpool(
+        _sync_and_apply_sell_rules, session, order, alpaca_client, alpaca_orders
+    )
     return order
 
 
@@ -88,20 +152,16 @@ def delete_order(id: int, session: SessionDep, current_user: CurrentUser) -> Non
     session.commit()
 
 
-@router.post("/sync")
-def sync_orders(session: SessionDep, alpaca_client: AlpacaDep) -> dict[str, str]:
-    logger.info("Syncing orders")
-    statement = select(Order)
-    results = session.exec(statement)
-    orders = results.all()
-    total_orders = len(orders)
-
-    logger.info("Total orders: %d", total_orders)
-    for order in orders:
-        OrderCrud.sync_order_status(order=order, alpaca_client=alpaca_client)
-        session.commit()
-        session.refresh(order)
-        OrderCrud.apply_sell_rules(order=order, alpaca_client=alpaca_client)
-        session.commit()
-        session.refresh(order)
-    return {"result": "success"}
+@router.post("/sync", response_model=OrdersSyncSummary)
+def sync_orders(session: SessionDep, alpaca_client: AlpacaDep) -> OrdersSyncSummary:
+    logger.info("Syncing active orders")
+    pages = OrderCrud.active_order_pages(session)
+    summary = OrderBulkSync(session, alpaca_client).run_pages(pages)
+    logger.info(
+        "Synced %d of %d active orders, %d failed, in %.2fs",
+        summary.synced,
+        summary.total,
+        summary.failed,
+        summary.duration_seconds,
+    )
+    return summary
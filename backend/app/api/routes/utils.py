@@ -2,7 +2,16 @@ from fastapi import APIRouter, Depends
 from pydantic.networks import EmailStr
 
 from app.api.deps import get_current_active_superuser
+from app.api.deps.alpaca_dep import (
+    alpaca_rate_limiter,
+    get_order_sync_leader_election,
+    get_order_sync_scheduler,
+)
+from app.clients.my_alpaca_client_pool import PoolStats, my_alpaca_client_pool
+from app.clients.rate_limiter import LaneStats
+from app.core.leader_election import LeaderElection, LeaderStatus
 from app.models.message import Message
+from app.trading.sync_scheduler import OrderSyncScheduler, SyncSchedulerStats
 from app.utils import generate_test_email, send_email
 
 router = APIRouter(prefix="/utils", tags=["utils"])
@@ -26,6 +35,56 @@ def test_email(email_to: EmailStr) -> Message:
     return Message(message="Test email sent")
 
 
+@router.get(
+    "/alpaca-pool-stats/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def alpaca_pool_stats() -> PoolStats:
+    """
+    Alpaca client reuse and keep-alive connection reuse for this worker.
+    """
+    return my_alpaca_client_pool.stats()
+
+
+@router.get(
+    "/alpaca-rate-limit-stats/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def alpaca_rate_limit_stats() -> dict[str, LaneStats]:
+    """
+    Queue depth and wait times of the Alpaca rate limiter lanes in this worker.
+    """
+    return alpaca_rate_limiter.stats()
+
+
+@router.get(
+    "/order-sync-stats/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def order_sync_stats(
+    scheduler: OrderSyncScheduler | None = Depends(get_order_sync_scheduler),
+) -> SyncSchedulerStats | None:
+    """
+    Duration and lag of the background order sync cycles of this worker (only
+    the leader runs them), null when the scheduler is disabled.
+    """
+    return scheduler.stats() if scheduler else None
+
+
+@router.get(
+    "/order-sync-leader/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def order_sync_leader(
+    election: LeaderElection | None = Depends(get_order_sync_leader_election),
+) -> LeaderStatus | None:
+    """
+    Which process runs the order sync, and the recent hand-offs seen by this
+    worker; null when the scheduler is disabled.
+    """
+    return election.status() if election else None
+
+
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
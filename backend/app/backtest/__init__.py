@@ -0,0 +1,20 @@
+from .engine import (
+    BacktestConfig,
+    BacktestResult,
+    Sessions,
+    build_sessions,
+    load_sessions,
+    run_backtest,
+)
+from .sweep import run_sweep, sweep_grid
+
+__all__ = [
+    "BacktestConfig",
+    "BacktestResult",
+    "Sessions",
+    "build_sessions",
+    "load_sessions",
+    "run_backtest",
+    "run_sweep",
+    "sweep_grid",
+]
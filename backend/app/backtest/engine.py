@@ -0,0 +1,283 @@
+import time as time_module
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Any, NamedTuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import numpy.typing as npt
+
+from app.market_data.bar_store import BarWindow, to_datetime64
+from app.market_data.minute_bar_store import MinuteBarStore
+from app.models.order import (
+    FORCE_SELL_BEFORE_CLOSE,
+    STOP_LOSS_RATIO,
+    TARGET_PROFIT_RATIO,
+)
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+# Exit reasons, in the priority a bar is checked for them
+EXIT_STOP_LOSS = "stop_loss"
+EXIT_TARGET_PROFIT = "target_profit"
+EXIT_FORCE_SELL = "force_sell"
+EXIT_END_OF_DATA = "end_of_data"
+
+
+@dataclass
+class BacktestConfig:
+    """The sell rules of Order.buy_filled and how the simulated buys happen.
+
+    One market buy of `amount` dollars per symbol and day, at the open of the
+    first bar at or after `entry_time` (New York time). Early closes are not
+    known, every session is taken to close at `market_close`.
+    """
+
+    target_profit_ratio: float = TARGET_PROFIT_RATIO
+    stop_loss_ratio: float = STOP_LOSS_RATIO
+    force_sell_before_close: timedelta = FORCE_SELL_BEFORE_CLOSE
+    entry_time: time = time(9, 30)
+    market_close: time = time(16, 0)
+    amount: float = 1000.0
+
+
+class Sessions(NamedTuple):
+    """The minute bars of many symbol-days as (symbol-days, minutes) matrices,
+    from the entry bar on, right-padded with NaN/NaT"""
+
+    symbol: npt.NDArray[np.str_]
+    day: npt.NDArray[np.datetime64]
+    market_close: npt.NDArray[np.datetime64]
+    timestamp: npt.NDArray[np.datetime64]
+    open: npt.NDArray[np.float64]
+    high: npt.NDArray[np.float64]
+    low: npt.NDArray[np.float64]
+    close: npt.NDArray[np.float64]
+    length: npt.NDArray[np.int64]
+
+
+def _session_times(day: date, config: BacktestConfig) -> tuple[datetime, datetime]:
+    return (
+        datetime.combine(day, config.entry_time, tzinfo=NEW_YORK),
+        datetime.combine(day, config.market_close, tzinfo=NEW_YORK),
+    )
+
+
+def build_sessions(
+    windows: Mapping[tuple[str, date], BarWindow], config: BacktestConfig
+) -> Sessions:
+    """Sessions from the bars of each (symbol, New York trading day). Bars before
+    the entry time or after the close are dropped, days without bars skipped"""
+    rows: list[tuple[str, date, np.datetime64, BarWindow]] = []
+    for (symbol, day), window in windows.items():
+        entry_at, close_at = (
+            to_datetime64(value) for value in _session_times(day, config)
+        )
+        timestamps = window.timestamp.astype("datetime64[ns]")
+        selected = (timestamps >= entry_at) & (timestamps < close_at)
+        if selected.any():
+            rows.append(
+                (
+                    symbol,
+                    day,
+                    close_at,
+                    BarWindow._make(column[selected] for column in window),
+                )
+            )
+
+    # At least one column, so an empty backtest needs no special cases
+    width = max((len(window.timestamp) for *_, window in rows), default=1)
+    timestamp = np.full((len(rows), width), np.datetime64("NaT"), "datetime64[ns]")
+    prices = np.full((4, len(rows), width), np.nan)
+    length = np.zeros(len(rows), dtype=np.int64)
+    for i, (*_, window) in enumerate(rows):
+        n = len(window.timestamp)
+        length[i] = n
+        timestamp[i, :n] = window.timestamp
+        prices[:, i, :n] = (window.open, window.high, window.low, window.close)
+    return Sessions(
+        np.array([symbol for symbol, *_ in rows], dtype=np.str_),
+        np.array([day for _, day, *_ in rows], dtype="datetime64[D]"),
+        np.array([close_at for *_, close_at, _ in rows], dtype="datetime64[ns]"),
+        timestamp,
+        prices[0],
+        prices[1],
+        prices[2],
+        prices[3],
+        length,
+    )
+
+
+def load_sessions(
+    store: MinuteBarStore,
+    symbols: Iterable[str],
+    start: date,
+    end: date,
+    config: BacktestConfig,
+) -> Sessions:
+    """Sessions of the days in [start, end] that the store has bars for. New York
+    sessions never cross a UTC day, so each is within one stored day"""
+    windows = {
+        (symbol, day): store.read_day(symbol, day)
+        for symbol in symbols
+        for day in store.days(symbol)
+        if start <= day <= end
+    }
+    return build_sessions(windows, config)
+
+
+def _first(mask: npt.NDArray[np.bool_]) -> npt.NDArray[np.int64]:
+    """Column of the first True of each row, the row width where there is none"""
+    return np.where(mask.any(axis=1), mask.argmax(axis=1), mask.shape[1])
+
+
+def _to_list(column: npt.NDArray[Any]) -> list[Any]:
+    if column.dtype == np.dtype("datetime64[ns]"):
+        # Nanoseconds come out as ints, microseconds as (naive UTC) datetimes
+        column = column.astype("datetime64[us]")
+    return list(column.tolist())
+
+
+@dataclass
+class BacktestResult:
+    """One trade per session, as columns"""
+
+    symbol: npt.NDArray[np.str_]
+    day: npt.NDArray[np.datetime64]
+    entry_time: npt.NDArray[np.datetime64]
+    entry_price: npt.NDArray[np.float64]
+    exit_time: npt.NDArray[np.datetime64]
+    exit_price: npt.NDArray[np.float64]
+    exit_reason: npt.NDArray[np.str_]
+    quantity: npt.NDArray[np.float64]
+    pnl: npt.NDArray[np.float64]
+    elapsed_seconds: float
+
+    @property
+    def returns(self) -> npt.NDArray[np.float64]:
+        return self.exit_price / self.entry_price - 1
+
+    def trades(self) -> list[dict[str, Any]]:
+        columns = (
+            "symbol",
+            "day",
+            "entry_time",
+            "entry_price",
+            "exit_time",
+            "exit_price",
+            "exit_reason",
+            "quantity",
+            "pnl",
+        )
+        return [
+            dict(zip(columns, row, strict=True))
+            for row in zip(
+                *(_to_list(getattr(self, column)) for column in columns),
+                strict=True,
+            )
+        ]
+
+    def stats(self) -> dict[str, Any]:
+        count = len(self.pnl)
+        reasons, reason_counts = np.unique(self.exit_reason, return_counts=True)
+        equity = np.cumsum(self.pnl[np.argsort(self.exit_time, kind="stable")])
+        drawdown = np.maximum.accumulate(np.r_[0.0, equity])[1:] - equity
+        return {
+            "trades": count,
+            "win_rate": float((self.pnl > 0).mean()) if count else 0.0,
+            "total_pnl": float(self.pnl.sum()),
+            "average_return": float(self.returns.mean()) if count else 0.0,
+            "max_drawdown": float(drawdown.max()) if count else 0.0,
+            "exit_reasons": dict(
+                zip(reasons.tolist(), reason_counts.tolist(), strict=True)
+            ),
+            "symbol_days_per_second": (
+                count / self.elapsed_seconds if self.elapsed_seconds else 0.0
+            ),
+        }
+
+
+def run_backtest(sessions: Sessions, config: BacktestConfig) -> BacktestResult:
+    """Replay the Order.buy_filled sell rules over every session at once.
+
+    Like SellRuleEvaluator live, a bar whose high reaches the target or whose
+    low reaches the stop sells; the fill is the threshold, or the bar's open
+    when it gapped through it. When a bar reaches both, the stop is assumed to
+    have come first. From the first bar at or after force_sell_at the position
+    is sold at that bar's open. A session whose data ends before any of that
+    exits at its last close.
+    """
+    started = time_module.perf_counter()
+    rows = np.arange(len(sessions.symbol))
+    width = sessions.timestamp.shape[1]
+    columns = np.arange(width)
+
+    entry_price = sessions.open[:, 0]
+    target = entry_price * config.target_profit_ratio
+    stop = entry_price * config.stop_loss_ratio
+    force_sell_at = sessions.market_close - np.timedelta64(
+        config.force_sell_before_close
+    ).astype("timedelta64[ns]")
+
+    force_index = _first(sessions.timestamp >= force_sell_at[:, None])
+    before_force = columns < force_index[:, None]
+    target_index = _first((sessions.high >= target[:, None]) & before_force)
+    stop_index = _first((sessions.low <= stop[:, None]) & before_force)
+    last_index = sessions.length - 1
+
+    exit_index = np.minimum.reduce([target_index, stop_index, force_index])
+    reason = np.select(
+        [
+            stop_index == exit_index,
+            target_index == exit_index,
+            force_index == exit_index,
+        ],
+        [EXIT_STOP_LOSS, EXIT_TARGET_PROFIT, EXIT_FORCE_SELL],
+        EXIT_END_OF_DATA,
+    )
+    ended = exit_index >= width
+    exit_index = np.where(ended, last_index, exit_index)
+    reason = np.where(ended, EXIT_END_OF_DATA, reason)
+
+    exit_open = sessions.open[rows, exit_index]
+    exit_price = np.select(
+        [
+            reason == EXIT_STOP_LOSS,
+            reason == EXIT_TARGET_PROFIT,
+            reason == EXIT_FORCE_SELL,
+        ],
+        [
+            np.minimum(exit_open, stop),
+            np.maximum(exit_open, target),
+            exit_open,
+        ],
+        sessions.close[rows, last_index],
+    )
+    quantity = config.amount / entry_price
+    return BacktestResult(
+        symbol=sessions.symbol,
+        day=sessions.day,
+        entry_time=sessions.timestamp[:, 0],
+        entry_price=entry_price,
+        exit_time=sessions.timestamp[rows, exit_index],
+        exit_price=exit_price,
+        exit_reason=reason.astype(np.str_),
+        quantity=quantity,
+        pnl=quantity * (exit_price - entry_price),
+        elapsed_seconds=time_module.perf_counter() - started,
+    )
+
+
+__all__ = [
+    "EXIT_END_OF_DATA",
+    "EXIT_FORCE_SELL",
+    "EXIT_STOP_LOSS",
+    "EXIT_TARGET_PROFIT",
+    "BacktestConfig",
+    "BacktestResult",
+    "Sessions",
+    "build_sessions",
+    "load_sessions",
+    "run_backtest",
+]
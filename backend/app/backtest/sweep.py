@@ -0,0 +1,151 @@
+import itertools
+import logging
+import os
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import replace
+from datetime import timedelta
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+
+from app.backtest.engine import BacktestConfig, Sessions, run_backtest
+
+logger = logging.getLogger(__name__)
+
+# (shared memory block name, shape, dtype) of each Sessions column
+SharedSpec = list[tuple[str, tuple[int, ...], str]]
+
+# Sessions attached by a worker process (see _init_worker)
+_worker_sessions: Sessions | None = None
+_worker_blocks: list[SharedMemory] = []
+
+
+def sweep_grid(
+    target_profit_ratios: Iterable[float],
+    stop_loss_ratios: Iterable[float],
+    force_sell_offsets: Iterable[timedelta],
+    base: BacktestConfig | None = None,
+) -> list[BacktestConfig]:
+    """Every combination of the given rule settings"""
+    base = base or BacktestConfig()
+    return [
+        replace(
+            base,
+            target_profit_ratio=target,
+            stop_loss_ratio=stop,
+            force_sell_before_close=offset,
+        )
+        for target, stop, offset in itertools.product(
+            target_profit_ratios, stop_loss_ratios, force_sell_offsets
+        )
+    ]
+
+
+@contextmanager
+def shared_sessions(sessions: Sessions) -> Iterator[SharedSpec]:
+    """Copies the session matrices into shared memory once, for the lifetime of
+    the context; workers map the same pages instead of unpickling a copy each"""
+    blocks: list[SharedMemory] = []
+    spec: SharedSpec = []
+    try:
+        for column in sessions:
+            block = SharedMemory(create=True, size=max(column.nbytes, 1))
+            blocks.append(block)
+            np.ndarray(column.shape, column.dtype, buffer=block.buf)[...] = column
+            spec.append((block.name, column.shape, column.dtype.str))
+        yield spec
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def attach_sessions(spec: SharedSpec) -> tuple[Sessions, list[SharedMemory]]:
+    """Read-only Sessions views of shared memory blocks (keep the blocks
+    referenced while the views are in use)"""
+    blocks = [SharedMemory(name=name) for name, _, _ in spec]
+    columns = []
+    for block, (_, shape, dtype) in zip(blocks, spec, strict=True):
+        column: np.ndarray[Any, Any] = np.ndarray(shape, dtype, buffer=block.buf)
+        column.flags.writeable = False
+        columns.append(column)
+    return Sessions._make(columns), blocks
+
+
+def _init_worker(spec: SharedSpec) -> None:
+    global _worker_sessions, _worker_blocks
+    _worker_sessions, _worker_blocks = attach_sessions(spec)
+
+
+def _run_configs(configs: list[BacktestConfig]) -> list[dict[str, Any]]:
+    assert _worker_sessions is not None
+    return [_summary(_worker_sessions, config) for config in configs]
+
+
+def _summary(sessions: Sessions, config: BacktestConfig) -> dict[str, Any]:
+    stats = run_backtest(sessions, config).stats()
+    # Throughput is reported for the whole sweep instead
+    del stats["symbol_days_per_second"]
+    return {
+        "target_profit_ratio": config.target_profit_ratio,
+        "stop_loss_ratio": config.stop_loss_ratio,
+        "force_sell_minutes": config.force_sell_before_close.total_seconds() / 60,
+        **stats,
+    }
+
+
+def _chunks(configs: list[BacktestConfig], size: int) -> list[list[BacktestConfig]]:
+    return [configs[i : i + size] for i in range(0, len(configs), size)]
+
+
+def run_sweep(
+    sessions: Sessions,
+    configs: list[BacktestConfig],
+    workers: int | None = None,
+    rank_by: str = "total_pnl",
+) -> list[dict[str, Any]]:
+    """Backtest every config over the same sessions on a process pool, returns a
+    row of settings and stats per config, best `rank_by` first.
+
+    The sessions are shared, not copied, with the workers; each task is a
+    chunk of configs so the per-task overhead stays small next to the
+    backtests. `workers=1` runs in this process.
+    """
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    if workers == 1:
+        rows = [_summary(sessions, config) for config in configs]
+    else:
+        # A few chunks per worker evens out uneven chunk runtimes
+        chunk_size = max(1, len(configs) // (workers * 4))
+        with shared_sessions(sessions) as spec:
+            with ProcessPoolExecutor(
+                workers, initializer=_init_worker, initargs=(spec,)
+            ) as executor:
+                rows = [
+                    row
+                    for chunk_rows in executor.map(
+                        _run_configs, _chunks(configs, chunk_size)
+                    )
+                    for row in chunk_rows
+                ]
+    logger.info(
+        "Swept %d configs over %d symbol-days with %d workers in %.2fs",
+        len(configs),
+        len(sessions.symbol),
+        workers,
+        time.perf_counter() - started,
+    )
+    return sorted(rows, key=lambda row: row[rank_by], reverse=True)
+
+
+__all__ = [
+    "attach_sessions",
+    "run_sweep",
+    "shared_sessions",
+    "sweep_grid",
+]
@@ -0,0 +1,39 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from app.backtest.engine import NEW_YORK
+from app.market_data.bar_store import BarWindow, to_datetime64
+
+
+def synthetic_windows(
+    symbols: list[str], start: date, days: int
+) -> dict[tuple[str, date], BarWindow]:
+    """Random walk sessions (9:30-16:00 New York) of every weekday"""
+    rng = np.random.default_rng(0)
+    windows = {}
+    trading_days = [
+        day
+        for day in (start + timedelta(days=i) for i in range(days * 7 // 5 + 7))
+        if day.weekday() < 5
+    ][:days]
+    for day in trading_days:
+        session_open = to_datetime64(
+            datetime(day.year, day.month, day.day, 9, 30, tzinfo=NEW_YORK)
+        )
+        timestamps = session_open + np.arange(390) * np.timedelta64(1, "m")
+        for symbol in symbols:
+            close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, 390)))
+            spread = rng.uniform(0.0, 0.002, 390) * close
+            windows[(symbol, day)] = BarWindow(
+                timestamps,
+                np.r_[100.0, close[:-1]],
+                close + spread,
+                close - spread,
+                close,
+                np.full(390, 1000.0),
+            )
+    return windows
+
+
+__all__ = ["synthetic_windows"]
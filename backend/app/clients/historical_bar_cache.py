@@ -0,0 +1,177 @@
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from alpaca.data.models.bars import Bar as AlpacaBar
+from alpaca.data.timeframe import TimeFrame, TimeFrameUnit
+
+FetchBars = Callable[[str, TimeFrame, datetime, datetime], list[AlpacaBar]]
+
+# Series kept in memory, the least recently used ones are dropped beyond this
+DEFAULT_MAX_SERIES = 256
+
+_UNIT_DURATION = {
+    TimeFrameUnit.Minute: timedelta(minutes=1),
+    TimeFrameUnit.Hour: timedelta(hours=1),
+    TimeFrameUnit.Day: timedelta(days=1),
+    TimeFrameUnit.Week: timedelta(weeks=1),
+    # Longest month, a bar is only final once this much time has passed
+    TimeFrameUnit.Month: timedelta(days=31),
+}
+
+
+def _utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _missing_ranges(
+    covered: list[tuple[datetime, datetime]], start: datetime, end: datetime
+) -> list[tuple[datetime, datetime]]:
+    missing = []
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            missing.append((cursor, covered_start))
+        cursor = covered_end
+        if cursor >= end:
+            break
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+@dataclass
+class _Series:
+    """Bars of one (symbol, timeframe), sorted by timestamp, and the time
+    ranges that are known to be complete"""
+
+    timestamps: list[datetime] = field(default_factory=list)
+    bars: list[AlpacaBar] = field(default_factory=list)
+    covered: list[tuple[datetime, datetime]] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def merge(self, start: datetime, end: datetime, bars: list[AlpacaBar]) -> None:
+        # The fetched bars are everything in [start, end): they replace what
+        # was stored there (unfinished bars from an earlier fetch)
+        lo = bisect_left(self.timestamps, start)
+        hi = bisect_left(self.timestamps, end)
+        self.bars[lo:hi] = bars
+        self.timestamps[lo:hi] = [_utc(bar.timestamp) for bar in bars]
+
+    def cover(self, start: datetime, end: datetime) -> None:
+        insort(self.covered, (start, end))
+        merged = [self.covered[0]]
+        for covered_start, covered_end in self.covered[1:]:
+            last_start, last_end = merged[-1]
+            if covered_start <= last_end:
+                merged[-1] = (last_start, max(last_end, covered_end))
+            else:
+                merged.append((covered_start, covered_end))
+        self.covered = merged
+
+    def slice(self, start: datetime, end: datetime) -> list[AlpacaBar]:
+        lo = bisect_left(self.timestamps, start)
+        hi = bisect_left(self.timestamps, end)
+        return self.bars[lo:hi]
+
+
+class HistoricalBarCache:
+    """In-memory cache of historical bars per (symbol, timeframe).
+
+    A request for [start, end) is served from the bars already downloaded and
+    only the sub-ranges never fetched before are requested, then merged in.
+    Ranges reaching into the last, still forming bar are not marked as complete,
+    so that tail is fetched again next time.
+
+    At most `max_series` (symbol, timeframe) series are kept, the least recently
+    used one is dropped to make room for a new one.
+    """
+
+    def __init__(
+        self,
+        fetch_bars: FetchBars,
+        now: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+        max_series: int = DEFAULT_MAX_SERIES,
+    ):
+        self._fetch_bars = fetch_bars
+        self._now = now
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self._series: OrderedDict[tuple[str, str], _Series] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.bars_fetched = 0
+
+    def _get_series(self, symbol: str, timeframe: TimeFrame) -> _Series:
+        key = (symbol, timeframe.value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+                while len(self._series) > self.max_series:
+                    self._series.popitem(last=False)
+            else:
+                self._series.move_to_end(key)
+            return series
+
+    def get(
+        self, symbol: str, timeframe: TimeFrame, start: datetime, end: datetime
+    ) -> list[AlpacaBar]:
+        """Bars with start <= timestamp < end, oldest first"""
+        start, end = _utc(start), _utc(end)
+        series = self._get_series(symbol, timeframe)
+        # Bars starting after this may still change
+        complete_until = (
+            self._now() - timeframe.amount_value * _UNIT_DURATION[timeframe.unit_value]
+        )
+
+        # Held while fetching, so concurrent callers of the same series wait
+        # for the download instead of repeating it
+        with series.lock:
+            missing = _missing_ranges(series.covered, start, end)
+            for missing_start, missing_end in missing:
+                bars = self._fetch_bars(symbol, timeframe, missing_start, missing_end)
+                bars = [
+                    bar
+                    for bar in bars
+                    if missing_start <= _utc(bar.timestamp) < missing_end
+                ]
+                series.merge(missing_start, missing_end, bars)
+                if min(missing_end, complete_until) > missing_start:
+                    series.cover(missing_start, min(missing_end, complete_until))
+                with self._lock:
+                    self.fetches += 1
+                    self.bars_fetched += len(bars)
+            result = series.slice(start, end)
+
+        with self._lock:
+            if missing:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "fetches": self.fetches,
+            "bars_fetched": self.bars_fetched,
+        }
+
+
+__all__ = ["HistoricalBarCache"]
@@ -0,0 +1,149 @@
+import asyncio
+import json
+from collections.abc import Iterable
+from typing import Protocol
+
+from alpaca.data.models.quotes import Quote as AlpacaQuote
+
+from app.clients.my_alpaca_client import AlpacaBar
+from app.clients.stream_manager import Channel, StreamHandler
+from app.market_data.bar_store import BarStore
+
+LIVE_PRICE_CHANNELS: tuple[Channel, ...] = ("bars", "quotes")
+# Messages a slow client may fall behind by before the oldest are dropped
+CLIENT_QUEUE_SIZE = 256
+
+
+class PriceSource(Protocol):
+    """Where a LivePriceHub gets its bars and quotes from: an AlpacaStreamManager,
+    or a LivePriceRelay sharing the leader's between processes"""
+
+    async def subscribe(
+        self, channel: Channel, symbols: Iterable[str], handler: StreamHandler
+    ) -> None: ...
+
+    async def unsubscribe(
+        self, channel: Channel, symbols: Iterable[str], handler: StreamHandler
+    ) -> None: ...
+
+    async def stop(self) -> None: ...
+
+
+class LivePriceClient:
+    """One connected client: its subscriptions and its bounded outbox"""
+
+    def __init__(self, queue_size: int = CLIENT_QUEUE_SIZE):
+        self.queue: asyncio.Queue[str] = asyncio.Queue(queue_size)
+        self.subscriptions: dict[Channel, set[str]] = {
+            channel: set() for channel in LIVE_PRICE_CHANNELS
+        }
+        self.dropped = 0
+
+    def put(self, message: str) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    def subscription_message(self) -> str:
+        return json.dumps(
+            {
+                "type": "subscription",
+                **{
+                    channel: sorted(symbols)
+                    for channel, symbols in self.subscriptions.items()
+                },
+            }
+        )
+
+
+class LivePriceHub:
+    """Fans live bars and quotes out to many clients (e.g. browser websockets)
+    over one upstream subscription per (channel, symbol).
+
+    The upstream subscription is made by the first client that subscribes to a
+    symbol and dropped with the last one. Each bar/quote is serialized once and
+    queued for every subscribed client; a client that can't keep up loses its
+    oldest messages instead of delaying the others.
+
+    The bars also go to `bar_store`, the recent history of the symbols streamed
+    by this process (see GET /market/bars/{symbol}).
+
+    The upstream subscriptions go to `stream_manager`, a LivePriceRelay when
+    there are several worker processes (see create_live_price_hub).
+    """
+
+    def __init__(self, stream_manager: PriceSource, bar_store: BarStore | None = None):
+        self.stream_manager = stream_manager
+        self.bar_store = bar_store or BarStore()
+        self._clients: dict[tuple[Channel, str], set[LivePriceClient]] = {}
+        self._lock = asyncio.Lock()
+
+    def _handler(self, channel: Channel) -> StreamHandler:
+        if channel == "bars":
+            return self.on_bar
+        return self.on_quote
+
+    async def subscribe(
+        self, client: LivePriceClient, channel: Channel, symbols: Iterable[str]
+    ) -> None:
+        async with self._lock:
+            new_upstream = []
+            for symbol in symbols:
+                clients = self._clients.setdefault((channel, symbol), set())
+                if not clients:
+                    new_upstream.append(symbol)
+                clients.add(client)
+                client.subscriptions[channel].add(symbol)
+            if new_upstream:
+                await self.stream_manager.subscribe(
+                    channel, new_upstream, self._handler(channel)
+                )
+
+    async def unsubscribe(
+        self, client: LivePriceClient, channel: Channel, symbols: Iterable[str]
+    ) -> None:
+        async with self._lock:
+            removed_upstream = []
+            for symbol in symbols:
+                client.subscriptions[channel].discard(symbol)
+                clients = self._clients.get((channel, symbol))
+                if clients is None or client not in clients:
+                    continue
+                clients.discard(client)
+                if not clients:
+                    del self._clients[(channel, symbol)]
+                    removed_upstream.append(symbol)
+            if removed_upstream:
+                await self.stream_manager.unsubscribe(
+                    channel, removed_upstream, self._handler(channel)
+                )
+
+    async def disconnect(self, client: LivePriceClient) -> None:
+        for channel, symbols in client.subscriptions.items():
+            await self.unsubscribe(client, channel, list(symbols))
+
+    def upstream_subscriptions(self) -> dict[Channel, list[str]]:
+        result: dict[Channel, list[str]] = {}
+        for channel, symbol in self._clients:
+            result.setdefault(channel, []).append(symbol)
+        return result
+
+    def _broadcast(self, channel: Channel, symbol: str, message: str) -> None:
+        for client in self._clients.get((channel, symbol), ()):
+            client.put(message)
+
+    async def on_bar(self, bar: AlpacaBar) -> None:
+        self.bar_store.append_bar(bar)
+        message = json.dumps({"type": "bar", **bar.model_dump(mode="json")})
+        self._broadcast("bars", bar.symbol, message)
+
+    async def on_quote(self, quote: AlpacaQuote) -> None:
+        message = json.dumps({"type": "quote", **quote.model_dump(mode="json")})
+        self._broadcast("quotes", quote.symbol, message)
+
+    async def close(self) -> None:
+        await self.stream_manager.stop()
+
+
+__all__ = ["LIVE_PRICE_CHANNELS", "LivePriceClient", "LivePriceHub", "PriceSource"]
@@ -0,0 +1,298 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from collections import defaultdict
+from collections.abc import Iterable
+from contextlib import suppress
+from typing import Any
+
+import psycopg
+from alpaca.data.mappings import BAR_MAPPING, QUOTE_MAPPING
+from alpaca.data.models.quotes import Quote as AlpacaQuote
+from sqlalchemy import Engine
+
+from app.clients.my_alpaca_client import AlpacaBar
+from app.clients.stream_manager import AlpacaStreamManager, Channel, StreamHandler
+
+logger = logging.getLogger(__name__)
+
+# Bars and quotes relayed by the leader, and its requests for the workers' wants
+LIVE_PRICES_CHANNEL = "live_prices"
+# Symbols each worker wants, sent to the leader
+LIVE_PRICE_WANTS_CHANNEL = "live_price_wants"
+# How often a worker repeats its wants; the leader drops those of a worker not
+# heard of for WANTS_EXPIRE_SECONDS (e.g. it was killed)
+WANTS_REFRESH_SECONDS = 10.0
+WANTS_EXPIRE_SECONDS = 3 * WANTS_REFRESH_SECONDS
+LISTEN_RETRY_SECONDS = 5.0
+
+# Short keys of the stream messages, which also keep the NOTIFY payloads small
+_MAPPINGS: dict[Channel, dict[str, str]] = {
+    "bars": BAR_MAPPING,
+    "quotes": QUOTE_MAPPING,
+}
+
+
+def price_payload(channel: Channel, data: AlpacaBar | AlpacaQuote) -> str:
+    fields = data.model_dump(mode="json")
+    return json.dumps(
+        {
+            "type": channel,
+            "symbol": data.symbol,
+            "data": {
+                key: fields[name]
+                for key, name in _MAPPINGS[channel].items()
+                if name in fields
+            },
+        }
+    )
+
+
+def parse_price(message: dict[str, Any]) -> AlpacaBar | AlpacaQuote:
+    if message["type"] == "bars":
+        return AlpacaBar(message["symbol"], message["data"])
+    return AlpacaQuote(message["symbol"], message["data"])
+
+
+class WorkerWants:
+    """The (channel, symbol) pairs wanted by each worker, as last heard of"""
+
+    def __init__(self) -> None:
+        self._wants: dict[str, tuple[float, set[tuple[Channel, str]]]] = {}
+
+    def update(self, message: dict[str, Any], now: float) -> None:
+        self._wants[message["identity"]] = (
+            now,
+            {
+                (channel, symbol)
+                for channel in _MAPPINGS
+                for symbol in message.get(channel, ())
+            },
+        )
+
+    def expire(self, now: float) -> None:
+        self._wants = {
+            identity: (seen, wants)
+            for identity, (seen, wants) in self._wants.items()
+            if now - seen < WANTS_EXPIRE_SECONDS
+        }
+
+    def union(self) -> set[tuple[Channel, str]]:
+        return set().union(*(wants for _, wants in self._wants.values()))
+
+
+class LivePriceRelay:
+    """Shares one upstream market data stream between all worker processes.
+
+    Alpaca allows a single market data websocket per account, so only the
+    "live-prices" leader (see LeaderElection) streams from Alpaca: `lead`
+    subscribes upstream to the symbols wanted by any worker and relays each
+    bar/quote to every worker with a NOTIFY on LIVE_PRICES_CHANNEL. Each worker
+    runs one LISTEN connection, started with its first subscription, that feeds
+    its handlers; and sends its wants (NOTIFY on LIVE_PRICE_WANTS_CHANNEL) as
+    they change, every WANTS_REFRESH_SECONDS, and when a new leader asks.
+
+    It has the subscribe/unsubscribe interface of AlpacaStreamManager, so each
+    worker's LivePriceHub uses it in place of a stream of its own.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        stream_manager: AlpacaStreamManager,
+        identity: str | None = None,
+    ):
+        self.stream_manager = stream_manager
+        self.identity = identity or f"{socket.gethostname()}:{os.getpid()}"
+        self._conninfo = engine.url.set(drivername="postgresql").render_as_string(
+            hide_password=False
+        )
+        self._handlers: dict[tuple[Channel, str], list[StreamHandler]] = defaultdict(
+            list
+        )
+        self._wants_connection: psycopg.AsyncConnection[Any] | None = None
+        self._relay_connection: psycopg.AsyncConnection[Any] | None = None
+        self._relay_handlers = {channel: self._relay(channel) for channel in _MAPPINGS}
+        self._listener: asyncio.Task[None] | None = None
+
+    async def _connect(self) -> psycopg.AsyncConnection[Any]:
+        return await psycopg.AsyncConnection.connect(self._conninfo, autocommit=True)
+
+    @staticmethod
+    async def _notify(
+        connection: psycopg.AsyncConnection[Any], channel: str, payload: str
+    ) -> None:
+        await connection.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+
+    # Worker side
+
+    async def subscribe(
+        self, channel: Channel, symbols: Iterable[str], handler: StreamHandler
+    ) -> None:
+        changed = False
+        for symbol in symbols:
+            handlers = self._handlers[(channel, symbol)]
+            changed = changed or not handlers
+            if handler not in handlers:
+                handlers.append(handler)
+        self._ensure_listener()
+        if changed:
+            await self._send_wants()
+
+    async def unsubscribe(
+        self, channel: Channel, symbols: Iterable[str], handler: StreamHandler
+    ) -> None:
+        changed = False
+        for symbol in symbols:
+            handlers = self._handlers.get((channel, symbol))
+            if not handlers or handler not in handlers:
+                continue
+            handlers.remove(handler)
+            if not handlers:
+                del self._handlers[(channel, symbol)]
+                changed = True
+        if changed:
+            await self._send_wants()
+
+    def wants_payload(self) -> str:
+        wants: dict[str, list[str]] = {channel: [] for channel in _MAPPINGS}
+        for channel, symbol in self._handlers:
+            wants[channel].append(symbol)
+        return json.dumps({"identity": self.identity, **wants})
+
+    async def _send_wants(self) -> None:
+        # Sent once connected otherwise
+        if self._wants_connection is None:
+            return
+        try:
+            await self._notify(
+                self._wants_connection, LIVE_PRICE_WANTS_CHANNEL, self.wants_payload()
+            )
+        except Exception:
+            # Repeated by the next refresh
+            logger.exception("Failed to send the live price subscriptions")
+
+    async def dispatch(self, payload: str) -> None:
+        """Hand a LIVE_PRICES_CHANNEL message to the local handlers"""
+        message = json.loads(payload)
+        if message["type"] == "resend":
+            await self._send_wants()
+            return
+        handlers = list(self._handlers.get((message["type"], message["symbol"]), ()))
+        if not handlers:
+            return
+        data = parse_price(message)
+        for handler in handlers:
+            try:
+                await handler(data)
+            except Exception:
+                logger.exception(
+                    "Live price handler failed for %s %s",
+                    message["type"],
+                    message["symbol"],
+                )
+
+    def _ensure_listener(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with (
+                    await self._connect() as listen,
+                    await self._connect() as wants,
+                ):
+                    await listen.execute(f"LISTEN {LIVE_PRICES_CHANNEL}")
+                    logger.info("Listening to %s", LIVE_PRICES_CHANNEL)
+                    self._wants_connection = wants
+                    while True:
+                        await self._send_wants()
+                        async for notify in listen.notifies(
+                            timeout=WANTS_REFRESH_SECONDS
+                        ):
+                            await self.dispatch(notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(
+                    "%s listener failed, reconnecting", LIVE_PRICES_CHANNEL
+                )
+            finally:
+                self._wants_connection = None
+            await asyncio.sleep(LISTEN_RETRY_SECONDS)
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+
+    # Leader side
+
+    def _relay(self, channel: Channel) -> StreamHandler:
+        async def relay(data: AlpacaBar | AlpacaQuote) -> None:
+            if self._relay_connection is not None:
+                await self._notify(
+                    self._relay_connection,
+                    LIVE_PRICES_CHANNEL,
+                    price_payload(channel, data),
+                )
+
+        return relay
+
+    async def sync_upstream(self, wanted: set[tuple[Channel, str]]) -> None:
+        """Subscribe upstream to exactly the `wanted` (channel, symbol) pairs"""
+        subscribed = {
+            (channel, symbol)
+            for channel, symbols in self.stream_manager.subscriptions().items()
+            for symbol in symbols
+        }
+        for channel, handler in self._relay_handlers.items():
+            added = [symbol for ch, symbol in wanted - subscribed if ch == channel]
+            removed = [symbol for ch, symbol in subscribed - wanted if ch == channel]
+            if added:
+                await self.stream_manager.subscribe(channel, added, handler)
+            if removed:
+                await self.stream_manager.unsubscribe(channel, removed, handler)
+
+    async def lead(self) -> None:
+        """Stream from Alpaca for all workers, until cancelled"""
+        worker_wants = WorkerWants()
+        try:
+            async with (
+                await self._connect() as listen,
+                await self._connect() as relay,
+            ):
+                await listen.execute(f"LISTEN {LIVE_PRICE_WANTS_CHANNEL}")
+                self._relay_connection = relay
+                # The workers answer right away instead of at their next refresh
+                await self._notify(
+                    relay, LIVE_PRICES_CHANNEL, json.dumps({"type": "resend"})
+                )
+                while True:
+                    async for notify in listen.notifies(timeout=WANTS_REFRESH_SECONDS):
+                        worker_wants.update(
+                            json.loads(notify.payload), time.monotonic()
+                        )
+                        await self.sync_upstream(worker_wants.union())
+                    worker_wants.expire(time.monotonic())
+                    await self.sync_upstream(worker_wants.union())
+        finally:
+            self._relay_connection = None
+            await self.sync_upstream(set())
+            await self.stream_manager.stop()
+
+
+__all__ = [
+    "LIVE_PRICE_WANTS_CHANNEL",
+    "LIVE_PRICES_CHANNEL",
+    "LivePriceRelay",
+    "WorkerWants",
+    "parse_price",
+    "price_payload",
+]
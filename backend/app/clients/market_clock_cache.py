@@ -0,0 +1,109 @@
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+
+from alpaca.trading.models import Clock as AlpacaClock
+
+
+@dataclass(frozen=True)
+class ClockSnapshot:
+    """Market clock with all timestamps converted to UTC"""
+
+    timestamp: datetime
+    is_open: bool
+    next_open: datetime
+    next_close: datetime
+
+    @classmethod
+    def from_alpaca_clock(cls, clock: AlpacaClock) -> "ClockSnapshot":
+        return cls(
+            timestamp=clock.timestamp.astimezone(timezone.utc),
+            is_open=clock.is_open,
+            next_open=clock.next_open.astimezone(timezone.utc),
+            next_close=clock.next_close.astimezone(timezone.utc),
+        )
+
+    def is_time_passed(self, time: datetime) -> bool:
+        # If the input time is naive (no timezone), assume it's UTC
+        assert time.tzinfo is None, "time to check is timezone-aware which is not good"
+        return self.timestamp >= time.replace(tzinfo=timezone.utc)
+
+    def is_next_open_today(self) -> bool:
+        return self.next_open.date() == self.timestamp.date()
+
+    def is_next_close_today(self) -> bool:
+        return self.next_close.date() == self.timestamp.date()
+
+
+class MarketClockCache:
+    """Caches the Alpaca market clock and extrapolates "now" between fetches.
+
+    The snapshot is refetched when it is older than ``ttl_seconds`` or when the
+    extrapolated time crosses ``next_open`` / ``next_close`` (``is_open`` flips there).
+    """
+
+    def __init__(
+        self,
+        fetch_clock: Callable[[], AlpacaClock] | None,
+        ttl_seconds: float = 60.0,
+        monotonic: Callable[[], float] = time.monotonic,
+    ):
+        self._fetch_clock = fetch_clock
+        self.ttl_seconds = ttl_seconds
+        self._monotonic = monotonic
+        self._lock = threading.Lock()
+        self._snapshot: ClockSnapshot | None = None
+        self._fetched_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def _peek(self) -> ClockSnapshot | None:
+        if self._snapshot is None:
+            return None
+        elapsed = self._monotonic() - self._fetched_at
+        now = self._snapshot.timestamp + timedelta(seconds=elapsed)
+        if (
+            elapsed >= self.ttl_seconds
+            or now >= self._snapshot.next_open
+            or now >= self._snapshot.next_close
+        ):
+            return None
+        self.hits += 1
+        return replace(self._snapshot, timestamp=now)
+
+    def _store(self, clock: AlpacaClock) -> ClockSnapshot:
+        self.misses += 1
+        self._fetched_at = self._monotonic()
+        self._snapshot = ClockSnapshot.from_alpaca_clock(clock)
+        return self._snapshot
+
+    def get(self) -> ClockSnapshot:
+        # The fetch happens under the lock so concurrent misses share one HTTP call
+        with self._lock:
+            snapshot = self._peek()
+            if snapshot is not None:
+                return snapshot
+            assert self._fetch_clock is not None, "no fetch_clock, use peek/store"
+            return self._store(self._fetch_clock())
+
+    def peek(self) -> ClockSnapshot | None:
+        """The extrapolated snapshot, or None when it has to be refetched"""
+        with self._lock:
+            return self._peek()
+
+    def store(self, clock: AlpacaClock) -> ClockSnapshot:
+        """Store a clock fetched by the caller (used by the async client)"""
+        with self._lock:
+            return self._store(clock)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+__all__ = ["ClockSnapshot", "MarketClockCache"]
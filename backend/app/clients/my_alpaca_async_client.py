@@ -0,0 +1,240 @@
+import asyncio
+from collections.abc import Iterable
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+import httpx
+from alpaca.common.enums import BaseURL
+from alpaca.common.exceptions import APIError
+from alpaca.data.models.quotes import Quote as AlpacaQuote
+from alpaca.data.requests import StockLatestQuoteRequest
+from alpaca.trading.enums import OrderSide, TimeInForce
+from alpaca.trading.models import Clock as AlpacaClock
+from alpaca.trading.models import Order as AlpacaOrder
+from alpaca.trading.models import Position as AlpacaPosition
+from alpaca.trading.requests import MarketOrderRequest
+
+from app.clients.market_clock_cache import ClockSnapshot, MarketClockCache
+from app.clients.my_alpaca_client import MyAlpacaClient
+from app.clients.rate_limiter import AlpacaRateLimiter, RequestPriority
+
+RETRY_STATUS_CODES = (429, 504)
+
+
+class MyAlpacaAsyncClient:
+    """asyncio counterpart of MyAlpacaClient for async routes.
+
+    Talks to the Alpaca REST API directly over pooled httpx.AsyncClient connections
+    and returns the same alpaca-py models. Errors are raised as alpaca APIError,
+    like the blocking client. Call `aclose` when done with it.
+    """
+
+    def __init__(
+        self,
+        credentials: dict[str, Any],
+        clock_ttl_seconds: float = 60.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        timeout_seconds: float = 10.0,
+        retry_attempts: int = 3,
+        retry_wait_seconds: float = 3.0,
+        rate_limiter: AlpacaRateLimiter | None = None,
+    ):
+        self.credentials = credentials
+        self.rate_limiter = rate_limiter
+        self.retry_attempts = retry_attempts
+        self.retry_wait_seconds = retry_wait_seconds
+
+        headers = {
+            "APCA-API-KEY-ID": credentials["api-key"],
+            "APCA-API-SECRET-KEY": credentials["secret-key"],
+        }
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        trading_url = (
+            BaseURL.TRADING_PAPER if credentials["paper"] else BaseURL.TRADING_LIVE
+        )
+        url_override = credentials.get("url-override")
+        self.trading_http = httpx.AsyncClient(
+            base_url=f"{url_override or trading_url.value}/v2",
+            headers=headers,
+            limits=limits,
+            timeout=timeout_seconds,
+        )
+        self.data_http = httpx.AsyncClient(
+            base_url=f"{url_override or BaseURL.DATA.value}/v2",
+            headers=headers,
+            limits=limits,
+            timeout=timeout_seconds,
+        )
+
+        # Filled through peek/store by get_clock, there is no blocking fetch
+        self.clock_cache = MarketClockCache(None, ttl_seconds=clock_ttl_seconds)
+
+    async def aclose(self) -> None:
+        await self.trading_http.aclose()
+        await self.data_http.aclose()
+
+    async def _throttle(self, priority: RequestPriority) -> None:
+        if self.rate_limiter is None or self.rate_limiter.try_acquire(priority):
+            return
+        # Only queue on a thread when the budget is actually exhausted
+        await asyncio.to_thread(self.rate_limiter.acquire, priority)
+
+    async def _request(
+        self,
+        priority: RequestPriority,
+        http: httpx.AsyncClient,
+        method: str,
+        path: str,
+        params: dict[str, Any] | None = None,
+        json: dict[str, Any] | None = None,
+    ) -> Any:
+        await self._throttle(priority)
+        retry = self.retry_attempts
+        while True:
+            response = await http.request(method, path, params=params, json=json)
+            try:
+                response.raise_for_status()
+            except httpx.HTTPStatusError as http_error:
+                if response.status_code in RETRY_STATUS_CODES and retry > 0:
+                    retry -= 1
+                    await asyncio.sleep(self.retry_wait_seconds)
+                    continue
+                raise APIError(response.text, http_error)  # type: ignore[no-untyped-call]
+            return response.json() if response.content else None
+
+    async def _submit_order(
+        self,
+        market_order: MarketOrderRequest,
+        priority: RequestPriority = RequestPriority.ORDER_SUBMISSION,
+    ) -> AlpacaOrder:
+        response = await self._request(
+            priority,
+            self.trading_http,
+            "POST",
+            "/orders",
+            json=market_order.to_request_fields(),
+        )
+        return AlpacaOrder(**response)
+
+    async def submit_buy_order(self, symbol: str, amount: float) -> AlpacaOrder:
+        market_order = MarketOrderRequest(
+            symbol=symbol,
+            notional=amount,
+            side=OrderSide.BUY,
+            time_in_force=TimeInForce.DAY,
+        )
+        return await self._submit_order(market_order)
+
+    async def submit_sell_order(self, symbol: str, amount: float) -> AlpacaOrder:
+        market_order = MarketOrderRequest(
+            symbol=symbol,
+            notional=amount,
+            side=OrderSide.SELL,
+            time_in_force=TimeInForce.DAY,
+        )
+        return await self._submit_order(market_order)
+
+    async def submit_liquidate_by_order(
+        self, symbol: str, alpaca_order: AlpacaOrder
+    ) -> AlpacaOrder:
+        market_order = MarketOrderRequest(
+            symbol=symbol,
+            qty=alpaca_order.filled_qty,
+            side=OrderSide.SELL,
+            time_in_force=TimeInForce.DAY,
+        )
+        return await self._submit_order(market_order, RequestPriority.LIQUIDATION)
+
+    async def close_position(self, symbol: str) -> AlpacaOrder:
+        response = await self._request(
+            RequestPriority.LIQUIDATION,
+            self.trading_http,
+            "DELETE",
+            f"/positions/{symbol}",
+        )
+        return AlpacaOrder(**response)
+
+    async def get_order_by_id(self, order_id: UUID) -> AlpacaOrder:
+        """Get order by ID with automatic type conversion for numeric fields"""
+        response = await self._request(
+            RequestPriority.STATUS_POLLING,
+            self.trading_http,
+            "GET",
+            f"/orders/{order_id}",
+        )
+        return MyAlpacaClient._normalize_order(AlpacaOrder(**response))
+
+    async def get_orders_by_ids(
+        self, order_ids: Iterable[UUID]
+    ) -> dict[UUID, AlpacaOrder]:
+        """Fetch several orders concurrently, keyed by order id"""
+        alpaca_orders = await asyncio.gather(
+            *(self.get_order_by_id(order_id) for order_id in order_ids)
+        )
+        return {alpaca_order.id: alpaca_order for alpaca_order in alpaca_orders}
+
+    async def get_position(self, symbol: str) -> AlpacaPosition:
+        response = await self._request(
+            RequestPriority.STATUS_POLLING,
+            self.trading_http,
+            "GET",
+            f"/positions/{symbol}",
+        )
+        return AlpacaPosition(**response)
+
+    async def get_clock(self) -> ClockSnapshot:
+        """Get the (cached) market clock, timestamps in UTC"""
+        snapshot = self.clock_cache.peek()
+        if snapshot is not None:
+            return snapshot
+        response = await self._request(
+            RequestPriority.MARKET_INFO, self.trading_http, "GET", "/clock"
+        )
+        return self.clock_cache.store(AlpacaClock(**response))
+
+    async def get_next_close(self) -> datetime:
+        """Get the next market close time in UTC"""
+        return (await self.get_clock()).next_close
+
+    async def get_next_open(self) -> datetime:
+        """Get the next market open time in UTC"""
+        return (await self.get_clock()).next_open
+
+    async def get_current_time(self) -> datetime:
+        return (await self.get_clock()).timestamp
+
+    async def is_time_passed(self, time: datetime) -> bool:
+        return (await self.get_clock()).is_time_passed(time)
+
+    async def is_next_open_today(self) -> bool:
+        return (await self.get_clock()).is_next_open_today()
+
+    async def is_next_close_today(self) -> bool:
+        return (await self.get_clock()).is_next_close_today()
+
+    async def get_current_prices(self, symbols: Iterable[str]) -> dict[str, float]:
+        """Get current market prices (ask) for many symbols with a single request"""
+        request_params = StockLatestQuoteRequest(symbol_or_symbols=list(symbols))
+        response = await self._request(
+            RequestPriority.MARKET_INFO,
+            self.data_http,
+            "GET",
+            "/stocks/quotes/latest",
+            params=request_params.to_request_fields(),
+        )
+        return {
+            symbol: float(AlpacaQuote(symbol, raw_quote).ask_price)
+            for symbol, raw_quote in response["quotes"].items()
+        }
+
+    async def get_current_price(self, symbol: str) -> float:
+        """Get current market price for a symbol"""
+        return (await self.get_current_prices([symbol]))[symbol]
+
+
+__all__ = ["MyAlpacaAsyncClient"]
@@ -1,53 +1,202 @@
-from collections.abc import Awaitable, Callable
-from datetime import datetime, timezone
+import logging
+from collections.abc import Awaitable, Callable, Iterable
+from datetime import datetime, timedelta
+from functools import cached_property
 from typing import Any
 from uuid import UUID
 
+import requests
+from alpaca.common.enums import Sort
+from alpaca.common.rest import RESTClient
 from alpaca.data import StockHistoricalDataClient
 from alpaca.data.enums import DataFeed
 from alpaca.data.live.crypto import CryptoDataStream
 from alpaca.data.live.stock import StockDataStream
 from alpaca.data.models.bars import Bar as AlpacaBar
-from alpaca.data.requests import StockLatestQuoteRequest
+from alpaca.data.models.quotes import Quote as AlpacaQuote
+from alpaca.data.requests import StockBarsRequest, StockLatestQuoteRequest
+from alpaca.data.timeframe import TimeFrame
 from alpaca.trading.client import TradingClient
-from alpaca.trading.enums import OrderSide, TimeInForce
+from alpaca.trading.enums import OrderSide, QueryOrderStatus, TimeInForce
 from alpaca.trading.enums import OrderStatus as AlpacaOrderStatus
 from alpaca.trading.models import Clock as AlpacaClock
 from alpaca.trading.models import Order as AlpacaOrder
 from alpaca.trading.models import Position as AlpacaPosition
-from alpaca.trading.requests import MarketOrderRequest
+from alpaca.trading.requests import GetOrdersRequest, MarketOrderRequest
+from alpaca.trading.stream import TradingStream
+from requests.adapters import HTTPAdapter
+
+from app.clients.historical_bar_cache import HistoricalBarCache
+from app.clients.market_clock_cache import ClockSnapshot, MarketClockCache
+from app.clients.quote_cache import QuoteCache
+from app.clients.rate_limiter import AlpacaRateLimiter, RequestPriority
+
+logger = logging.getLogger(__name__)
+
+# Orders submitted at the last timestamp of a page may continue on the next one
+ORDER_PAGE_OVERLAP = timedelta(microseconds=1)
 
 
 class MyAlpacaClient:
-    def __init__(self, credentials: dict[str, Any]):
+    def __init__(
+        self,
+        credentials: dict[str, Any],
+        clock_ttl_seconds: float = 60.0,
+        quote_ttl_seconds: float = 0.25,
+        http_pool_maxsize: int = 10,
+        rate_limiter: AlpacaRateLimiter | None = None,
+    ):
         self.credentials = credentials
+        self.rate_limiter = rate_limiter
+        # Base URL of a stand-in for all Alpaca endpoints (see app/fake_alpaca)
+        self.url_override: str | None = credentials.get("url-override")
 
         self.trading_client = TradingClient(
             api_key=credentials["api-key"],
             secret_key=credentials["secret-key"],
             paper=credentials["paper"],
+            url_override=self.url_override,
         )
         self.data_client = StockHistoricalDataClient(
             api_key=credentials["api-key"],
             secret_key=credentials["secret-key"],
+            url_override=self.url_override,
         )
+        for rest_client in (self.trading_client, self.data_client):
+            self._mount_http_adapter(rest_client, http_pool_maxsize)
 
-        self.stocks_stream = StockDataStream(
-            api_key=credentials["api-key"],
-            secret_key=credentials["secret-key"],
+        self.clock_cache = MarketClockCache(
+            self._fetch_clock, ttl_seconds=clock_ttl_seconds
+        )
+        self.quote_cache = QuoteCache(
+            self._fetch_latest_quotes, ttl_seconds=quote_ttl_seconds
+        )
+        self.bar_cache = HistoricalBarCache(self._fetch_bars)
+
+    @staticmethod
+    def _http_session(rest_client: RESTClient) -> requests.Session | None:
+        """The requests.Session alpaca-py keeps per REST client. It is private to
+        alpaca-py (checked against 0.42), so None when a version no longer has it"""
+        session = getattr(rest_client, "_session", None)
+        if isinstance(session, requests.Session):
+            return session
+        logger.warning(
+            "%s has no requests.Session, HTTP pool tuning disabled",
+            type(rest_client).__name__,
+        )
+        return None
+
+    @classmethod
+    def _mount_http_adapter(cls, rest_client: RESTClient, pool_maxsize: int) -> None:
+        # Size the keep-alive pool for the number of threads sharing the client,
+        # otherwise extra connections are opened and thrown away under concurrency.
+        session = cls._http_session(rest_client)
+        if session is None:
+            return
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+    def _throttle(self, priority: RequestPriority) -> None:
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(priority)
+
+    def connection_stats(self) -> dict[str, int]:
+        """Connections opened vs requests sent over the keep-alive pools"""
+        connections = 0
+        sent = 0
+        for rest_client in (self.trading_client, self.data_client):
+            session = self._http_session(rest_client)
+            if session is None:
+                continue
+            for adapter in set(session.adapters.values()):
+                if not isinstance(adapter, HTTPAdapter):
+                    continue
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools[key]
+                    connections += pool.num_connections
+                    sent += pool.num_requests
+        return {
+            "connections": connections,
+            "requests": sent,
+            "reused": sent - connections,
+        }
+
+    def _stream_url_override(self, path: str) -> str | None:
+        if self.url_override is None:
+            return None
+        return self.url_override.replace("http", "ws", 1) + path
+
+    @cached_property
+    def stocks_stream(self) -> StockDataStream:
+        return StockDataStream(
+            api_key=self.credentials["api-key"],
+            secret_key=self.credentials["secret-key"],
             feed=DataFeed.IEX,
+            url_override=self._stream_url_override("/v2/iex"),
         )
 
-        self.crypto_stream = CryptoDataStream(
-            api_key=credentials["api-key"],
-            secret_key=credentials["secret-key"],
+    @cached_property
+    def crypto_stream(self) -> CryptoDataStream:
+        return CryptoDataStream(
+            api_key=self.credentials["api-key"],
+            secret_key=self.credentials["secret-key"],
+            url_override=self._stream_url_override("/v1beta3/crypto/us"),
         )
 
+    @cached_property
+    def trading_stream(self) -> TradingStream:
+        return TradingStream(
+            api_key=self.credentials["api-key"],
+            secret_key=self.credentials["secret-key"],
+            paper=self.credentials["paper"],
+            # alpaca-py annotates this as str but defaults it to None
+            url_override=self._stream_url_override("/stream"),  # type: ignore[arg-type]
+        )
+
+    def _fetch_latest_quotes(self, symbols: list[str]) -> dict[str, AlpacaQuote]:
+        request_params = StockLatestQuoteRequest(symbol_or_symbols=symbols)
+        self._throttle(RequestPriority.MARKET_INFO)
+        latest_quotes = self.data_client.get_stock_latest_quote(request_params)
+        assert isinstance(latest_quotes, dict)
+        return latest_quotes
+
     def get_current_price(self, symbol: str) -> float:
         """Get current market price for a symbol"""
-        request_params = StockLatestQuoteRequest(symbol_or_symbols=[symbol])
-        latest_quote = self.data_client.get_stock_latest_quote(request_params)
-        return float(latest_quote[symbol].ask_price)
+        return self.get_current_prices([symbol])[symbol]
+
+    def get_current_prices(self, symbols: Iterable[str]) -> dict[str, float]:
+        """Get current market prices (ask) for many symbols with a single request.
+        Symbols Alpaca has no quote for are left out of the result"""
+        quotes = self.quote_cache.get_many(symbols)
+        return {symbol: float(quote.ask_price) for symbol, quote in quotes.items()}
+
+    def _fetch_bars(
+        self, symbol: str, timeframe: TimeFrame, start: datetime, end: datetime
+    ) -> list[AlpacaBar]:
+        request_params = StockBarsRequest(
+            symbol_or_symbols=symbol,
+            timeframe=timeframe,
+            start=start,
+            end=end,
+            feed=DataFeed.IEX,
+        )
+        self._throttle(RequestPriority.MARKET_INFO)
+        bar_set = self.data_client.get_stock_bars(request_params)
+        assert not isinstance(bar_set, dict)
+        return bar_set.data.get(symbol, [])
+
+    def get_bars(
+        self,
+        symbol: str,
+        start: datetime,
+        end: datetime,
+        timeframe: TimeFrame = TimeFrame.Minute,
+    ) -> list[AlpacaBar]:
+        """Historical bars with start <= timestamp < end. Periods fetched before
+        are served from bar_cache, only the missing parts are downloaded"""
+        return self.bar_cache.get(symbol, timeframe, start, end)
 
     def submit_buy_order(self, symbol: str, amount: float) -> AlpacaOrder:
         market_order = MarketOrderRequest(
@@ -56,6 +205,7 @@ class MyAlpacaClient:
             side=OrderSide.BUY,
             time_in_force=TimeInForce.DAY,
         )
+        self._throttle(RequestPriority.ORDER_SUBMISSION)
         alpaca_order = self.trading_client.submit_order(market_order)
         assert isinstance(alpaca_order, AlpacaOrder)
         return alpaca_order
@@ -67,6 +217,7 @@ class MyAlpacaClient:
             side=OrderSide.SELL,
             time_in_force=TimeInForce.DAY,
         )
+        self._throttle(RequestPriority.ORDER_SUBMISSION)
         alpaca_order = self.trading_client.submit_order(market_order)
         assert isinstance(alpaca_order, AlpacaOrder)
         return alpaca_order
@@ -74,26 +225,34 @@ class MyAlpacaClient:
     def submit_liquidate_by_order(
         self, symbol: str, alpaca_order: AlpacaOrder
     ) -> AlpacaOrder:
+        assert alpaca_order.filled_qty is not None
+        return self.submit_sell_qty_order(symbol, float(alpaca_order.filled_qty))
+
+    def submit_sell_qty_order(
+        self, symbol: str, qty: float, client_order_id: str | None = None
+    ) -> AlpacaOrder:
+        """Market sell of a quantity (not the whole position, like close_position).
+        Alpaca rejects a second order with the same client_order_id"""
         market_order = MarketOrderRequest(
             symbol=symbol,
-            qty=alpaca_order.filled_qty,
+            qty=qty,
             side=OrderSide.SELL,
             time_in_force=TimeInForce.DAY,
+            client_order_id=client_order_id,
         )
+        self._throttle(RequestPriority.LIQUIDATION)
         liquidate_order = self.trading_client.submit_order(market_order)
         assert isinstance(liquidate_order, AlpacaOrder)
         return liquidate_order
 
     def close_position(self, symbol: str) -> AlpacaOrder:
+        self._throttle(RequestPriority.LIQUIDATION)
         alpaca_order = self.trading_client.close_position(symbol)
         assert isinstance(alpaca_order, AlpacaOrder)
         return alpaca_order
 
-    def get_order_by_id(self, order_id: UUID) -> AlpacaOrder:
-        """Get order by ID with automatic type conversion for numeric fields"""
-        alpaca_order = self.trading_client.get_order_by_id(order_id)
-        assert isinstance(alpaca_order, AlpacaOrder)
-
+    @staticmethod
+    def _normalize_order(alpaca_order: AlpacaOrder) -> AlpacaOrder:
         # Convert string values to float and round to 4 decimal places
         if alpaca_order.filled_avg_price is not None:
             alpaca_order.filled_avg_price = round(
@@ -105,63 +264,112 @@ class MyAlpacaClient:
 
         return alpaca_order
 
+    def get_order_by_id(self, order_id: UUID) -> AlpacaOrder:
+        """Get order by ID with automatic type conversion for numeric fields"""
+        self._throttle(RequestPriority.STATUS_POLLING)
+        alpaca_order = self.trading_client.get_order_by_id(order_id)
+        assert isinstance(alpaca_order, AlpacaOrder)
+        return self._normalize_order(alpaca_order)
+
+    def get_order_by_client_id(self, client_order_id: str) -> AlpacaOrder:
+        self._throttle(RequestPriority.STATUS_POLLING)
+        alpaca_order = self.trading_client.get_order_by_client_id(client_order_id)
+        assert isinstance(alpaca_order, AlpacaOrder)
+        return self._normalize_order(alpaca_order)
+
+    def get_orders_after(
+        self,
+        after: datetime,
+        status: QueryOrderStatus = QueryOrderStatus.ALL,
+        page_size: int = 500,
+    ) -> dict[UUID, AlpacaOrder]:
+        """Get every order submitted after `after`, keyed by order id.
+        Pages through the listing oldest first (Alpaca caps a page at 500 orders).
+
+        Each page starts just before the last submitted_at of the previous one, so
+        orders sharing that timestamp across the page boundary are listed again
+        rather than skipped, and de-duplicated by id"""
+        alpaca_orders: dict[UUID, AlpacaOrder] = {}
+        while True:
+            self._throttle(RequestPriority.STATUS_POLLING)
+            page = self.trading_client.get_orders(
+                GetOrdersRequest(
+                    status=status,
+                    after=after,
+                    limit=page_size,
+                    direction=Sort.ASC,
+                    nested=False,
+                )
+            )
+            assert isinstance(page, list)
+            for alpaca_order in page:
+                alpaca_orders[alpaca_order.id] = self._normalize_order(alpaca_order)
+
+            if len(page) < page_size:
+                break
+            last_submitted_at = page[-1].submitted_at
+            if last_submitted_at is None:
+                break
+            next_after = last_submitted_at - ORDER_PAGE_OVERLAP
+            if next_after <= after:
+                # The whole page was submitted at the same instant, move past it
+                next_after = last_submitted_at
+            if next_after <= after:
+                break
+            after = next_after
+
+        return alpaca_orders
+
     def get_position(self, symbol: str) -> AlpacaPosition:
+        self._throttle(RequestPriority.STATUS_POLLING)
         pos = self.trading_client.get_open_position(symbol)
         assert isinstance(pos, AlpacaPosition)
         return pos
 
-    def get_next_close(self) -> datetime:
-        """Get the next market close time in UTC"""
+    def _fetch_clock(self) -> AlpacaClock:
+        self._throttle(RequestPriority.MARKET_INFO)
         clock = self.trading_client.get_clock()
         assert isinstance(clock, AlpacaClock)
-        return clock.next_close.astimezone(timezone.utc)
+        return clock
 
-    def get_next_open(self) -> datetime:
+    def get_clock(self) -> ClockSnapshot:
+        """Get the (cached) market clock, timestamps in UTC"""
+        return self.clock_cache.get()
+
+    def get_next_close(self) -> datetime:
         """Get the next market close time in UTC"""
-        clock = self.trading_client.get_clock()
-        assert isinstance(clock, AlpacaClock)
-        return clock.next_open.astimezone(timezone.utc)
+        return self.get_clock().next_close
+
+    def get_next_open(self) -> datetime:
+        """Get the next market open time in UTC"""
+        return self.get_clock().next_open
 
     def get_current_time(self) -> datetime:
-        clock = self.trading_client.get_clock()
-        assert isinstance(clock, AlpacaClock)
-        return clock.timestamp.astimezone(timezone.utc)
+        return self.get_clock().timestamp
 
     def is_time_passed(self, time: datetime) -> bool:
-        clock = self.trading_client.get_clock()
-        assert isinstance(clock, AlpacaClock)
-        current_time_utc = clock.timestamp.astimezone(timezone.utc)
-        # If the input time is naive (no timezone), assume it's UTC
-        assert time.tzinfo is None, "time to check is timezone-aware which is not good"
-        time = time.replace(tzinfo=timezone.utc)
-
-        return current_time_utc >= time
+        return self.get_clock().is_time_passed(time)
 
     def is_next_open_today(self) -> bool:
-        clock = self.trading_client.get_clock()
-        assert isinstance(clock, AlpacaClock)
-        current_time_utc = clock.timestamp.astimezone(timezone.utc)
-        next_open = clock.next_open.astimezone(timezone.utc)
-        return next_open.date() == current_time_utc.date()
+        return self.get_clock().is_next_open_today()
 
     def is_next_close_today(self) -> bool:
-        clock = self.trading_client.get_clock()
-        assert isinstance(clock, AlpacaClock)
-        current_time_utc = clock.timestamp.astimezone(timezone.utc)
-        next_close = clock.next_close.astimezone(timezone.utc)
-        return next_close.date() == current_time_utc.date()
+        return self.get_clock().is_next_close_today()
 
-    def subscribe_bar_stocks(self, symbol: str, on_bar: Callable[[AlpacaBar], Awaitable[None]]) -> None:
+    def subscribe_bar_stocks(
+        self, symbol: str, on_bar: Callable[[AlpacaBar], Awaitable[None]]
+    ) -> None:
         stream = self.stocks_stream
         stream.subscribe_bars(on_bar, symbol)  # type: ignore[arg-type]
         stream.run()
 
-    def subscribe_bar_crypto(self, pair: str, on_bar: Callable[[AlpacaBar], Awaitable[None]]) -> None:
+    def subscribe_bar_crypto(
+        self, pair: str, on_bar: Callable[[AlpacaBar], Awaitable[None]]
+    ) -> None:
         stream = self.crypto_stream
         stream.subscribe_bars(on_bar, pair)  # type: ignore[arg-type]
         stream.run()
 
 
-
 # AlpacaOrderStatus Is imported in other files. And it is more friendly to be imported from here and confused with the regular "order" status
 __all__ = ["MyAlpacaClient", "AlpacaOrder", "AlpacaOrderStatus", "AlpacaBar"]
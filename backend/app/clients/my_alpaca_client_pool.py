@@ -0,0 +1,72 @@
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+from app.clients.my_alpaca_client import MyAlpacaClient
+
+
+@dataclass
+class PoolStats:
+    clients: int
+    created: int
+    reused: int
+    connections: int
+    requests: int
+    connections_reused: int
+
+
+class MyAlpacaClientPool:
+    """Per-process registry of long-lived MyAlpacaClient instances.
+
+    Clients are keyed by credentials, so every request made with the same account
+    shares one TradingClient/StockHistoricalDataClient and their keep-alive
+    connections. Keyword arguments passed to `get` are only used the first time a
+    client is created for those credentials.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._clients: dict[tuple[Any, ...], MyAlpacaClient] = {}
+        self.created = 0
+        self.reused = 0
+
+    @staticmethod
+    def _key(credentials: dict[str, Any]) -> tuple[Any, ...]:
+        return tuple(sorted(credentials.items()))
+
+    def get(self, credentials: dict[str, Any], **client_kwargs: Any) -> MyAlpacaClient:
+        key = self._key(credentials)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = MyAlpacaClient(credentials, **client_kwargs)
+                self._clients[key] = client
+                self.created += 1
+            else:
+                self.reused += 1
+            return client
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+
+    def stats(self) -> PoolStats:
+        with self._lock:
+            clients = list(self._clients.values())
+        connection_stats = [client.connection_stats() for client in clients]
+        connections = sum(s["connections"] for s in connection_stats)
+        requests = sum(s["requests"] for s in connection_stats)
+        return PoolStats(
+            clients=len(clients),
+            created=self.created,
+            reused=self.reused,
+            connections=connections,
+            requests=requests,
+            connections_reused=requests - connections,
+        )
+
+
+# One pool per worker process
+my_alpaca_client_pool = MyAlpacaClientPool()
+
+__all__ = ["MyAlpacaClientPool", "PoolStats", "my_alpaca_client_pool"]
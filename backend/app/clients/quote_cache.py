@@ -0,0 +1,99 @@
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from alpaca.data.models.quotes import Quote as AlpacaQuote
+
+
+@dataclass(frozen=True)
+class _CachedQuote:
+    quote: AlpacaQuote
+    fetched_at: float
+
+
+class QuoteCache:
+    """Short-lived per-symbol cache of latest quotes.
+
+    Symbols missing from the cache are fetched together in a single call. A symbol
+    that is already being fetched by another thread is not requested again; the
+    caller waits for the in-flight result instead (single-flight).
+    """
+
+    def __init__(
+        self,
+        fetch_quotes: Callable[[list[str]], dict[str, AlpacaQuote]],
+        ttl_seconds: float = 0.25,
+        monotonic: Callable[[], float] = time.monotonic,
+    ):
+        self._fetch_quotes = fetch_quotes
+        self.ttl_seconds = ttl_seconds
+        self._monotonic = monotonic
+        self._lock = threading.Lock()
+        self._entries: dict[str, _CachedQuote] = {}
+        self._in_flight: dict[str, Future[dict[str, AlpacaQuote]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.fetches = 0
+
+    def get_many(self, symbols: Iterable[str]) -> dict[str, AlpacaQuote]:
+        result: dict[str, AlpacaQuote] = {}
+        to_fetch: list[str] = []
+        waiting: dict[str, Future[dict[str, AlpacaQuote]]] = {}
+        future: Future[dict[str, AlpacaQuote]] = Future()
+
+        with self._lock:
+            now = self._monotonic()
+            for symbol in dict.fromkeys(symbols):
+                entry = self._entries.get(symbol)
+                if entry is not None and now - entry.fetched_at < self.ttl_seconds:
+                    result[symbol] = entry.quote
+                    self.hits += 1
+                elif symbol in self._in_flight:
+                    waiting[symbol] = self._in_flight[symbol]
+                    self.coalesced += 1
+                else:
+                    to_fetch.append(symbol)
+                    self._in_flight[symbol] = future
+                    self.misses += 1
+
+        if to_fetch:
+            try:
+                quotes = self._fetch_quotes(to_fetch)
+            except BaseException as e:
+                with self._lock:
+                    for symbol in to_fetch:
+                        self._in_flight.pop(symbol, None)
+                future.set_exception(e)
+                raise
+            with self._lock:
+                self.fetches += 1
+                fetched_at = self._monotonic()
+                for symbol in to_fetch:
+                    self._in_flight.pop(symbol, None)
+                    if symbol in quotes:
+                        self._entries[symbol] = _CachedQuote(quotes[symbol], fetched_at)
+            future.set_result(quotes)
+            result.update(
+                {symbol: quotes[symbol] for symbol in to_fetch if symbol in quotes}
+            )
+
+        for symbol, in_flight in waiting.items():
+            quotes = in_flight.result()
+            if symbol in quotes:
+                result[symbol] = quotes[symbol]
+
+        return result
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "fetches": self.fetches,
+        }
+
+
+__all__ = ["QuoteCache"]
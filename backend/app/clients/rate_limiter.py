@@ -0,0 +1,233 @@
+import fcntl
+import heapq
+import itertools
+import os
+import struct
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Protocol
+
+
+class RequestPriority(IntEnum):
+    """Lower value is served first"""
+
+    LIQUIDATION = 0
+    ORDER_SUBMISSION = 1
+    STATUS_POLLING = 2
+    MARKET_INFO = 3
+
+
+# Share of the bucket a lane has to leave untouched for the lanes above it, so a
+# long status sync can never spend the tokens a liquidation needs
+DEFAULT_RESERVES: dict[RequestPriority, float] = {
+    RequestPriority.LIQUIDATION: 0.0,
+    RequestPriority.ORDER_SUBMISSION: 0.1,
+    RequestPriority.STATUS_POLLING: 0.25,
+    RequestPriority.MARKET_INFO: 0.4,
+}
+
+
+class TokenBucket(Protocol):
+    capacity: float
+
+    def try_acquire(self, reserve_tokens: float) -> float:
+        """Take one token if more than `reserve_tokens` would remain.
+        Returns 0 on success, otherwise the seconds until it could succeed"""
+        ...
+
+
+def _refill_and_take(
+    tokens: float,
+    elapsed: float,
+    capacity: float,
+    rate_per_second: float,
+    reserve_tokens: float,
+) -> tuple[float, float]:
+    tokens = min(capacity, tokens + max(elapsed, 0.0) * rate_per_second)
+    if tokens - 1 >= reserve_tokens:
+        return tokens - 1, 0.0
+    return tokens, (reserve_tokens + 1 - tokens) / rate_per_second
+
+
+class LocalTokenBucket:
+    """Token bucket for a single process"""
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        capacity: float,
+        monotonic: Callable[[], float] = time.monotonic,
+    ):
+        self.capacity = capacity
+        self._rate_per_second = rate_per_minute / 60
+        self._monotonic = monotonic
+        self._lock = threading.Lock()
+        self._tokens = capacity
+        self._updated_at = monotonic()
+
+    def try_acquire(self, reserve_tokens: float) -> float:
+        with self._lock:
+            now = self._monotonic()
+            self._tokens, wait = _refill_and_take(
+                self._tokens,
+                now - self._updated_at,
+                self.capacity,
+                self._rate_per_second,
+                reserve_tokens,
+            )
+            self._updated_at = now
+            return wait
+
+
+class SharedTokenBucket:
+    """Token bucket whose state lives in a small file guarded by flock, so every
+    worker process on the host (``fastapi run --workers N``) spends the same budget"""
+
+    _STATE = struct.Struct("<dd")
+
+    def __init__(self, path: str, rate_per_minute: float, capacity: float):
+        self.capacity = capacity
+        self._rate_per_second = rate_per_minute / 60
+        # flock is per open file, threads of this process still need their own lock
+        self._thread_lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            if len(os.pread(self._fd, self._STATE.size, 0)) < self._STATE.size:
+                self._write(capacity, time.time())
+
+    def _locked(self) -> "_FileLock":
+        return _FileLock(self._fd, self._thread_lock)
+
+    def _write(self, tokens: float, updated_at: float) -> None:
+        os.pwrite(self._fd, self._STATE.pack(tokens, updated_at), 0)
+
+    def try_acquire(self, reserve_tokens: float) -> float:
+        with self._locked():
+            tokens, updated_at = self._STATE.unpack(
+                os.pread(self._fd, self._STATE.size, 0)
+            )
+            now = time.time()
+            tokens, wait = _refill_and_take(
+                tokens,
+                now - updated_at,
+                self.capacity,
+                self._rate_per_second,
+                reserve_tokens,
+            )
+            self._write(tokens, now)
+            return wait
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class _FileLock:
+    def __init__(self, fd: int, thread_lock: threading.Lock):
+        self._fd = fd
+        self._thread_lock = thread_lock
+
+    def __enter__(self) -> None:
+        self._thread_lock.acquire()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *args: object) -> None:
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+@dataclass
+class LaneStats:
+    waiting: int = 0
+    acquired: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class AlpacaRateLimiter:
+    """Schedules outbound Alpaca calls over a shared token bucket.
+
+    Callers of this process queue by priority, and only the head of the queue
+    draws from the bucket. Lower lanes also have to leave a reserve in the bucket
+    (see DEFAULT_RESERVES), which keeps priorities meaningful across processes
+    sharing a SharedTokenBucket.
+    """
+
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        reserves: dict[RequestPriority, float] | None = None,
+        monotonic: Callable[[], float] = time.monotonic,
+    ):
+        self.bucket = bucket
+        self._reserves = DEFAULT_RESERVES if reserves is None else reserves
+        self._monotonic = monotonic
+        self._cond = threading.Condition()
+        self._queue: list[tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._stats = {priority: LaneStats() for priority in RequestPriority}
+
+    def _reserve_tokens(self, priority: RequestPriority) -> float:
+        return self._reserves.get(priority, 0.0) * self.bucket.capacity
+
+    def _record(self, priority: RequestPriority, waited: float) -> None:
+        stats = self._stats[priority]
+        stats.acquired += 1
+        stats.total_wait_seconds += waited
+        stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+
+    def try_acquire(self, priority: RequestPriority) -> bool:
+        """Take a token only if nobody is queued and the bucket allows it right now"""
+        with self._cond:
+            if self._queue:
+                return False
+            if self.bucket.try_acquire(self._reserve_tokens(priority)) > 0:
+                return False
+            self._record(priority, 0.0)
+            return True
+
+    def acquire(self, priority: RequestPriority) -> float:
+        """Block until a request of `priority` may be sent. Returns seconds waited"""
+        started_at = self._monotonic()
+        entry = (int(priority), next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            self._stats[priority].waiting += 1
+            self._cond.notify_all()
+            try:
+                while True:
+                    if self._queue[0] == entry:
+                        wait = self.bucket.try_acquire(self._reserve_tokens(priority))
+                        if wait <= 0:
+                            break
+                        # Woken early if a higher priority caller queues up
+                        self._cond.wait(timeout=wait)
+                    else:
+                        self._cond.wait()
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._stats[priority].waiting -= 1
+                self._cond.notify_all()
+            waited = self._monotonic() - started_at
+            self._record(priority, waited)
+            return waited
+
+    def stats(self) -> dict[str, LaneStats]:
+        with self._cond:
+            return {
+                priority.name.lower(): LaneStats(**vars(stats))
+                for priority, stats in self._stats.items()
+            }
+
+
+__all__ = [
+    "AlpacaRateLimiter",
+    "LaneStats",
+    "LocalTokenBucket",
+    "RequestPriority",
+    "SharedTokenBucket",
+    "TokenBucket",
+]
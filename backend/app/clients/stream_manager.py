@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Iterable
+from typing import Any, Literal
+
+from alpaca.data.live.websocket import DataStream
+
+from app.clients.my_alpaca_client import MyAlpacaClient
+
+logger = logging.getLogger(__name__)
+
+Channel = Literal["bars", "quotes", "trades"]
+StreamHandler = Callable[[Any], Awaitable[None]]
+
+
+class AlpacaStreamManager:
+    """Runs the stock and crypto data streams on the current event loop and
+    multiplexes bar/quote/trade subscriptions for many symbols over them.
+
+    Each (channel, symbol) has one upstream subscription and any number of
+    handlers. Subscriptions can be added and removed while the streams run.
+    Symbols containing "/" (e.g. "BTC/USD") go to the crypto stream.
+
+    alpaca-py's public subscribe methods block on the stream loop, which would
+    deadlock when called from that same loop, so the stream handler tables are
+    updated directly here.
+    """
+
+    def __init__(self, stocks_stream: DataStream, crypto_stream: DataStream):
+        self.stocks_stream = stocks_stream
+        self.crypto_stream = crypto_stream
+        self._handlers: dict[tuple[Channel, str], list[StreamHandler]] = defaultdict(
+            list
+        )
+        self._tasks: dict[DataStream, asyncio.Task[None]] = {}
+
+    @classmethod
+    def from_client(cls, client: MyAlpacaClient) -> "AlpacaStreamManager":
+        return cls(client.stocks_stream, client.crypto_stream)
+
+    def _stream_for(self, symbol: str) -> DataStream:
+        return self.crypto_stream if "/" in symbol else self.stocks_stream
+
+    def _make_dispatcher(self, channel: Channel, symbol: str) -> StreamHandler:
+        async def dispatch(data: Any) -> None:
+            for handler in list(self._handlers.get((channel, symbol), ())):
+                try:
+                    await handler(data)
+                except Exception:
+                    # One failing handler must not starve the others
+                    logger.exception("Stream handler failed for %s %s", channel, symbol)
+
+        return dispatch
+
+    def _ensure_running(self, stream: DataStream) -> None:
+        # DataStream._run_forever busy-waits until it has a subscription, so the
+        # task is only started once the stream has something to listen to
+        task = self._tasks.get(stream)
+        if task is None or task.done():
+            self._tasks[stream] = asyncio.create_task(stream._run_forever())
+
+    async def subscribe(
+        self, channel: Channel, symbols: Iterable[str], handler: StreamHandler
+    ) -> None:
+        new_upstream: dict[DataStream, list[str]] = defaultdict(list)
+        for symbol in symbols:
+            handlers = self._handlers[(channel, symbol)]
+            if not handlers:
+                stream = self._stream_for(symbol)
+                stream._handlers[channel][symbol] = self._make_dispatcher(
+                    channel, symbol
+                )
+                new_upstream[stream].append(symbol)
+            if handler not in handlers:
+                handlers.append(handler)
+
+        for stream in new_upstream:
+            if stream._running:
+                # Sends the full subscription set once for the whole batch
+                await stream._send_subscribe_msg()
+            self._ensure_running(stream)
+
+    async def unsubscribe(
+        self, channel: Channel, symbols: Iterable[str], handler: StreamHandler
+    ) -> None:
+        removed_upstream: dict[DataStream, list[str]] = defaultdict(list)
+        for symbol in symbols:
+            handlers = self._handlers.get((channel, symbol))
+            if not handlers or handler not in handlers:
+                continue
+            handlers.remove(handler)
+            if not handlers:
+                del self._handlers[(channel, symbol)]
+                stream = self._stream_for(symbol)
+                stream._handlers[channel].pop(symbol, None)
+                removed_upstream[stream].append(symbol)
+
+        for stream, removed in removed_upstream.items():
+            if stream._running:
+                await stream._send_unsubscribe_msg(channel, removed)
+
+    async def subscribe_bars(
+        self, symbols: Iterable[str], handler: StreamHandler
+    ) -> None:
+        await self.subscribe("bars", symbols, handler)
+
+    async def subscribe_quotes(
+        self, symbols: Iterable[str], handler: StreamHandler
+    ) -> None:
+        await self.subscribe("quotes", symbols, handler)
+
+    async def subscribe_trades(
+        self, symbols: Iterable[str], handler: StreamHandler
+    ) -> None:
+        await self.subscribe("trades", symbols, handler)
+
+    def subscriptions(self) -> dict[Channel, list[str]]:
+        result: dict[Channel, list[str]] = defaultdict(list)
+        for channel, symbol in self._handlers:
+            result[channel].append(symbol)
+        return dict(result)
+
+    async def wait(self) -> None:
+        """Block until every started stream has stopped"""
+        while self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+            self._tasks = {
+                stream: task for stream, task in self._tasks.items() if not task.done()
+            }
+
+    async def stop(self) -> None:
+        for stream, task in self._tasks.items():
+            await stream.stop_ws()
+            try:
+                await asyncio.wait_for(task, timeout=10)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                task.cancel()
+        self._tasks.clear()
+
+
+__all__ = ["AlpacaStreamManager", "Channel", "StreamHandler"]
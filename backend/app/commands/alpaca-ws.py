@@ -1,19 +1,54 @@
+import asyncio
 import logging
+import sys
 
 from app.api.deps.alpaca_dep import get_my_alpaca_client
 from app.clients.my_alpaca_client import AlpacaBar
+from app.clients.stream_manager import AlpacaStreamManager
+from app.core.config.app_settings import app_settings
+from app.market_data import BarResampler, BarStore, MinuteBarStore
+from app.market_data.resampler import DEFAULT_TIMEFRAMES
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-async def on_amd_bar(bar: AlpacaBar) -> None:
+
+async def on_bar(bar: AlpacaBar) -> None:
     logger.info(
-        f"New AMD 1m bar: "
+        f"New {bar.symbol} 1m bar: "
         f"{bar.timestamp} "
         f"o={bar.open} h={bar.high} l={bar.low} c={bar.close} v={bar.volume}"
     )
 
-my_alpaca_client = get_my_alpaca_client()
-logger.info("Subscribing to AMD 1m bars...")
-my_alpaca_client.subscribe_bar_crypto(pair="BTC/USD", on_bar=on_amd_bar)
 
+async def on_resampled_bar(bar: AlpacaBar) -> None:
+    logger.info(
+        f"Completed {bar.symbol} bar: "
+        f"{bar.timestamp} "
+        f"o={bar.open} h={bar.high} l={bar.low} c={bar.close} v={bar.volume}"
+    )
+
+
+# Usage: python app/commands/alpaca-ws.py [SYMBOL ...] (crypto pairs contain "/")
+async def main(symbols: list[str]) -> None:
+    stream_manager = AlpacaStreamManager.from_client(get_my_alpaca_client())
+    logger.info("Subscribing to 1m bars of %s...", ", ".join(symbols))
+    await stream_manager.subscribe_bars(symbols, on_bar)
+    bar_store = BarStore()
+    await stream_manager.subscribe_bars(symbols, bar_store.on_bar)
+    minute_bar_store = MinuteBarStore(app_settings.MINUTE_BAR_STORE_DIR)
+    await stream_manager.subscribe_bars(symbols, minute_bar_store.on_bar)
+    resampler = BarResampler()
+    for timeframe in DEFAULT_TIMEFRAMES:
+        resampler.subscribe(timeframe, on_resampled_bar)
+    await stream_manager.subscribe_bars(symbols, resampler.on_bar)
+    try:
+        await stream_manager.wait()
+    finally:
+        await stream_manager.stop()
+        minute_bar_store.close()
+        for symbol in bar_store.symbols():
+            logger.info("Kept %d %s bars", len(bar_store.window(symbol).close), symbol)
+
+
+asyncio.run(main(sys.argv[1:] or ["BTC/USD"]))
@@ -0,0 +1,74 @@
+import argparse
+import logging
+import time
+from datetime import date, timedelta
+
+from app.backtest import BacktestConfig, build_sessions, load_sessions, run_backtest
+from app.backtest.synthetic import synthetic_windows
+from app.core.config.app_settings import app_settings
+from app.market_data import MinuteBarStore
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+# Usage: python app/commands/backtest.py --symbols AAPL MSFT --start 2024-01-02 --end 2024-03-28
+#        python app/commands/backtest.py --synthetic-days 250 --symbols $(seq -f S%g 100)
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Backtest the order sell rules (target/stop/force sell) on minute bars"
+    )
+    parser.add_argument("--symbols", nargs="+", default=["AAPL", "MSFT", "SPY"])
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2024, 1, 1))
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--store", default=app_settings.MINUTE_BAR_STORE_DIR)
+    parser.add_argument(
+        "--synthetic-days",
+        type=int,
+        default=0,
+        help="Backtest random walk bars of this many days instead of the store",
+    )
+    parser.add_argument(
+        "--target", type=float, default=BacktestConfig.target_profit_ratio
+    )
+    parser.add_argument("--stop", type=float, default=BacktestConfig.stop_loss_ratio)
+    parser.add_argument(
+        "--force-sell-minutes",
+        type=float,
+        default=BacktestConfig.force_sell_before_close.total_seconds() / 60,
+    )
+    args = parser.parse_args()
+
+    config = BacktestConfig(
+        target_profit_ratio=args.target,
+        stop_loss_ratio=args.stop,
+        force_sell_before_close=timedelta(minutes=args.force_sell_minutes),
+    )
+    started = time.perf_counter()
+    if args.synthetic_days:
+        sessions = build_sessions(
+            synthetic_windows(args.symbols, args.start, args.synthetic_days), config
+        )
+    else:
+        store = MinuteBarStore(args.store)
+        sessions = load_sessions(store, args.symbols, args.start, args.end, config)
+    logger.info(
+        "Loaded %d symbol-days in %.2fs",
+        len(sessions.symbol),
+        time.perf_counter() - started,
+    )
+
+    result = run_backtest(sessions, config)
+    for trade in result.trades()[:20]:
+        logger.info("Trade: %s", trade)
+    stats = result.stats()
+    logger.info("Stats: %s", stats)
+    logger.info(
+        "Replayed %d symbol-days in %.3fs (%.0f symbol-days/s)",
+        stats["trades"],
+        result.elapsed_seconds,
+        stats["symbol_days_per_second"],
+    )
+
+
+main()
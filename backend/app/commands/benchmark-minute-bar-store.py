@@ -0,0 +1,138 @@
+import argparse
+import logging
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.market_data import MinuteBarStore
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+START = datetime(2024, 1, 2, tzinfo=timezone.utc)
+MINUTES_PER_DAY = 24 * 60
+
+
+def fill_store(store: MinuteBarStore, symbols: list[str], days: int) -> None:
+    rng = np.random.default_rng(0)
+    for symbol in symbols:
+        closes = 100 + np.cumsum(rng.normal(0, 0.1, days * MINUTES_PER_DAY))
+        for i, close in enumerate(closes):
+            store.append(
+                symbol,
+                START + timedelta(minutes=i),
+                close,
+                close + 0.05,
+                close - 0.05,
+                close,
+                1000.0,
+            )
+
+
+def random_windows(
+    symbols: list[str], days: int, window_minutes: int, count: int
+) -> list[tuple[str, datetime, datetime]]:
+    rnd = random.Random(0)
+    windows = []
+    for _ in range(count):
+        offset = rnd.randrange(days * MINUTES_PER_DAY - window_minutes)
+        start = START + timedelta(minutes=offset)
+        windows.append(
+            (rnd.choice(symbols), start, start + timedelta(minutes=window_minutes))
+        )
+    return windows
+
+
+def benchmark_store(
+    store: MinuteBarStore, windows: list[tuple[str, datetime, datetime]]
+) -> None:
+    bars = 0
+    started = time.perf_counter()
+    for symbol, start, end in windows:
+        window = store.read_range(symbol, start, end)
+        # Touch the data so the pages are actually read
+        bars += len(window.close)
+        float(window.close.sum())
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "MinuteBarStore: %d reads, %d bars in %.3fs (%.0f bars/s, %.2f ms/read)",
+        len(windows),
+        bars,
+        elapsed,
+        bars / elapsed,
+        1000 * elapsed / len(windows),
+    )
+
+
+def benchmark_alpaca(windows: list[tuple[str, datetime, datetime]]) -> None:
+    from alpaca.data.historical import StockHistoricalDataClient
+    from alpaca.data.requests import StockBarsRequest
+    from alpaca.data.timeframe import TimeFrame
+
+    from app.core.config.alpaca_settings import alpaca_settings
+
+    client = StockHistoricalDataClient(
+        api_key=alpaca_settings.ALPACA_API_KEY,
+        secret_key=alpaca_settings.ALPACA_SECRET_KEY,
+    )
+    bars = 0
+    started = time.perf_counter()
+    for symbol, start, end in windows:
+        response = client.get_stock_bars(
+            StockBarsRequest(
+                symbol_or_symbols=symbol,
+                timeframe=TimeFrame.Minute,
+                start=start,
+                end=end,
+            )
+        )
+        bars += len(response.data.get(symbol, []))  # type: ignore[union-attr]
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "StockHistoricalDataClient: %d reads, %d bars in %.3fs (%.0f bars/s, %.2f ms/read)",
+        len(windows),
+        bars,
+        elapsed,
+        bars / elapsed if elapsed else 0,
+        1000 * elapsed / len(windows),
+    )
+
+
+# Usage: python app/commands/benchmark-minute-bar-store.py [--symbols AAPL MSFT] [--offline]
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Range-read throughput of MinuteBarStore vs the Alpaca REST API"
+    )
+    parser.add_argument("--symbols", nargs="+", default=["AAPL", "MSFT", "SPY"])
+    parser.add_argument("--days", type=int, default=20)
+    parser.add_argument("--window-minutes", type=int, default=390)
+    parser.add_argument("--reads", type=int, default=1000)
+    parser.add_argument(
+        "--api-reads",
+        type=int,
+        default=20,
+        help="Reads to time against the REST API (it is rate limited)",
+    )
+    parser.add_argument(
+        "--offline", action="store_true", help="Skip the Alpaca REST API part"
+    )
+    args = parser.parse_args()
+
+    windows = random_windows(args.symbols, args.days, args.window_minutes, args.reads)
+    with tempfile.TemporaryDirectory() as root:
+        store = MinuteBarStore(root)
+        logger.info(
+            "Writing %d days of bars for %s...", args.days, ", ".join(args.symbols)
+        )
+        fill_store(store, args.symbols, args.days)
+        store.close()
+        benchmark_store(MinuteBarStore(root), windows)
+
+    if not args.offline:
+        benchmark_alpaca(windows[: args.api_reads])
+
+
+main()
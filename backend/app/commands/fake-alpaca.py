@@ -0,0 +1,36 @@
+import argparse
+
+import uvicorn
+
+from app.fake_alpaca import FakeBroker, FakeBrokerConfig, create_fake_alpaca_app
+
+
+# Usage: python app/commands/fake-alpaca.py [--port 8001] [--fill-latency 0.5] ...
+# then run the backend with ALPACA_URL_OVERRIDE=http://127.0.0.1:8001
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local fake Alpaca broker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--fill-latency", type=float, default=0.0)
+    parser.add_argument("--partial-fill-ratio", type=float, default=0.0)
+    parser.add_argument("--reject-ratio", type=float, default=0.0)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--price", type=float, default=100.0)
+    parser.add_argument("--bar-interval", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeBrokerConfig(
+        fill_latency_seconds=args.fill_latency,
+        partial_fill_ratio=args.partial_fill_ratio,
+        reject_ratio=args.reject_ratio,
+        rate_limit_ratio=args.rate_limit_ratio,
+        default_price=args.price,
+        bar_interval_seconds=args.bar_interval,
+        seed=args.seed,
+    )
+    app = create_fake_alpaca_app(FakeBroker(config))
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+main()
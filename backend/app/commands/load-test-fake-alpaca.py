@@ -0,0 +1,122 @@
+import argparse
+import logging
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.clients.my_alpaca_client import MyAlpacaClient
+from app.crud.order_crud import OrderCrud
+from app.fake_alpaca import FakeAlpacaThread, FakeBroker, FakeBrokerConfig
+from app.models.order import Order, OrderCreate, VirtualOrderStatus
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+# Per-order transition logs would drown the results
+logging.getLogger("app").setLevel(logging.WARNING)
+logging.getLogger("transitions").setLevel(logging.WARNING)
+
+
+def create_orders(
+    engine_url: str,
+    alpaca_client: MyAlpacaClient,
+    count: int,
+    symbols: int,
+    workers: int,
+) -> None:
+    connect_args = (
+        {"check_same_thread": False} if engine_url.startswith("sqlite") else {}
+    )
+    engine = create_engine(engine_url, connect_args=connect_args)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(email="load-test@example.com", hashed_password="")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+
+    def create(i: int) -> None:
+        with Session(engine) as session:
+            OrderCrud.create_order_with_alpaca_order(
+                user,
+                OrderCreate(symbol=f"SYM{i % symbols}", amount=100),
+                session,
+                alpaca_client,
+            )
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(workers) as executor:
+        list(executor.map(create, range(count)))
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "Created %d orders in %.2fs (%.0f orders/s)", count, elapsed, count / elapsed
+    )
+
+    # Sync rounds like POST /orders/sync until nothing is left pending
+    started = time.perf_counter()
+    rounds = 0
+    with Session(engine) as session:
+        while True:
+            rounds += 1
+            orders = session.exec(
+                select(Order).where(
+                    Order.status.in_(  # type: ignore[attr-defined]
+                        [
+                            VirtualOrderStatus.BUY_PENDING_NEW,
+                            VirtualOrderStatus.BUY_ACCEPTED,
+                        ]
+                    )
+                )
+            ).all()
+            if not orders:
+                break
+            alpaca_orders = OrderCrud.fetch_alpaca_orders(orders, alpaca_client)
+            for order in orders:
+                OrderCrud.sync_order_status(order, alpaca_client, alpaca_orders)
+                session.add(order)
+            session.commit()
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "Synced %d orders to BUY_FILLED in %d rounds, %.2fs (%.0f orders/s)",
+        count,
+        rounds,
+        elapsed,
+        count / elapsed,
+    )
+
+
+# Usage: python app/commands/load-test-fake-alpaca.py [--orders 5000] [--fill-latency 0.2]
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run the OrderCrud create and sync paths against a fake Alpaca"
+    )
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--fill-latency", type=float, default=0.2)
+    parser.add_argument("--partial-fill-ratio", type=float, default=0.2)
+    parser.add_argument(
+        "--db", default=None, help="Database URL (a throwaway SQLite file by default)"
+    )
+    args = parser.parse_args()
+
+    config = FakeBrokerConfig(
+        fill_latency_seconds=args.fill_latency,
+        partial_fill_ratio=args.partial_fill_ratio,
+    )
+    with FakeAlpacaThread(FakeBroker(config)) as fake_alpaca:
+        alpaca_client = MyAlpacaClient(
+            fake_alpaca.credentials(), http_pool_maxsize=args.workers
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            engine_url = args.db or f"sqlite:///{tmp}/load-test.db"
+            create_orders(
+                engine_url, alpaca_client, args.orders, args.symbols, args.workers
+            )
+        logger.info("Fake Alpaca: %s", fake_alpaca.broker.stats())
+        logger.info("Connections: %s", alpaca_client.connection_stats())
+
+
+main()
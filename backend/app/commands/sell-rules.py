@@ -0,0 +1,38 @@
+import asyncio
+import logging
+
+from sqlmodel import Session
+
+from app.api.deps.alpaca_dep import get_my_alpaca_client
+from app.clients.stream_manager import AlpacaStreamManager
+from app.core.db import engine
+from app.trading import SellRuleEvaluator
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Orders reaching BUY_FILLED are picked up by the next reload. Their force sell
+# deadlines are kept by the order sync leader (see app/main.py)
+RELOAD_SECONDS = 30
+
+
+# Usage: python app/commands/sell-rules.py
+async def main() -> None:
+    alpaca_client = get_my_alpaca_client()
+    evaluator = SellRuleEvaluator(lambda: Session(engine), alpaca_client)
+    stream_manager = AlpacaStreamManager.from_client(alpaca_client)
+    subscribed: set[str] = set()
+    try:
+        while True:
+            symbols = await asyncio.to_thread(evaluator.load)
+            new_symbols = sorted(set(symbols) - subscribed)
+            if new_symbols:
+                logger.info("Watching 1m bars of %s", ", ".join(new_symbols))
+                await stream_manager.subscribe_bars(new_symbols, evaluator.on_bar)
+                subscribed.update(new_symbols)
+            await asyncio.sleep(RELOAD_SECONDS)
+    finally:
+        await stream_manager.stop()
+
+
+asyncio.run(main())
@@ -0,0 +1,114 @@
+import argparse
+import logging
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.backtest import BacktestConfig, build_sessions, load_sessions, run_sweep
+from app.backtest.sweep import sweep_grid
+from app.backtest.synthetic import synthetic_windows
+from app.core.config.app_settings import app_settings
+from app.market_data import MinuteBarStore
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def ratios(start: float, stop: float, step: float) -> list[float]:
+    return [
+        round(value, 6) for value in np.arange(start, stop + step / 2, step).tolist()
+    ]
+
+
+# Usage: python app/commands/sweep-backtest.py --symbols AAPL MSFT --start 2024-01-02
+#        python app/commands/sweep-backtest.py --synthetic-days 100 --workers 1 2 4 8
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Rank target/stop/force-sell settings by backtesting a grid of them"
+    )
+    parser.add_argument("--symbols", nargs="+", default=["AAPL", "MSFT", "SPY"])
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2024, 1, 1))
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--store", default=app_settings.MINUTE_BAR_STORE_DIR)
+    parser.add_argument(
+        "--synthetic-days",
+        type=int,
+        default=0,
+        help="Sweep over random walk bars of this many days instead of the store",
+    )
+    parser.add_argument(
+        "--targets",
+        nargs=3,
+        type=float,
+        default=[1.01, 1.10, 0.01],
+        help="START STOP STEP",
+    )
+    parser.add_argument(
+        "--stops",
+        nargs=3,
+        type=float,
+        default=[0.90, 0.99, 0.01],
+        help="START STOP STEP",
+    )
+    parser.add_argument(
+        "--force-sell-minutes", nargs="+", type=int, default=[0, 15, 30, 60, 120]
+    )
+    parser.add_argument(
+        "--workers",
+        nargs="+",
+        type=int,
+        default=[0],
+        help="Pool sizes to run the sweep with, to measure scaling (0: all cores)",
+    )
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.synthetic_days:
+        sessions = build_sessions(
+            synthetic_windows(args.symbols, args.start, args.synthetic_days),
+            BacktestConfig(),
+        )
+    else:
+        store = MinuteBarStore(args.store)
+        sessions = load_sessions(
+            store, args.symbols, args.start, args.end, BacktestConfig()
+        )
+    configs = sweep_grid(
+        ratios(*args.targets),
+        ratios(*args.stops),
+        [timedelta(minutes=minutes) for minutes in args.force_sell_minutes],
+    )
+    logger.info(
+        "Sweeping %d configs over %d symbol-days", len(configs), len(sessions.symbol)
+    )
+
+    rows: list[dict[str, object]] = []
+    baseline = None
+    for workers in args.workers:
+        started = time.perf_counter()
+        rows = run_sweep(sessions, configs, workers=workers or None)
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed * (workers or 1)
+        logger.info(
+            "%s workers: %.2fs, %.0f symbol-days/s, %.1fx one worker's throughput",
+            workers or "all",
+            elapsed,
+            len(configs) * len(sessions.symbol) / elapsed,
+            baseline / elapsed,
+        )
+
+    logger.info(
+        f"{'target':>8} {'stop':>6} {'force':>6} {'trades':>7} {'win':>6} "
+        f"{'pnl':>12} {'avg ret':>9} {'max dd':>10}"
+    )
+    for row in rows[: args.top]:
+        logger.info(
+            f"{row['target_profit_ratio']:>8.3f} {row['stop_loss_ratio']:>6.3f} "
+            f"{row['force_sell_minutes']:>6.0f} {row['trades']:>7} "
+            f"{row['win_rate']:>6.1%} {row['total_pnl']:>12.2f} "
+            f"{row['average_return']:>9.4%} {row['max_drawdown']:>10.2f}"
+        )
+
+
+main()
@@ -0,0 +1,41 @@
+import asyncio
+import logging
+
+from sqlmodel import Session
+
+from app.api.deps.alpaca_dep import get_my_alpaca_client
+from app.core.db import engine
+from app.trading import TradeUpdateConsumer
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Catches up on events missed while the stream was reconnecting
+RECONCILE_SECONDS = 300
+
+
+async def reconcile_forever(consumer: TradeUpdateConsumer) -> None:
+    while True:
+        try:
+            await consumer.reconcile()
+        except Exception:
+            logger.exception("Reconciliation failed")
+        await asyncio.sleep(RECONCILE_SECONDS)
+
+
+# Usage: python app/commands/trade-updates.py
+async def main() -> None:
+    alpaca_client = get_my_alpaca_client()
+    consumer = TradeUpdateConsumer(lambda: Session(engine), alpaca_client)
+    trading_stream = alpaca_client.trading_stream
+    trading_stream.subscribe_trade_updates(consumer.on_trade_update)
+    reconcile_task = asyncio.create_task(reconcile_forever(consumer))
+    logger.info("Listening to trade updates...")
+    try:
+        await trading_stream._run_forever()  # type: ignore[no-untyped-call]
+    finally:
+        reconcile_task.cancel()
+        await trading_stream.stop_ws()
+
+
+asyncio.run(main())
@@ -1,3 +1,4 @@
+import tempfile
 from typing import Any
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -16,6 +17,25 @@ class AlpacaSettings(BaseSettings):
     ALPACA_API_KEY: str
     ALPACA_SECRET_KEY: str
     ALPACA_PAPER: bool
+    # How long a fetched market clock is trusted before asking Alpaca again
+    ALPACA_CLOCK_TTL_SECONDS: float = 60.0
+    # Latest quotes are reused for this long (sub-second) across callers
+    ALPACA_QUOTE_TTL_SECONDS: float = 0.25
+    # Keep-alive connections per Alpaca host, shared by all request threads of a worker
+    ALPACA_HTTP_POOL_MAXSIZE: int = 20
+    # Upper bound of concurrent connections of the async client (async routes)
+    ALPACA_ASYNC_MAX_CONNECTIONS: int = 100
+    # Outbound request budget. Alpaca allows 200/min, keep some headroom
+    ALPACA_RATE_LIMIT_PER_MINUTE: float = 180
+    ALPACA_RATE_LIMIT_BURST: float = 20
+    # Share the budget between all workers of the host through a token bucket
+    # file; off, every worker process limits itself separately
+    ALPACA_RATE_LIMIT_SHARED: bool = True
+    # Directory of the shared token bucket file
+    ALPACA_RATE_LIMIT_SHARED_DIR: str = tempfile.gettempdir()
+    # Send every Alpaca request and stream to this base URL instead, e.g. the
+    # fake broker of app/commands/fake-alpaca.py (http://127.0.0.1:8001)
+    ALPACA_URL_OVERRIDE: str | None = None
 
     # used property instead of computed_field to mypy error
     @property
@@ -24,6 +44,7 @@ class AlpacaSettings(BaseSettings):
             "api-key": self.ALPACA_API_KEY,
             "secret-key": self.ALPACA_SECRET_KEY,
             "paper": self.ALPACA_PAPER,
+            "url-override": self.ALPACA_URL_OVERRIDE,
         }
 
 
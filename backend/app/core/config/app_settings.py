@@ -67,6 +67,11 @@ class Settings(BaseSettings):
         return self
 
     EMAIL_RESET_TOKEN_EXPIRE_HOURS: int = 48
+    # Root directory of the on-disk 1-minute bar history (MinuteBarStore)
+    MINUTE_BAR_STORE_DIR: str = "data/minute-bars"
+    # Sync the orders in the background of every worker (OrderSyncScheduler).
+    # Off where something else drives /orders/sync, e.g. the tests
+    ORDER_SYNC_SCHEDULER_ENABLED: bool = True
 
     @computed_field  # type: ignore[prop-decorator]
     @property
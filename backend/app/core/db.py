@@ -1,6 +1,9 @@
 from sqlmodel import Session, select
 
 import app.core.create_db_engine
+
+# Registers the session hooks that publish order changes
+import app.core.order_events  # noqa: F401
 from app.core.config.super_user_settings import super_user_settings
 from app.core.security import get_password_hash
 from app.crud import crud
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os
+import socket
+import zlib
+from collections import deque
+from collections.abc import Callable, Coroutine
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+import psycopg
+from sqlalchemy import Engine
+
+logger = logging.getLogger(__name__)
+
+# First key of every advisory lock taken here, the second one is per name
+ADVISORY_LOCK_NAMESPACE = 0x6D7472  # "mtr"
+# How often a follower tries to take over; bounds the failover time after the
+# leader's connection is gone
+RETRY_SECONDS = 2.0
+# How often the leader checks that its lock connection is alive
+CHECK_SECONDS = 2.0
+MAX_HANDOFFS = 50
+
+
+@dataclass
+class LeadershipChange:
+    at: datetime
+    # Identity of the process that became leader or stopped being one
+    identity: str
+    elected: bool
+    reason: str
+
+
+@dataclass
+class LeaderStatus:
+    name: str
+    identity: str
+    is_leader: bool
+    # Identity of the current lock holder, as last seen by this process
+    leader: str | None
+    leader_since: datetime | None
+    handoffs: list[LeadershipChange] = field(default_factory=list)
+
+
+class LeaderElection:
+    """Runs `lead()` in exactly one process of the cluster: the one holding the
+    Postgres advisory lock of `name`.
+
+    The lock is taken with pg_try_advisory_lock on a connection of its own and
+    held for as long as that connection lives, so when the leader process dies
+    Postgres frees it and a follower (trying every `retry_seconds`) takes over.
+    The leader checks its connection every `check_seconds` and stops leading as
+    soon as it is lost. Between the two a new leader may start while the old
+    one finishes its current step; order sells are idempotent (see
+    OrderCrud.place_sell) so that overlap does not sell twice.
+
+    The lock connection's application_name is this process' identity, so the
+    holder can be seen from any process (and in pg_stat_activity). Without
+    Postgres (SQLite) there is a single process, which leads.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        name: str,
+        lead: Callable[[], Coroutine[Any, Any, None]],
+        identity: str | None = None,
+        retry_seconds: float = RETRY_SECONDS,
+        check_seconds: float = CHECK_SECONDS,
+    ):
+        self.engine = engine
+        self.name = name
+        self.lead = lead
+        self.identity = identity or f"{socket.gethostname()}:{os.getpid()}"
+        self.retry_seconds = retry_seconds
+        self.check_seconds = check_seconds
+        self.lock_key = (ADVISORY_LOCK_NAMESPACE, zlib.crc32(name.encode()) >> 1)
+        self.is_leader = False
+        self.leader: str | None = None
+        self.leader_since: datetime | None = None
+        self.handoffs: deque[LeadershipChange] = deque(maxlen=MAX_HANDOFFS)
+        self._task: asyncio.Task[None] | None = None
+
+    def status(self) -> LeaderStatus:
+        return LeaderStatus(
+            name=self.name,
+            identity=self.identity,
+            is_leader=self.is_leader,
+            leader=self.leader,
+            leader_since=self.leader_since,
+            handoffs=list(self.handoffs),
+        )
+
+    def _record(self, elected: bool, reason: str) -> None:
+        now = datetime.now(timezone.utc)
+        self.is_leader = elected
+        if elected:
+            self.leader, self.leader_since = self.identity, now
+        elif self.leader == self.identity:
+            self.leader, self.leader_since = None, None
+        self.handoffs.append(LeadershipChange(now, self.identity, elected, reason))
+        logger.info(
+            "%s %s %s leader (%s)",
+            self.identity,
+            "became" if elected else "is no longer",
+            self.name,
+            reason,
+        )
+
+    async def _lead_while(self, alive: Callable[[], Coroutine[Any, Any, None]]) -> None:
+        """Leads until `alive` raises (or this task is cancelled)"""
+        self._record(True, "lock acquired")
+        reason = "stopped"
+        lead_task = asyncio.create_task(self.lead())
+        try:
+            while True:
+                await asyncio.sleep(self.check_seconds)
+                await alive()
+                if lead_task.done():
+                    if not lead_task.cancelled() and lead_task.exception():
+                        logger.error(
+                            "%s leader loop failed, restarting it",
+                            self.name,
+                            exc_info=lead_task.exception(),
+                        )
+                    lead_task = asyncio.create_task(self.lead())
+        except Exception as error:
+            reason = f"lock connection lost: {error}"
+            raise
+        finally:
+            lead_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await lead_task
+            self._record(False, reason)
+
+    async def run(self) -> None:
+        if self.engine.dialect.name != "postgresql":
+
+            async def always() -> None:
+                return None
+
+            await self._lead_while(always)
+            return
+
+        conninfo = self.engine.url.set(drivername="postgresql").render_as_string(
+            hide_password=False
+        )
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    conninfo,
+                    autocommit=True,
+                    application_name=self.identity,
+                    # Notice a dead network path to the database quickly too
+                    keepalives_idle=10,
+                    keepalives_interval=5,
+                    keepalives_count=3,
+                ) as connection:
+                    while not await self._try_lock(connection):
+                        await asyncio.sleep(self.retry_seconds)
+
+                    async def alive() -> None:
+                        await connection.execute("SELECT 1")
+
+                    await self._lead_while(alive)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("%s leader election failed, retrying", self.name)
+            await asyncio.sleep(self.retry_seconds)
+
+    async def _try_lock(self, connection: psycopg.AsyncConnection[Any]) -> bool:
+        cursor = await connection.execute(
+            "SELECT pg_try_advisory_lock(%s::int, %s::int)", self.lock_key
+        )
+        row = await cursor.fetchone()
+        if row is not None and row[0]:
+            return True
+        # Who holds it (a two-key advisory lock has objsubid 2)
+        cursor = await connection.execute(
+            """
+            SELECT activity.application_name, activity.backend_start
+            FROM pg_locks AS locks
+            JOIN pg_stat_activity AS activity ON activity.pid = locks.pid
+            WHERE locks.locktype = 'advisory' AND locks.granted
+              AND locks.classid = %s::oid AND locks.objid = %s::oid
+              AND locks.objsubid = 2
+            """,
+            self.lock_key,
+        )
+        holder = await cursor.fetchone()
+        if holder is None:
+            self.leader, self.leader_since = None, None
+        elif holder[0] != self.leader:
+            self.leader, self.leader_since = holder[0], holder[1]
+            self.handoffs.append(
+                LeadershipChange(
+                    datetime.now(timezone.utc), holder[0], True, "seen holding the lock"
+                )
+            )
+            logger.info("%s leader is %s", self.name, self.leader)
+        return False
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop leading (closing the lock connection hands over to a follower)"""
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+__all__ = ["LeaderElection", "LeaderStatus", "LeadershipChange"]
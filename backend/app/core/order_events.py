@@ -0,0 +1,201 @@
+import asyncio
+import json
+import logging
+import threading
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager, suppress
+from dataclasses import dataclass, field
+from uuid import UUID
+
+import psycopg
+from sqlalchemy import Engine, event, text
+from sqlalchemy.orm import Session, UOWTransaction
+from sqlalchemy.orm.attributes import get_history
+
+from app.models.order import Order, OrderPublic
+
+logger = logging.getLogger(__name__)
+
+ORDER_EVENTS_CHANNEL = "order_events"
+# Events a slow client may fall behind by before the oldest are dropped
+CLIENT_QUEUE_SIZE = 100
+LISTEN_RETRY_SECONDS = 5.0
+
+_PENDING_KEY = "pending_order_events"
+
+
+def order_event_payload(order: Order) -> str:
+    return json.dumps(
+        {
+            "owner_id": str(order.owner_id),
+            "order": OrderPublic.model_validate(order).model_dump(mode="json"),
+        }
+    )
+
+
+@dataclass(eq=False)
+class _Subscriber:
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue[str] = field(
+        default_factory=lambda: asyncio.Queue(CLIENT_QUEUE_SIZE)
+    )
+
+    def put(self, message: str) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+
+class OrderEventBroker:
+    """Hands committed order changes to the subscribers of the order's owner.
+
+    On Postgres every commit that changes an order sends a NOTIFY (see
+    `_after_flush`), and each worker process runs a single LISTEN connection,
+    started with its first subscriber, that feeds its local subscribers; so
+    changes made by any worker or command reach every worker. Other databases
+    (SQLite in tests) publish in-process after the commit.
+
+    Besides the owners' subscribers, watchers (see `watch`) get the changes of
+    every order, e.g. to keep an in-memory view of the orders up to date.
+    """
+
+    def __init__(self) -> None:
+        self.engine: Engine | None = None
+        self._subscribers: dict[UUID, set[_Subscriber]] = {}
+        self._watchers: set[Callable[[OrderPublic], None]] = set()
+        self._lock = threading.Lock()
+        self._listener: asyncio.Task[None] | None = None
+
+    def listen_to(self, engine: Engine) -> None:
+        """Use the engine's Postgres database for cross-process events"""
+        self.engine = engine
+
+    def publish(self, payload: str) -> None:
+        """Deliver an order_event_payload to the local subscribers, from any thread"""
+        event_data = json.loads(payload)
+        message = json.dumps(event_data["order"])
+        with self._lock:
+            subscribers = list(self._subscribers.get(UUID(event_data["owner_id"]), ()))
+            watchers = list(self._watchers)
+        for subscriber in subscribers:
+            # The loop may be gone already if the client just disconnected
+            with suppress(RuntimeError):
+                subscriber.loop.call_soon_threadsafe(subscriber.put, message)
+        if watchers:
+            order = OrderPublic.model_validate(event_data["order"])
+            for watcher in watchers:
+                try:
+                    watcher(order)
+                except Exception:
+                    logger.exception("Order event watcher failed on order %s", order.id)
+
+    @asynccontextmanager
+    async def subscribe(self, owner_id: UUID) -> AsyncIterator[asyncio.Queue[str]]:
+        """A queue of the owner's changed orders (OrderPublic JSON)"""
+        subscriber = _Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(owner_id, set()).add(subscriber)
+        self._ensure_listener()
+        try:
+            yield subscriber.queue
+        finally:
+            with self._lock:
+                subscribers = self._subscribers[owner_id]
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[owner_id]
+
+    @contextmanager
+    def watch(self, watcher: Callable[[OrderPublic], None]) -> Iterator[None]:
+        """Call `watcher` with every committed order change, of any owner, from
+        the publishing thread (so it must be thread-safe and quick). Must be
+        entered in a running event loop, which runs the Postgres listener"""
+        with self._lock:
+            self._watchers.add(watcher)
+        self._ensure_listener()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._watchers.discard(watcher)
+
+    def _ensure_listener(self) -> None:
+        if (
+            self.engine is None
+            or self.engine.dialect.name != "postgresql"
+            or (self._listener is not None and not self._listener.done())
+        ):
+            return
+        conninfo = self.engine.url.set(drivername="postgresql").render_as_string(
+            hide_password=False
+        )
+        self._listener = asyncio.create_task(self._listen(conninfo))
+
+    async def _listen(self, conninfo: str) -> None:
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    conninfo, autocommit=True
+                ) as connection:
+                    await connection.execute(f"LISTEN {ORDER_EVENTS_CHANNEL}")
+                    logger.info("Listening to %s", ORDER_EVENTS_CHANNEL)
+                    async for notify in connection.notifies():
+                        self.publish(notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(
+                    "%s listener failed, reconnecting", ORDER_EVENTS_CHANNEL
+                )
+            await asyncio.sleep(LISTEN_RETRY_SECONDS)
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+
+
+order_event_broker = OrderEventBroker()
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, _flush_context: UOWTransaction) -> None:
+    payloads = [
+        order_event_payload(instance)
+        for instance in (*session.new, *session.dirty)
+        if isinstance(instance, Order) and get_history(instance, "status").has_changes()
+    ]
+    if not payloads:
+        return
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        # Delivered by Postgres when (and only if) the transaction commits
+        for payload in payloads:
+            connection.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": ORDER_EVENTS_CHANNEL, "payload": payload},
+            )
+    else:
+        session.info.setdefault(_PENDING_KEY, []).extend(payloads)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    payloads: list[str] = session.info.pop(_PENDING_KEY, [])
+    for payload in payloads:
+        order_event_broker.publish(payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+__all__ = [
+    "ORDER_EVENTS_CHANNEL",
+    "OrderEventBroker",
+    "order_event_broker",
+    "order_event_payload",
+]
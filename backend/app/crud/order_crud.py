@@ -1,15 +1,37 @@
 import logging
+from collections.abc import Iterator, Sequence
 from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
 
 from alpaca.common.exceptions import APIError
-from sqlmodel import Session
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, col, select
 
 from app.clients.my_alpaca_client import AlpacaOrder, AlpacaOrderStatus, MyAlpacaClient
-from app.models.order import Order, OrderCreate, VirtualOrderStatus
+from app.models.order import (
+    TERMINAL_STATUSES,
+    Order,
+    OrderCreate,
+    VirtualOrderStatus,
+)
 from app.models.user import User
 
 logger = logging.getLogger(__name__)
 
+# Alpaca order statuses of an order that was taken but is not filled yet
+ACCEPTED_ALPACA_STATUSES = (AlpacaOrderStatus.ACCEPTED, AlpacaOrderStatus.NEW)
+FAILED_ALPACA_STATUSES = (
+    AlpacaOrderStatus.CANCELED,
+    AlpacaOrderStatus.EXPIRED,
+    AlpacaOrderStatus.REJECTED,
+)
+ACTIVE_ORDERS_PAGE_SIZE = 500
+# Furthest back the order listing goes; the alpaca orders of older active
+# orders (e.g. stuck ones) are fetched one by one rather than listing every
+# order since then on each sync
+ORDER_LISTING_LOOKBACK = timedelta(days=1)
+
 
 @dataclass
 class OrderSyncData:
@@ -36,26 +58,103 @@ class OrderSyncData:
 
 
 class OrderCrud:
+    @classmethod
+    def active_order_pages(
+        cls, session: Session, page_size: int = ACTIVE_ORDERS_PAGE_SIZE
+    ) -> Iterator[Sequence[Order]]:
+        """The orders that are not done yet (see TERMINAL_STATUSES), oldest first,
+        `page_size` at a time. Read through a server-side cursor on Postgres, so a
+        large working set is never loaded at once; the cursor is closed by the
+        session's next commit, so commit only after the last page"""
+        statement = (
+            select(Order)
+            # Matches the ix_order_active_status partial index
+            .where(col(Order.status).not_in(TERMINAL_STATUSES))
+            .order_by(col(Order.id))
+            # The owners are logged by sync_order_status, one query per page
+            .options(selectinload(Order.owner))  # type: ignore[arg-type]
+            .execution_options(yield_per=page_size)
+        )
+        yield from session.exec(statement).partitions()
+
+    @classmethod
+    def fetch_alpaca_orders(
+        cls, orders: Sequence[Order], alpaca_client: MyAlpacaClient
+    ) -> dict[UUID, AlpacaOrder]:
+        """Fetch the alpaca orders of many orders at once (a paginated listing
+        instead of one or two requests per order), keyed by alpaca order id"""
+        created_at = [
+            order.created_at.replace(tzinfo=order.created_at.tzinfo or timezone.utc)
+            for order in orders
+            if order.alpaca_buy_order_id
+        ]
+        if not created_at:
+            return {}
+        # The alpaca buy order is submitted right before our order row is created
+        after = max(
+            min(created_at) - timedelta(minutes=5),
+            datetime.now(timezone.utc) - ORDER_LISTING_LOOKBACK,
+        )
+        return alpaca_client.get_orders_after(after)
+
+    @classmethod
+    def _get_alpaca_order(
+        cls,
+        alpaca_order_id: UUID,
+        alpaca_client: MyAlpacaClient,
+        alpaca_orders: dict[UUID, AlpacaOrder] | None,
+    ) -> AlpacaOrder:
+        if alpaca_orders is not None and alpaca_order_id in alpaca_orders:
+            return alpaca_orders[alpaca_order_id]
+        return alpaca_client.get_order_by_id(alpaca_order_id)
+
     @classmethod
     def _fetch_order_data(
-        cls, order: Order, alpaca_client: MyAlpacaClient
+        cls,
+        order: Order,
+        alpaca_client: MyAlpacaClient,
+        alpaca_orders: dict[UUID, AlpacaOrder] | None = None,
     ) -> OrderSyncData:
         if not order.alpaca_buy_order_id:
             raise Exception("Order was created but no matching alpaca buy order")
 
-        buy_order = alpaca_client.get_order_by_id(order.alpaca_buy_order_id)
+        buy_order = cls._get_alpaca_order(
+            order.alpaca_buy_order_id, alpaca_client, alpaca_orders
+        )
         sell_order = None
         if order.alpaca_sell_order_id:
-            sell_order = alpaca_client.get_order_by_id(order.alpaca_sell_order_id)
+            sell_order = cls._get_alpaca_order(
+                order.alpaca_sell_order_id, alpaca_client, alpaca_orders
+            )
 
         return OrderSyncData(buy_order=buy_order, sell_order=sell_order)
 
+    @classmethod
+    def _buy_order_failed(
+        cls, order: Order, alpaca_order: AlpacaOrder, alpaca_client: MyAlpacaClient
+    ) -> None:
+        """The alpaca buy order was canceled, expired or rejected"""
+        # A string ("0") in pushed trade updates
+        if alpaca_order.filled_qty is not None and float(alpaca_order.filled_qty) > 0:
+            # Partially filled before that: the shares bought are sold as usual
+            logger.info("Order id=%s buy ended partially filled", order.id)
+            assert alpaca_order.filled_avg_price is not None
+            order.buy_filled(
+                filled_avg_price=float(alpaca_order.filled_avg_price),
+                buy_filled_qty=float(alpaca_order.filled_qty),
+                market_close_at=alpaca_client.get_next_close(),
+            )
+        else:
+            order.buy_failed(f"Alpaca buy order {alpaca_order.status.value}")
+
     @classmethod
     def _handle_buy_pending_new(
         cls, order: Order, sync_data: OrderSyncData, alpaca_client: MyAlpacaClient
     ) -> None:
         if sync_data.buy_order.status == AlpacaOrderStatus.ACCEPTED:
             order.buy_accepted()
+        elif sync_data.buy_order.status in FAILED_ALPACA_STATUSES:
+            cls._buy_order_failed(order, sync_data.buy_order, alpaca_client)
         elif sync_data.buy_order.status == AlpacaOrderStatus.FILLED:
             logger.info("Order id=%s moving from buying to filled", order.id)
             market_close_at = alpaca_client.get_next_close()
@@ -84,6 +183,8 @@ class OrderCrud:
                 buy_filled_qty=sync_data.get_buy_order_filled_qty(),
                 market_close_at=market_close_at,
             )
+        elif sync_data.buy_order.status in FAILED_ALPACA_STATUSES:
+            cls._buy_order_failed(order, sync_data.buy_order, alpaca_client)
 
     @classmethod
     def _handle_sell_pending_new(cls, order: Order, sync_data: OrderSyncData) -> None:
@@ -99,19 +200,126 @@ class OrderCrud:
                 filled_avg_price=sync_data.get_sell_order_filled_avg_price(),
                 filled_qty=sync_data.get_sell_order_filled_qty(),
             )
+        elif sync_data.sell_order.status in FAILED_ALPACA_STATUSES:
+            order.sell_failed(f"Alpaca sell order {sync_data.sell_order.status.value}")
+
+    @classmethod
+    def _handle_sell_accepted(cls, order: Order, sync_data: OrderSyncData) -> None:
+        if not sync_data.sell_order:
+            raise Exception("Order in sell_accepted but no matching alpaca sell order")
+
+        if sync_data.sell_order.status == AlpacaOrderStatus.FILLED:
+            order.sell_filled(
+                filled_avg_price=sync_data.get_sell_order_filled_avg_price(),
+                filled_qty=sync_data.get_sell_order_filled_qty(),
+            )
+        elif sync_data.sell_order.status in FAILED_ALPACA_STATUSES:
+            order.sell_failed(f"Alpaca sell order {sync_data.sell_order.status.value}")
+
+    @classmethod
+    def apply_alpaca_order_update(
+        cls, order: Order, alpaca_order: AlpacaOrder, alpaca_client: MyAlpacaClient
+    ) -> None:
+        """Move the order along according to a pushed update of one of its alpaca
+        orders (trade updates stream). Stale or repeated updates are ignored"""
+        status = alpaca_order.status
+        if alpaca_order.id == order.alpaca_buy_order_id:
+            if status == AlpacaOrderStatus.FILLED and order.status in (
+                VirtualOrderStatus.BUY_PENDING_NEW,
+                VirtualOrderStatus.BUY_ACCEPTED,
+            ):
+                assert alpaca_order.filled_avg_price is not None
+                assert alpaca_order.filled_qty is not None
+                order.buy_filled(
+                    filled_avg_price=float(alpaca_order.filled_avg_price),
+                    buy_filled_qty=float(alpaca_order.filled_qty),
+                    market_close_at=alpaca_client.get_next_close(),
+                )
+            elif (
+                status in ACCEPTED_ALPACA_STATUSES
+                and order.status == VirtualOrderStatus.BUY_PENDING_NEW
+            ):
+                order.buy_accepted()
+            elif status in FAILED_ALPACA_STATUSES and order.status in (
+                VirtualOrderStatus.BUY_PENDING_NEW,
+                VirtualOrderStatus.BUY_ACCEPTED,
+            ):
+                cls._buy_order_failed(order, alpaca_order, alpaca_client)
+        elif alpaca_order.id == order.alpaca_sell_order_id:
+            if status == AlpacaOrderStatus.FILLED and order.status in (
+                VirtualOrderStatus.SELL_PENDING_NEW,
+                VirtualOrderStatus.SELL_ACCEPTED,
+            ):
+                assert alpaca_order.filled_avg_price is not None
+                assert alpaca_order.filled_qty is not None
+                order.sell_filled(
+                    filled_avg_price=float(alpaca_order.filled_avg_price),
+                    filled_qty=float(alpaca_order.filled_qty),
+                )
+            elif (
+                status in ACCEPTED_ALPACA_STATUSES
+                and order.status == VirtualOrderStatus.SELL_PENDING_NEW
+            ):
+                order.sell_accepted()
+            elif status in FAILED_ALPACA_STATUSES and order.status in (
+                VirtualOrderStatus.SELL_PENDING_NEW,
+                VirtualOrderStatus.SELL_ACCEPTED,
+            ):
+                order.sell_failed(f"Alpaca sell order {status.value}")
+
+    @classmethod
+    def is_force_sell_due(cls, order: Order, alpaca_client: MyAlpacaClient) -> bool:
+        if order.status != VirtualOrderStatus.BUY_FILLED:
+            return False
+        assert order.force_sell_at is not None
+        return alpaca_client.is_time_passed(order.force_sell_at)
+
+    @classmethod
+    def sell_client_order_id(cls, order: Order) -> str:
+        """The client order id of the order's sell, the same on every attempt.
+
+        It is derived from the buy order id, which is committed before any sell,
+        so nothing has to be written ahead of the submission: if Alpaca took a
+        sell but the commit recording it was lost, the next attempt is rejected
+        as a duplicate and the existing sell is picked up instead (see
+        place_sell), so the sell is neither lost nor sent twice.
+        """
+        return f"sell-{order.alpaca_buy_order_id}"
+
+    @classmethod
+    def place_sell(
+        cls, order: Order, alpaca_client: MyAlpacaClient
+    ) -> AlpacaOrder | APIError:
+        """The Alpaca side of selling what a BUY_FILLED order bought (its own
+        quantity only, other orders of the same symbol keep their shares), without
+        touching the order (so it can run concurrently); apply the result with
+        `sell_placed`"""
+        assert order.buy_filled_qty is not None
+        client_order_id = cls.sell_client_order_id(order)
+        try:
+            return alpaca_client.submit_sell_qty_order(
+                order.symbol, order.buy_filled_qty, client_order_id=client_order_id
+            )
+        except APIError as error:
+            try:
+                # Placed by an earlier attempt whose commit was lost
+                return alpaca_client.get_order_by_client_id(client_order_id)
+            except APIError:
+                return error
+
+    @classmethod
+    def sell_placed(cls, order: Order, result: AlpacaOrder | APIError) -> None:
+        if isinstance(result, APIError):
+            order.sell_failed()
+        else:
+            order.sell_submitted(alpaca_order_id=result.id)
 
     @classmethod
     def apply_sell_rules(cls, order: Order, alpaca_client: MyAlpacaClient) -> None:
         logger.info("apply_sell_rules order id=%s status=%s", order.id, order.status)
         if order.status == VirtualOrderStatus.BUY_FILLED:
-            assert order.force_sell_at is not None
-            sell_time_passed = alpaca_client.is_time_passed(order.force_sell_at)
-            if sell_time_passed:
-                try:
-                    alpaca_sell_order = alpaca_client.close_position(order.symbol)
-                    order.sell_submitted(alpaca_order_id=alpaca_sell_order.id)
-                except APIError:
-                    order.sell_failed()
+            if cls.is_force_sell_due(order, alpaca_client):
+                cls.submit_sell(order, alpaca_client)
             else:
                 logger.info(
                     "Order id=%s was buy filled but it is not time-passed, doing nothing",
@@ -119,8 +327,20 @@ class OrderCrud:
                 )
 
     @classmethod
-    def sync_order_status(cls, order: Order, alpaca_client: MyAlpacaClient) -> None:
-        sync_data = cls._fetch_order_data(order, alpaca_client)
+    def submit_sell(cls, order: Order, alpaca_client: MyAlpacaClient) -> None:
+        cls.sell_placed(order, cls.place_sell(order, alpaca_client))
+
+    @classmethod
+    def sync_order_status(
+        cls,
+        order: Order,
+        alpaca_client: MyAlpacaClient,
+        alpaca_orders: dict[UUID, AlpacaOrder] | None = None,
+    ) -> None:
+        """Move the order along according to its alpaca orders. `alpaca_orders` is an
+        optional prefetched map (see fetch_alpaca_orders); misses fall back to a
+        per-order request"""
+        sync_data = cls._fetch_order_data(order, alpaca_client, alpaca_orders)
         logger.info(
             "Working on order id=%s status=%s alpaca_status=%s alpaca_sell_order=%s user_email=%s",
             order.id,
@@ -131,6 +351,7 @@ class OrderCrud:
         )
 
         # NEW -> BUY_PENDING_NEW -> BUY_ACCEPTED -> BUY_FILLED -> SELL_PENDING_NEW -> SELL_ACCEPTED -> SELL_FILLED
+        # (BUY_FAILED / SELL_FAILED when Alpaca cancels, expires or rejects the buy / sell)
         match order.status:
             case VirtualOrderStatus.BUY_PENDING_NEW:
                 cls._handle_buy_pending_new(order, sync_data, alpaca_client)
@@ -138,6 +359,8 @@ class OrderCrud:
                 cls._handle_buy_accepted(order, sync_data, alpaca_client)
             case VirtualOrderStatus.SELL_PENDING_NEW:
                 cls._handle_sell_pending_new(order, sync_data)
+            case VirtualOrderStatus.SELL_ACCEPTED:
+                cls._handle_sell_accepted(order, sync_data)
 
     @classmethod
     def create_order_with_alpaca_order(
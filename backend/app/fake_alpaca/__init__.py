@@ -0,0 +1,10 @@
+from .broker import FakeAlpacaError, FakeBroker, FakeBrokerConfig
+from .server import FakeAlpacaThread, create_fake_alpaca_app
+
+__all__ = [
+    "FakeAlpacaError",
+    "FakeAlpacaThread",
+    "FakeBroker",
+    "FakeBrokerConfig",
+    "create_fake_alpaca_app",
+]
@@ -0,0 +1,475 @@
+import heapq
+import itertools
+import math
+import random
+import zlib
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from uuid import UUID, uuid4
+
+from alpaca.data.timeframe import TimeFrame, TimeFrameUnit
+
+TradeUpdateListener = Callable[[dict[str, Any]], None]
+
+
+class FakeAlpacaError(Exception):
+    """An error response in Alpaca's format ({"code": ..., "message": ...})"""
+
+    def __init__(self, status_code: int, code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+
+
+@dataclass
+class FakeBrokerConfig:
+    # Time from submission to the (last) fill of an order
+    fill_latency_seconds: float = 0.0
+    # Share of orders filled in two steps (half, then the rest)
+    partial_fill_ratio: float = 0.0
+    # Share of orders rejected instead of filled
+    reject_ratio: float = 0.0
+    # Share of API requests answered with 429 Too Many Requests
+    rate_limit_ratio: float = 0.0
+    default_price: float = 100.0
+    # Relative standard deviation of the price move between live bars
+    volatility: float = 0.001
+    # Interval of the live bars pushed on the data streams
+    bar_interval_seconds: float = 60.0
+    market_open: bool = True
+    seed: int | None = None
+
+
+def _iso(value: datetime | None) -> str | None:
+    return None if value is None else value.isoformat().replace("+00:00", "Z")
+
+
+def _decimal(value: float | None) -> str | None:
+    return None if value is None else f"{value:.9g}"
+
+
+@dataclass
+class _FakeOrder:
+    symbol: str
+    side: str
+    time_in_force: str
+    qty: float | None
+    notional: float | None
+    submitted_at: datetime
+    client_order_id: str
+    id: UUID = field(default_factory=uuid4)
+    status: str = "accepted"
+    filled_qty: float = 0.0
+    filled_avg_price: float | None = None
+    filled_at: datetime | None = None
+    failed_at: datetime | None = None
+    updated_at: datetime | None = None
+    reject: bool = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.status in ("accepted", "new", "partially_filled")
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "id": str(self.id),
+            "client_order_id": self.client_order_id,
+            "created_at": _iso(self.submitted_at),
+            "updated_at": _iso(self.updated_at or self.submitted_at),
+            "submitted_at": _iso(self.submitted_at),
+            "filled_at": _iso(self.filled_at),
+            "expired_at": None,
+            "canceled_at": None,
+            "failed_at": _iso(self.failed_at),
+            "replaced_at": None,
+            "replaced_by": None,
+            "replaces": None,
+            "asset_id": str(uuid4()),
+            "symbol": self.symbol,
+            "asset_class": "crypto" if "/" in self.symbol else "us_equity",
+            "notional": _decimal(self.notional),
+            "qty": _decimal(self.qty),
+            "filled_qty": _decimal(self.filled_qty),
+            "filled_avg_price": _decimal(self.filled_avg_price),
+            "order_class": "simple",
+            "order_type": "market",
+            "type": "market",
+            "side": self.side,
+            "time_in_force": self.time_in_force,
+            "limit_price": None,
+            "stop_price": None,
+            "status": self.status,
+            "extended_hours": False,
+            "legs": None,
+            "trail_percent": None,
+            "trail_price": None,
+            "hwm": None,
+        }
+
+
+@dataclass
+class _FakePosition:
+    qty: float = 0.0
+    cost_basis: float = 0.0
+
+
+class FakeBroker:
+    """In-memory stand-in for the parts of an Alpaca account that MyAlpacaClient
+    uses: market orders, positions, the clock, latest quotes and bars.
+
+    Orders are accepted on submission and filled `fill_latency_seconds` later at
+    the symbol's current price, when `advance` runs past their due time (the
+    server calls it on every request and from a ticker). Every state change is
+    pushed to the trade update listeners like Alpaca's trade_updates stream.
+    Not thread-safe, the server only touches it from its event loop.
+    """
+
+    def __init__(
+        self,
+        config: FakeBrokerConfig | None = None,
+        now: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+    ):
+        self.config = config or FakeBrokerConfig()
+        self.now = now
+        self.random = random.Random(self.config.seed)
+        self.orders: dict[UUID, _FakeOrder] = {}
+        self._orders_by_client_id: dict[str, _FakeOrder] = {}
+        self.positions: dict[str, _FakePosition] = {}
+        self.prices: dict[str, float] = {}
+        self.trade_update_listeners: set[TradeUpdateListener] = set()
+        # (due at, tie breaker, order id, share of the order filled by then)
+        self._due: list[tuple[datetime, int, UUID, float]] = []
+        self._sequence = itertools.count()
+        # Quantity of open sell orders per symbol, not available for new sells
+        self._held_for_sells: dict[str, float] = {}
+        self._last_submitted_at: datetime | None = None
+        self.requests = 0
+        self.rate_limited = 0
+
+    def price(self, symbol: str) -> float:
+        return self.prices.setdefault(symbol, self.config.default_price)
+
+    def set_price(self, symbol: str, price: float) -> None:
+        self.prices[symbol] = price
+
+    def move_prices(self) -> None:
+        """Random walk step of every known price (between live bars)"""
+        for symbol, price in self.prices.items():
+            self.prices[symbol] = price * (
+                1 + self.random.gauss(0, self.config.volatility)
+            )
+
+    def should_rate_limit(self) -> bool:
+        self.requests += 1
+        limited = self.random.random() < self.config.rate_limit_ratio
+        if limited:
+            self.rate_limited += 1
+        return limited
+
+    def _emit(
+        self,
+        event: str,
+        order: _FakeOrder,
+        price: float | None = None,
+        qty: float | None = None,
+    ) -> None:
+        if not self.trade_update_listeners:
+            return
+        position = self.positions.get(order.symbol)
+        update = {
+            "event": event,
+            "order": order.to_json(),
+            "timestamp": _iso(self.now()),
+            "execution_id": str(uuid4()) if qty else None,
+            "price": _decimal(price),
+            "qty": _decimal(qty),
+            "position_qty": _decimal(position.qty if position else 0.0),
+        }
+        for listener in list(self.trade_update_listeners):
+            listener(update)
+
+    def _available_qty(self, symbol: str) -> float:
+        position = self.positions.get(symbol)
+        held = self._held_for_sells.get(symbol, 0.0)
+        return (position.qty if position else 0.0) - held
+
+    def _release(self, order: _FakeOrder, qty: float) -> None:
+        if order.side == "sell":
+            self._held_for_sells[order.symbol] -= qty
+
+    def submit_order(self, body: dict[str, Any]) -> dict[str, Any]:
+        symbol = body.get("symbol")
+        side = body.get("side")
+        qty = float(body["qty"]) if body.get("qty") is not None else None
+        notional = float(body["notional"]) if body.get("notional") is not None else None
+        if not symbol or side not in ("buy", "sell"):
+            raise FakeAlpacaError(422, 40010000, "invalid order request")
+        if (qty is None) == (notional is None):
+            raise FakeAlpacaError(
+                422, 40010000, "qty or notional is required, not both"
+            )
+        if body.get("type", "market") != "market":
+            raise FakeAlpacaError(422, 40010000, "only market orders are supported")
+        client_order_id = body.get("client_order_id") or str(uuid4())
+        if client_order_id in self._orders_by_client_id:
+            raise FakeAlpacaError(422, 40010001, "client_order_id must be unique")
+
+        if side == "sell":
+            if qty is None:
+                assert notional is not None
+                qty = round(notional / self.price(symbol), 9)
+            if qty > self._available_qty(symbol) + 1e-9:
+                raise FakeAlpacaError(
+                    403, 40310000, "insufficient qty available for order"
+                )
+
+        now = self.now()
+        # Unique submission times, so listing orders "after" one never skips any
+        if self._last_submitted_at is not None and now <= self._last_submitted_at:
+            now = self._last_submitted_at + timedelta(microseconds=1)
+        self._last_submitted_at = now
+        order = _FakeOrder(
+            symbol=symbol,
+            side=side,
+            time_in_force=body.get("time_in_force", "day"),
+            qty=qty,
+            notional=notional,
+            submitted_at=now,
+            client_order_id=client_order_id,
+            reject=self.random.random() < self.config.reject_ratio,
+        )
+        self.orders[order.id] = order
+        self._orders_by_client_id[client_order_id] = order
+        if side == "sell":
+            assert qty is not None
+            self._held_for_sells[symbol] = self._held_for_sells.get(symbol, 0.0) + qty
+
+        fill_at = now + timedelta(seconds=self.config.fill_latency_seconds)
+        if not order.reject and self.random.random() < self.config.partial_fill_ratio:
+            half_way = now + timedelta(seconds=self.config.fill_latency_seconds / 2)
+            heapq.heappush(self._due, (half_way, next(self._sequence), order.id, 0.5))
+        heapq.heappush(self._due, (fill_at, next(self._sequence), order.id, 1.0))
+        self._emit("new", order)
+        return order.to_json()
+
+    def _fill(self, order: _FakeOrder, share: float, now: datetime) -> None:
+        price = self.price(order.symbol)
+        if order.qty is None:
+            assert order.notional is not None
+            order.qty = round(order.notional / price, 9)
+        qty = round(order.qty * share - order.filled_qty, 9)
+        if qty <= 0:
+            return
+
+        total_cost = (order.filled_avg_price or 0.0) * order.filled_qty + price * qty
+        order.filled_qty = round(order.filled_qty + qty, 9)
+        order.filled_avg_price = total_cost / order.filled_qty
+        order.updated_at = now
+        self._release(order, qty)
+        position = self.positions.setdefault(order.symbol, _FakePosition())
+        if order.side == "buy":
+            position.qty += qty
+            position.cost_basis += price * qty
+        else:
+            average = position.cost_basis / position.qty if position.qty else 0.0
+            position.qty -= qty
+            position.cost_basis -= average * qty
+            if position.qty <= 1e-9:
+                del self.positions[order.symbol]
+
+        if share >= 1:
+            order.status = "filled"
+            order.filled_at = now
+            self._emit("fill", order, price, qty)
+        else:
+            order.status = "partially_filled"
+            self._emit("partial_fill", order, price, qty)
+
+    def advance(self) -> None:
+        """Fill (or reject) the orders that are due"""
+        now = self.now()
+        while self._due and self._due[0][0] <= now:
+            _, _, order_id, share = heapq.heappop(self._due)
+            order = self.orders[order_id]
+            if not order.is_open:
+                continue
+            if order.reject:
+                order.status = "rejected"
+                order.failed_at = order.updated_at = now
+                self._release(order, (order.qty or 0.0) - order.filled_qty)
+                self._emit("rejected", order)
+            else:
+                self._fill(order, share, now)
+
+    def get_order(self, order_id: UUID) -> dict[str, Any]:
+        order = self.orders.get(order_id)
+        if order is None:
+            raise FakeAlpacaError(404, 40410000, "order not found")
+        return order.to_json()
+
+    def get_order_by_client_id(self, client_order_id: str) -> dict[str, Any]:
+        order = self._orders_by_client_id.get(client_order_id)
+        if order is None:
+            raise FakeAlpacaError(404, 40410000, "order not found")
+        return order.to_json()
+
+    def list_orders(
+        self,
+        status: str = "open",
+        after: datetime | None = None,
+        until: datetime | None = None,
+        limit: int = 50,
+        direction: str = "desc",
+        symbols: list[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        orders = [
+            order
+            for order in self.orders.values()
+            if (status == "all" or (status == "open") == order.is_open)
+            and (after is None or order.submitted_at > after)
+            and (until is None or order.submitted_at < until)
+            and (not symbols or order.symbol in symbols)
+        ]
+        orders.sort(key=lambda order: order.submitted_at, reverse=direction == "desc")
+        return [order.to_json() for order in orders[: min(limit, 500)]]
+
+    def get_position(self, symbol: str) -> dict[str, Any]:
+        position = self.positions.get(symbol)
+        if position is None:
+            raise FakeAlpacaError(404, 40410000, "position does not exist")
+        price = self.price(symbol)
+        market_value = position.qty * price
+        return {
+            "asset_id": str(uuid4()),
+            "symbol": symbol,
+            "exchange": "CRYPTO" if "/" in symbol else "NASDAQ",
+            "asset_class": "crypto" if "/" in symbol else "us_equity",
+            "avg_entry_price": _decimal(position.cost_basis / position.qty),
+            "qty": _decimal(position.qty),
+            "qty_available": _decimal(self._available_qty(symbol)),
+            "side": "long",
+            "market_value": _decimal(market_value),
+            "cost_basis": _decimal(position.cost_basis),
+            "unrealized_pl": _decimal(market_value - position.cost_basis),
+            "current_price": _decimal(price),
+        }
+
+    def close_position(self, symbol: str) -> dict[str, Any]:
+        if symbol not in self.positions:
+            raise FakeAlpacaError(404, 40410000, "position does not exist")
+        qty = self._available_qty(symbol)
+        if qty <= 0:
+            raise FakeAlpacaError(403, 40310000, "insufficient qty available for order")
+        return self.submit_order(
+            {"symbol": symbol, "side": "sell", "qty": qty, "time_in_force": "day"}
+        )
+
+    def clock(self) -> dict[str, Any]:
+        now = self.now()
+        # Regular session in UTC (EST), weekends are not skipped
+        next_open = now.replace(hour=14, minute=30, second=0, microsecond=0)
+        next_close = now.replace(hour=21, minute=0, second=0, microsecond=0)
+        if next_open <= now:
+            next_open += timedelta(days=1)
+        if next_close <= now:
+            next_close += timedelta(days=1)
+        return {
+            "timestamp": _iso(now),
+            "is_open": self.config.market_open,
+            "next_open": _iso(next_open),
+            "next_close": _iso(next_close),
+        }
+
+    def latest_quote(self, symbol: str) -> dict[str, Any]:
+        price = self.price(symbol)
+        return {
+            "t": _iso(self.now()),
+            "ap": round(price + 0.01, 4),
+            "as": 1,
+            "ax": "V",
+            "bp": round(price - 0.01, 4),
+            "bs": 1,
+            "bx": "V",
+            "c": ["R"],
+            "z": "C",
+        }
+
+    def historical_price(self, symbol: str, timestamp: datetime) -> float:
+        """Deterministic synthetic price history (a slow wave per symbol)"""
+        phase = zlib.crc32(symbol.encode()) % 1000
+        minutes = timestamp.timestamp() / 60
+        return self.config.default_price * (1 + 0.02 * math.sin(minutes / 90 + phase))
+
+    def bars(
+        self,
+        symbol: str,
+        timeframe: TimeFrame,
+        start: datetime,
+        end: datetime,
+        limit: int,
+    ) -> tuple[list[dict[str, Any]], datetime | None]:
+        """Synthetic bars in [start, end], and the start of the next page"""
+        step = (
+            timeframe.amount_value
+            * {
+                TimeFrameUnit.Minute: timedelta(minutes=1),
+                TimeFrameUnit.Hour: timedelta(hours=1),
+                TimeFrameUnit.Day: timedelta(days=1),
+                TimeFrameUnit.Week: timedelta(weeks=1),
+                TimeFrameUnit.Month: timedelta(days=30),
+            }[timeframe.unit_value]
+        )
+        epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+        timestamp = epoch + math.ceil((start - epoch) / step) * step
+        end = min(end, self.now())
+        bars: list[dict[str, Any]] = []
+        while timestamp <= end:
+            if len(bars) == limit:
+                return bars, timestamp
+            open_price = self.historical_price(symbol, timestamp)
+            close_price = self.historical_price(symbol, timestamp + step)
+            bars.append(
+                {
+                    "t": _iso(timestamp),
+                    "o": round(open_price, 4),
+                    "h": round(max(open_price, close_price) * 1.001, 4),
+                    "l": round(min(open_price, close_price) * 0.999, 4),
+                    "c": round(close_price, 4),
+                    "v": 1000,
+                    "n": 10,
+                    "vw": round((open_price + close_price) / 2, 4),
+                }
+            )
+            timestamp += step
+        return bars, None
+
+    def live_bar(self, symbol: str, timestamp: datetime) -> dict[str, Any]:
+        price = self.price(symbol)
+        return {
+            "T": "b",
+            "S": symbol,
+            "t": timestamp,
+            "o": price,
+            "h": price,
+            "l": price,
+            "c": price,
+            "v": 1000,
+            "n": 10,
+            "vw": price,
+        }
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "orders": len(self.orders),
+            "order_statuses": dict(Counter(o.status for o in self.orders.values())),
+            "positions": len(self.positions),
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+        }
+
+
+__all__ = ["FakeAlpacaError", "FakeBroker", "FakeBrokerConfig"]
@@ -0,0 +1,363 @@
+import asyncio
+import json
+import logging
+import re
+import socket
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timezone
+from typing import Any
+from uuid import UUID
+
+import msgpack
+import uvicorn
+from alpaca.data.timeframe import TimeFrame, TimeFrameUnit
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+from app.fake_alpaca.broker import FakeAlpacaError, FakeBroker, FakeBrokerConfig
+
+logger = logging.getLogger(__name__)
+
+# How often due orders are filled when nobody calls the API
+TICK_SECONDS = 0.01
+
+_TIMEFRAME_UNITS = {
+    "Min": TimeFrameUnit.Minute,
+    "T": TimeFrameUnit.Minute,
+    "Hour": TimeFrameUnit.Hour,
+    "H": TimeFrameUnit.Hour,
+    "Day": TimeFrameUnit.Day,
+    "D": TimeFrameUnit.Day,
+    "Week": TimeFrameUnit.Week,
+    "W": TimeFrameUnit.Week,
+    "Month": TimeFrameUnit.Month,
+    "M": TimeFrameUnit.Month,
+}
+
+
+def _parse_timeframe(value: str) -> TimeFrame:
+    match = re.fullmatch(r"(\d+)([A-Za-z]+)", value)
+    if match is None or match.group(2) not in _TIMEFRAME_UNITS:
+        raise FakeAlpacaError(422, 42210000, f"invalid timeframe {value}")
+    return TimeFrame(int(match.group(1)), _TIMEFRAME_UNITS[match.group(2)])
+
+
+def _parse_datetime(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class _DataStreamClient:
+    """One connection of a market data stream and its subscriptions"""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.subscriptions: dict[str, set[str]] = {
+            "bars": set(),
+            "quotes": set(),
+            "trades": set(),
+        }
+
+    async def send(self, messages: list[dict[str, Any]]) -> None:
+        await self.websocket.send_bytes(msgpack.packb(messages, datetime=True))
+
+    def subscription_message(self) -> dict[str, Any]:
+        return {
+            "T": "subscription",
+            **{channel: sorted(s) for channel, s in self.subscriptions.items()},
+        }
+
+
+def create_fake_alpaca_app(broker: FakeBroker | None = None) -> FastAPI:
+    """Fake Alpaca API (trading, market data and the streams) on one server.
+
+    Point MyAlpacaClient at it with the "url-override" credential
+    (ALPACA_URL_OVERRIDE), e.g. http://127.0.0.1:8001. Endpoints under /fake
+    control the simulation: set prices, read stats.
+    """
+    broker = broker or FakeBroker(FakeBrokerConfig())
+    data_clients: set[_DataStreamClient] = set()
+
+    async def push_bars() -> None:
+        while True:
+            await asyncio.sleep(broker.config.bar_interval_seconds)
+            broker.move_prices()
+            now = broker.now().replace(second=0, microsecond=0)
+            for client in list(data_clients):
+                bars = [
+                    broker.live_bar(symbol, now)
+                    for symbol in client.subscriptions["bars"]
+                ]
+                if bars:
+                    with suppress(Exception):
+                        await client.send(bars)
+
+    async def tick() -> None:
+        while True:
+            broker.advance()
+            await asyncio.sleep(TICK_SECONDS)
+
+    @asynccontextmanager
+    async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+        tasks = [asyncio.create_task(tick()), asyncio.create_task(push_bars())]
+        try:
+            yield
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    app = FastAPI(title="Fake Alpaca", lifespan=lifespan)
+    app.state.broker = broker
+
+    @app.exception_handler(FakeAlpacaError)
+    async def fake_alpaca_error_handler(
+        _request: Request, error: FakeAlpacaError
+    ) -> JSONResponse:
+        return JSONResponse(
+            {"code": error.code, "message": error.message},
+            status_code=error.status_code,
+        )
+
+    @app.middleware("http")
+    async def simulate_rate_limit(
+        request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        if not request.url.path.startswith("/fake"):
+            if broker.should_rate_limit():
+                return JSONResponse(
+                    {"code": 42910000, "message": "rate limit exceeded"},
+                    status_code=429,
+                )
+            broker.advance()
+        return await call_next(request)
+
+    @app.post("/v2/orders")
+    async def submit_order(request: Request) -> dict[str, Any]:
+        return broker.submit_order(await request.json())
+
+    @app.get("/v2/orders")
+    async def list_orders(
+        status: str = "open",
+        after: str | None = None,
+        until: str | None = None,
+        limit: int = 50,
+        direction: str = "desc",
+        symbols: str | None = None,
+    ) -> list[dict[str, Any]]:
+        return broker.list_orders(
+            status=status,
+            after=_parse_datetime(after),
+            until=_parse_datetime(until),
+            limit=limit,
+            direction=direction,
+            symbols=symbols.split(",") if symbols else None,
+        )
+
+    @app.get("/v2/orders:by_client_order_id")
+    async def get_order_by_client_id(client_order_id: str) -> dict[str, Any]:
+        return broker.get_order_by_client_id(client_order_id)
+
+    @app.get("/v2/orders/{order_id}")
+    async def get_order(order_id: UUID) -> dict[str, Any]:
+        return broker.get_order(order_id)
+
+    @app.get("/v2/positions/{symbol:path}")
+    async def get_position(symbol: str) -> dict[str, Any]:
+        return broker.get_position(symbol)
+
+    @app.delete("/v2/positions/{symbol:path}")
+    async def close_position(symbol: str) -> dict[str, Any]:
+        return broker.close_position(symbol)
+
+    @app.get("/v2/clock")
+    async def clock() -> dict[str, Any]:
+        return broker.clock()
+
+    @app.get("/v2/stocks/quotes/latest")
+    async def latest_quotes(symbols: str) -> dict[str, Any]:
+        return {
+            "quotes": {
+                symbol: broker.latest_quote(symbol) for symbol in symbols.split(",")
+            }
+        }
+
+    @app.get("/v2/stocks/bars")
+    async def bars(
+        symbols: str,
+        timeframe: str,
+        start: str | None = None,
+        end: str | None = None,
+        limit: int = 1000,
+        page_token: str | None = None,
+    ) -> dict[str, Any]:
+        parsed_timeframe = _parse_timeframe(timeframe)
+        now = broker.now()
+        range_start = _parse_datetime(start) or now.replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        range_end = _parse_datetime(end) or now
+        symbol_list = symbols.split(",")
+        # The page token is "<symbol>@<timestamp>" of the first bar not sent yet
+        resume_symbol, resume_at = None, None
+        if page_token:
+            resume_symbol, _, token_time = page_token.partition("@")
+            resume_at = _parse_datetime(token_time)
+            symbol_list = symbol_list[symbol_list.index(resume_symbol) :]
+
+        result: dict[str, list[dict[str, Any]]] = {}
+        next_page_token = None
+        remaining = min(limit, 10000)
+        for symbol in symbol_list:
+            if remaining == 0:
+                next_page_token = f"{symbol}@{range_start.isoformat()}"
+                break
+            symbol_start = resume_at if symbol == resume_symbol else range_start
+            assert symbol_start is not None
+            symbol_bars, next_at = broker.bars(
+                symbol, parsed_timeframe, symbol_start, range_end, remaining
+            )
+            result[symbol] = symbol_bars
+            remaining -= len(symbol_bars)
+            if next_at is not None:
+                next_page_token = f"{symbol}@{next_at.isoformat()}"
+                break
+        return {"bars": result, "next_page_token": next_page_token}
+
+    @app.post("/fake/prices/{symbol:path}")
+    async def set_price(symbol: str, price: float) -> dict[str, Any]:
+        broker.set_price(symbol, price)
+        quote = {"T": "q", "S": symbol, **broker.latest_quote(symbol)}
+        quote["t"] = broker.now()
+        for client in list(data_clients):
+            if symbol in client.subscriptions["quotes"]:
+                with suppress(Exception):
+                    await client.send([quote])
+        return {"symbol": symbol, "price": price}
+
+    @app.get("/fake/stats")
+    async def stats() -> dict[str, Any]:
+        return broker.stats()
+
+    @app.websocket("/stream")
+    async def trading_stream(websocket: WebSocket) -> None:
+        await websocket.accept()
+        updates: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+        listening = False
+        try:
+            auth = json.loads(await websocket.receive_text())
+            assert auth.get("action") == "authenticate"
+            await websocket.send_text(
+                json.dumps(
+                    {
+                        "stream": "authorization",
+                        "data": {"status": "authorized", "action": "authenticate"},
+                    }
+                )
+            )
+            listen = json.loads(await websocket.receive_text())
+            if "trade_updates" in listen.get("data", {}).get("streams", []):
+                broker.trade_update_listeners.add(updates.put_nowait)
+                listening = True
+            await websocket.send_text(
+                json.dumps(
+                    {"stream": "listening", "data": {"streams": ["trade_updates"]}}
+                )
+            )
+            # Nothing more is expected from the client, only its disconnect
+            disconnected = asyncio.create_task(websocket.receive_text())
+            while True:
+                next_update = asyncio.create_task(updates.get())
+                await asyncio.wait(
+                    {disconnected, next_update}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if disconnected.done():
+                    next_update.cancel()
+                    break
+                await websocket.send_text(
+                    json.dumps(
+                        {"stream": "trade_updates", "data": next_update.result()}
+                    )
+                )
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if listening:
+                broker.trade_update_listeners.discard(updates.put_nowait)
+
+    async def data_stream(websocket: WebSocket) -> None:
+        await websocket.accept()
+        client = _DataStreamClient(websocket)
+        try:
+            await client.send([{"T": "success", "msg": "connected"}])
+            auth = msgpack.unpackb(await websocket.receive_bytes())
+            assert auth.get("action") == "auth"
+            await client.send([{"T": "success", "msg": "authenticated"}])
+            data_clients.add(client)
+            while True:
+                message = msgpack.unpackb(await websocket.receive_bytes())
+                action = message.pop("action", None)
+                for channel, symbols in message.items():
+                    if channel not in client.subscriptions:
+                        continue
+                    if action == "subscribe":
+                        client.subscriptions[channel].update(symbols)
+                    elif action == "unsubscribe":
+                        client.subscriptions[channel].difference_update(symbols)
+                await client.send([client.subscription_message()])
+        except WebSocketDisconnect:
+            pass
+        finally:
+            data_clients.discard(client)
+
+    app.add_api_websocket_route("/v2/{feed}", data_stream)
+    app.add_api_websocket_route("/v1beta3/crypto/us", data_stream)
+
+    return app
+
+
+class FakeAlpacaThread:
+    """Serves a fake Alpaca app from a background thread on a free local port,
+    for tests and load runs in the same process:
+
+        with FakeAlpacaThread(FakeBroker(config)) as fake_alpaca:
+            client = MyAlpacaClient({..., "url-override": fake_alpaca.url})
+    """
+
+    def __init__(self, broker: FakeBroker | None = None):
+        self.broker = broker or FakeBroker()
+        self._socket = socket.socket()
+        self._socket.bind(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self._socket.getsockname()[1]}"
+        self._server = uvicorn.Server(
+            uvicorn.Config(create_fake_alpaca_app(self.broker), log_level="warning")
+        )
+        self._thread = threading.Thread(
+            target=self._server.run, kwargs={"sockets": [self._socket]}, daemon=True
+        )
+
+    def credentials(self) -> dict[str, Any]:
+        return {
+            "api-key": "fake",
+            "secret-key": "fake",
+            "paper": True,
+            "url-override": self.url,
+        }
+
+    def __enter__(self) -> "FakeAlpacaThread":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+        self._socket.close()
+
+
+__all__ = ["FakeAlpacaThread", "create_fake_alpaca_app"]
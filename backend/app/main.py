@@ -1,10 +1,22 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 import sentry_sdk
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 
+from app.api.deps.alpaca_dep import (
+    create_live_price_hub,
+    create_live_price_leader_election,
+    create_my_alpaca_async_client,
+    create_order_sync_scheduler,
+)
 from app.api.main import api_router
 from app.core.config.app_settings import app_settings
+from app.core.db import engine
+from app.core.leader_election import LeaderElection
+from app.core.order_events import order_event_broker
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -14,8 +26,41 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 if app_settings.SENTRY_DSN and app_settings.ENVIRONMENT != "local":
     sentry_sdk.init(dsn=str(app_settings.SENTRY_DSN), enable_tracing=True)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    app.state.my_alpaca_async_client = create_my_alpaca_async_client()
+    app.state.live_price_hub = create_live_price_hub()
+    # Only one process of all workers and replicas streams market data from
+    # Alpaca, which allows one connection per account
+    app.state.live_price_leader_election = create_live_price_leader_election(
+        app.state.live_price_hub
+    )
+    if app.state.live_price_leader_election is not None:
+        app.state.live_price_leader_election.start()
+    order_event_broker.listen_to(engine)
+    app.state.order_sync_scheduler = None
+    app.state.order_sync_leader_election = None
+    if app_settings.ORDER_SYNC_SCHEDULER_ENABLED:
+        app.state.order_sync_scheduler = create_order_sync_scheduler()
+        # Only one process of all workers and replicas syncs and force sells
+        app.state.order_sync_leader_election = LeaderElection(
+            engine, "order-sync", app.state.order_sync_scheduler.run
+        )
+        app.state.order_sync_leader_election.start()
+    yield
+    if app.state.order_sync_leader_election is not None:
+        await app.state.order_sync_leader_election.stop()
+    await order_event_broker.stop()
+    if app.state.live_price_leader_election is not None:
+        await app.state.live_price_leader_election.stop()
+    await app.state.live_price_hub.close()
+    await app.state.my_alpaca_async_client.aclose()
+
+
 app = FastAPI(
     title=app_settings.PROJECT_NAME,
+    lifespan=lifespan,
     openapi_url=f"{app_settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
 )
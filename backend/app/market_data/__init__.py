@@ -0,0 +1,21 @@
+from .bar_store import BarRingBuffer, BarStore, BarWindow, to_datetime64
+from .indicators import ATR, EMA, RSI, SMA, VWAP, Indicator, IndicatorEngine
+from .minute_bar_store import MinuteBarStore
+from .resampler import BarResampler, resample
+
+__all__ = [
+    "ATR",
+    "EMA",
+    "RSI",
+    "SMA",
+    "VWAP",
+    "BarResampler",
+    "BarRingBuffer",
+    "BarStore",
+    "BarWindow",
+    "Indicator",
+    "IndicatorEngine",
+    "MinuteBarStore",
+    "resample",
+    "to_datetime64",
+]
@@ -0,0 +1,140 @@
+import threading
+from datetime import datetime, timezone
+from typing import NamedTuple, cast
+
+import numpy as np
+import numpy.typing as npt
+
+from app.clients.my_alpaca_client import AlpacaBar
+
+
+def to_datetime64(timestamp: datetime | np.datetime64) -> np.datetime64:
+    """Nanosecond datetime64 in UTC (naive datetimes are taken as UTC)"""
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        return np.datetime64(timestamp, "ns")
+    return cast(np.datetime64, timestamp.astype("datetime64[ns]"))
+
+
+class BarWindow(NamedTuple):
+    """Column views of consecutive bars, oldest first"""
+
+    timestamp: npt.NDArray[np.datetime64]
+    open: npt.NDArray[np.float64]
+    high: npt.NDArray[np.float64]
+    low: npt.NDArray[np.float64]
+    close: npt.NDArray[np.float64]
+    volume: npt.NDArray[np.float64]
+
+
+class BarRingBuffer:
+    """The last `capacity` bars of one symbol in preallocated column arrays.
+
+    Every bar is written twice, at `i` and `i + capacity` ("mirrored" ring), so
+    the most recent n bars are always one contiguous slice and `window` can hand
+    out views without copying. Views are live: a later append may overwrite them,
+    copy the window when it has to outlive the next bar.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._timestamp = np.zeros(2 * capacity, dtype="datetime64[ns]")
+        self._ohlcv = np.zeros((5, 2 * capacity), dtype=np.float64)
+        # Index where the next bar goes, in [0, capacity)
+        self._head = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def last_timestamp(self) -> np.datetime64 | None:
+        if not self._size:
+            return None
+        return np.datetime64(self._timestamp[self._head + self.capacity - 1], "ns")
+
+    def _write(
+        self,
+        index: int,
+        timestamp: np.datetime64,
+        values: tuple[float, float, float, float, float],
+    ) -> None:
+        for i in (index, index + self.capacity):
+            self._timestamp[i] = timestamp
+            self._ohlcv[:, i] = values
+
+    def append(
+        self,
+        timestamp: datetime | np.datetime64,
+        open: float,
+        high: float,
+        low: float,
+        close: float,
+        volume: float,
+    ) -> None:
+        """Append a bar in O(1). A bar with the same timestamp as the last one
+        replaces it, older bars are ignored"""
+        ts = to_datetime64(timestamp)
+        values = (open, high, low, close, volume)
+        last = self.last_timestamp
+        if last is not None and ts <= last:
+            if ts == last:
+                self._write((self._head - 1) % self.capacity, ts, values)
+            return
+        self._write(self._head, ts, values)
+        self._head = (self._head + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def append_bar(self, bar: AlpacaBar) -> None:
+        self.append(bar.timestamp, bar.open, bar.high, bar.low, bar.close, bar.volume)
+
+    def window(self, n: int | None = None) -> BarWindow:
+        """Read-only views of the last `n` bars (all stored bars by default)"""
+        n = self._size if n is None else min(n, self._size)
+        end = self._head + self.capacity
+        start = end - n
+        columns = [self._timestamp[start:end], *self._ohlcv[:, start:end]]
+        for column in columns:
+            column.flags.writeable = False
+        return BarWindow(*columns)
+
+
+class BarStore:
+    """In-memory recent bar history per symbol, fed by the stream handlers
+    (`on_bar` can be registered with AlpacaStreamManager.subscribe_bars)"""
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self._buffers: dict[str, BarRingBuffer] = {}
+        self._lock = threading.Lock()
+
+    def _buffer(self, symbol: str) -> BarRingBuffer:
+        buffer = self._buffers.get(symbol)
+        if buffer is None:
+            with self._lock:
+                buffer = self._buffers.setdefault(symbol, BarRingBuffer(self.capacity))
+        return buffer
+
+    def append_bar(self, bar: AlpacaBar) -> None:
+        self._buffer(bar.symbol).append_bar(bar)
+
+    async def on_bar(self, bar: AlpacaBar) -> None:
+        self.append_bar(bar)
+
+    def window(self, symbol: str, n: int | None = None) -> BarWindow:
+        buffer = self._buffers.get(symbol)
+        if buffer is None:
+            return BarWindow(
+                np.empty(0, dtype="datetime64[ns]"),
+                *(np.empty(0, dtype=np.float64) for _ in range(5)),
+            )
+        return buffer.window(n)
+
+    def symbols(self) -> list[str]:
+        return list(self._buffers)
+
+
+__all__ = ["BarRingBuffer", "BarStore", "BarWindow", "to_datetime64"]
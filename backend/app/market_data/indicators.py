@@ -0,0 +1,305 @@
+from collections import deque
+from collections.abc import Callable
+from datetime import date, timezone
+from typing import Protocol
+
+import numpy as np
+import numpy.typing as npt
+
+from app.clients.my_alpaca_client import AlpacaBar
+from app.market_data.bar_store import BarWindow
+
+FloatArray = npt.NDArray[np.float64]
+
+# Streaming and batch values are compared exactly (rules must not trigger
+# differently in a backtest than live), so both modes do the same float
+# operations in the same order. The recursive smoothing below (EMA, Wilder's
+# RSI/ATR averages) has no exact vectorized form in NumPy; batch mode runs the
+# shared step functions over the precomputed, vectorized inputs.
+
+
+def _ema_step(previous: float, value: float, alpha: float) -> float:
+    return previous + alpha * (value - previous)
+
+
+def _wilder_step(previous: float, value: float, period: int) -> float:
+    return (previous * (period - 1) + value) / period
+
+
+def _check_period(period: int) -> int:
+    if period <= 0:
+        raise ValueError("period must be positive")
+    return period
+
+
+def _nans(length: int) -> FloatArray:
+    return np.full(length, np.nan, dtype=np.float64)
+
+
+class Indicator(Protocol):
+    value: float | None
+
+    def update(self, bar: AlpacaBar) -> float | None:
+        """Fold the next bar in, returns the new value (None while warming up)"""
+        ...
+
+    def batch(self, window: BarWindow) -> FloatArray:
+        """Values over a history, NaN while warming up"""
+        ...
+
+
+class SMA:
+    """Simple moving average of the close.
+
+    Kept as the difference of two running totals so it matches `np.cumsum` in
+    batch mode bit for bit."""
+
+    def __init__(self, period: int):
+        self.period = _check_period(period)
+        self.value: float | None = None
+        self._total = 0.0
+        self._totals: deque[float] = deque([0.0], maxlen=period + 1)
+
+    def update(self, bar: AlpacaBar) -> float | None:
+        self._total += bar.close
+        self._totals.append(self._total)
+        if len(self._totals) > self.period:
+            self.value = (self._totals[-1] - self._totals[0]) / self.period
+        return self.value
+
+    def batch(self, window: BarWindow) -> FloatArray:
+        totals = np.r_[0.0, np.cumsum(window.close, dtype=np.float64)]
+        result = _nans(len(window.close))
+        result[self.period - 1 :] = (
+            totals[self.period :] - totals[: -self.period]
+        ) / self.period
+        return result
+
+
+class EMA:
+    """Exponential moving average of the close, seeded with the SMA of the first
+    `period` closes"""
+
+    def __init__(self, period: int):
+        self.period = _check_period(period)
+        self.alpha = 2 / (period + 1)
+        self.value: float | None = None
+        self._count = 0
+        self._seed_total = 0.0
+
+    def update(self, bar: AlpacaBar) -> float | None:
+        if self.value is not None:
+            self.value = _ema_step(self.value, bar.close, self.alpha)
+            return self.value
+        self._count += 1
+        self._seed_total += bar.close
+        if self._count == self.period:
+            self.value = self._seed_total / self.period
+        return self.value
+
+    def batch(self, window: BarWindow) -> FloatArray:
+        closes = window.close.tolist()
+        result = _nans(len(closes))
+        if len(closes) < self.period:
+            return result
+        value = sum(closes[: self.period]) / self.period
+        result[self.period - 1] = value
+        for i in range(self.period, len(closes)):
+            value = _ema_step(value, closes[i], self.alpha)
+            result[i] = value
+        return result
+
+
+def _rsi(average_gain: float, average_loss: float) -> float:
+    if average_loss == 0:
+        return 100.0
+    return 100 - 100 / (1 + average_gain / average_loss)
+
+
+class RSI:
+    """Wilder's relative strength index of the close (0-100)"""
+
+    def __init__(self, period: int = 14):
+        self.period = _check_period(period)
+        self.value: float | None = None
+        self._previous_close: float | None = None
+        self._count = 0
+        self._average_gain = 0.0
+        self._average_loss = 0.0
+
+    def update(self, bar: AlpacaBar) -> float | None:
+        previous_close, self._previous_close = self._previous_close, bar.close
+        if previous_close is None:
+            return None
+        change = bar.close - previous_close
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        if self._count < self.period:
+            # The first averages are plain means of `period` changes
+            self._count += 1
+            self._average_gain += gain
+            self._average_loss += loss
+            if self._count < self.period:
+                return None
+            self._average_gain /= self.period
+            self._average_loss /= self.period
+        else:
+            self._average_gain = _wilder_step(self._average_gain, gain, self.period)
+            self._average_loss = _wilder_step(self._average_loss, loss, self.period)
+        self.value = _rsi(self._average_gain, self._average_loss)
+        return self.value
+
+    def batch(self, window: BarWindow) -> FloatArray:
+        result = _nans(len(window.close))
+        changes = np.diff(window.close)
+        if len(changes) < self.period:
+            return result
+        gains = np.maximum(changes, 0.0).tolist()
+        losses = np.maximum(-changes, 0.0).tolist()
+        average_gain = sum(gains[: self.period]) / self.period
+        average_loss = sum(losses[: self.period]) / self.period
+        averages = [(average_gain, average_loss)]
+        for gain, loss in zip(gains[self.period :], losses[self.period :], strict=True):
+            average_gain = _wilder_step(average_gain, gain, self.period)
+            average_loss = _wilder_step(average_loss, loss, self.period)
+            averages.append((average_gain, average_loss))
+        average_gains, average_losses = np.array(averages).T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result[self.period :] = np.where(
+                average_losses == 0,
+                100.0,
+                100 - 100 / (1 + average_gains / average_losses),
+            )
+        return result
+
+
+class ATR:
+    """Wilder's average true range"""
+
+    def __init__(self, period: int = 14):
+        self.period = _check_period(period)
+        self.value: float | None = None
+        self._previous_close: float | None = None
+        self._count = 0
+        self._total = 0.0
+
+    def update(self, bar: AlpacaBar) -> float | None:
+        if self._previous_close is None:
+            true_range = bar.high - bar.low
+        else:
+            true_range = max(
+                bar.high - bar.low,
+                abs(bar.high - self._previous_close),
+                abs(bar.low - self._previous_close),
+            )
+        self._previous_close = bar.close
+        if self.value is not None:
+            self.value = _wilder_step(self.value, true_range, self.period)
+            return self.value
+        self._count += 1
+        self._total += true_range
+        if self._count == self.period:
+            self.value = self._total / self.period
+        return self.value
+
+    def batch(self, window: BarWindow) -> FloatArray:
+        result = _nans(len(window.close))
+        if len(window.close) < self.period:
+            return result
+        previous_close = window.close[:-1]
+        true_ranges = (window.high - window.low).tolist()
+        true_ranges[1:] = np.maximum.reduce(
+            [
+                window.high[1:] - window.low[1:],
+                np.abs(window.high[1:] - previous_close),
+                np.abs(window.low[1:] - previous_close),
+            ]
+        ).tolist()
+        value = sum(true_ranges[: self.period]) / self.period
+        result[self.period - 1] = value
+        for i in range(self.period, len(true_ranges)):
+            value = _wilder_step(value, true_ranges[i], self.period)
+            result[i] = value
+        return result
+
+
+class VWAP:
+    """Volume weighted average of the typical price, (high + low + close) / 3,
+    since the start of the bar's UTC day"""
+
+    def __init__(self) -> None:
+        self.value: float | None = None
+        self._day: date | None = None
+        self._price_volume = 0.0
+        self._volume = 0.0
+
+    def update(self, bar: AlpacaBar) -> float | None:
+        day = bar.timestamp.astimezone(timezone.utc).date()
+        if day != self._day:
+            self._day = day
+            self._price_volume = self._volume = 0.0
+            self.value = None
+        self._price_volume += (bar.high + bar.low + bar.close) / 3 * bar.volume
+        self._volume += bar.volume
+        if self._volume:
+            self.value = self._price_volume / self._volume
+        return self.value
+
+    def batch(self, window: BarWindow) -> FloatArray:
+        result = _nans(len(window.close))
+        if not len(result):
+            return result
+        price_volume = (window.high + window.low + window.close) / 3 * window.volume
+        days = window.timestamp.astype("datetime64[D]")
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        for start, end in zip(starts, np.r_[starts[1:], len(days)], strict=True):
+            volume = np.cumsum(window.volume[start:end])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                values = np.cumsum(price_volume[start:end]) / volume
+            # Before the first traded volume of the day there is no VWAP; after
+            # it, zero volume bars keep the last value
+            result[start:end] = np.where(volume > 0, values, np.nan)
+        return result
+
+
+class IndicatorEngine:
+    """Keeps a set of streaming indicators per symbol up to date with live bars.
+
+    `indicators` maps names to factories, e.g. {"ema20": lambda: EMA(20)}; each
+    symbol gets its own instances on its first bar. `on_bar` can be registered
+    with AlpacaStreamManager.subscribe_bars (or a BarResampler timeframe), and
+    `batch` computes the same values over a stored history.
+    """
+
+    def __init__(self, indicators: dict[str, Callable[[], Indicator]]):
+        self.indicators = indicators
+        self._symbols: dict[str, dict[str, Indicator]] = {}
+
+    def update(self, bar: AlpacaBar) -> dict[str, float | None]:
+        symbol_indicators = self._symbols.get(bar.symbol)
+        if symbol_indicators is None:
+            symbol_indicators = {
+                name: factory() for name, factory in self.indicators.items()
+            }
+            self._symbols[bar.symbol] = symbol_indicators
+        return {
+            name: indicator.update(bar) for name, indicator in symbol_indicators.items()
+        }
+
+    async def on_bar(self, bar: AlpacaBar) -> None:
+        self.update(bar)
+
+    def latest(self, symbol: str) -> dict[str, float | None]:
+        """Current values of the symbol's indicators (None while warming up)"""
+        symbol_indicators = self._symbols.get(symbol, {})
+        return {
+            name: symbol_indicators[name].value if name in symbol_indicators else None
+            for name in self.indicators
+        }
+
+    def batch(self, window: BarWindow) -> dict[str, FloatArray]:
+        return {
+            name: factory().batch(window) for name, factory in self.indicators.items()
+        }
+
+
+__all__ = ["ATR", "EMA", "RSI", "SMA", "VWAP", "Indicator", "IndicatorEngine"]
@@ -0,0 +1,191 @@
+import os
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from app.clients.my_alpaca_client import AlpacaBar
+from app.market_data.bar_store import BarWindow, to_datetime64
+
+COLUMNS: dict[str, npt.DTypeLike] = {
+    "timestamp": "datetime64[ns]",
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.float64,
+}
+
+
+def _empty_window() -> BarWindow:
+    return BarWindow(*(np.empty(0, dtype=dtype) for dtype in COLUMNS.values()))
+
+
+class _DayWriter:
+    """Append handles of the column files of one symbol/day"""
+
+    def __init__(self, directory: Path):
+        directory.mkdir(parents=True, exist_ok=True)
+        # A crash between column writes can leave some columns a bar longer
+        sizes = {name: _column_size(directory, name) for name in COLUMNS}
+        for name, size in sizes.items():
+            if size > min(sizes.values()):
+                os.truncate(
+                    directory / f"{name}.bin",
+                    min(sizes.values()) * np.dtype(COLUMNS[name]).itemsize,
+                )
+        self.fds = {
+            name: os.open(
+                directory / f"{name}.bin", os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+            )
+            for name in COLUMNS
+        }
+        timestamps = _read_column(directory, "timestamp")
+        self.last_timestamp = timestamps[-1] if len(timestamps) else None
+
+    def append(self, values: dict[str, np.generic]) -> None:
+        for name, fd in self.fds.items():
+            os.write(fd, values[name].tobytes())
+
+    def close(self) -> None:
+        for fd in self.fds.values():
+            os.close(fd)
+
+
+def _column_size(directory: Path, name: str) -> int:
+    path = directory / f"{name}.bin"
+    if not path.exists():
+        return 0
+    return path.stat().st_size // np.dtype(COLUMNS[name]).itemsize
+
+
+def _read_column(directory: Path, name: str) -> npt.NDArray[Any]:
+    path = directory / f"{name}.bin"
+    dtype = np.dtype(COLUMNS[name])
+    if not path.exists() or path.stat().st_size < dtype.itemsize:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+class MinuteBarStore:
+    """Append-only on-disk store of 1-minute bars, one directory per symbol/day
+    holding one raw column file per field (`<root>/<symbol>/<YYYY-MM-DD>/close.bin`).
+
+    Reads memory-map the column files, so a range inside one day is returned as
+    NumPy views without copying; ranges spanning days are concatenated. Bars are
+    kept in time order (older or repeated timestamps are dropped on append), which
+    lets range lookups binary-search the timestamp column.
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self._writers: dict[tuple[str, date], _DayWriter] = {}
+        self._lock = threading.Lock()
+
+    def _day_dir(self, symbol: str, day: date) -> Path:
+        # Crypto pairs ("BTC/USD") can't be used as directory names as is
+        return self.root / symbol.replace("/", "_") / day.isoformat()
+
+    def _writer(self, symbol: str, day: date) -> _DayWriter:
+        key = (symbol, day)
+        writer = self._writers.get(key)
+        if writer is None:
+            # Bars arrive in time order, the previous days of the symbol are done
+            for old_key in [k for k in self._writers if k[0] == symbol and k[1] < day]:
+                self._writers.pop(old_key).close()
+            writer = _DayWriter(self._day_dir(symbol, day))
+            self._writers[key] = writer
+        return writer
+
+    def append(
+        self,
+        symbol: str,
+        timestamp: datetime | np.datetime64,
+        open: float,
+        high: float,
+        low: float,
+        close: float,
+        volume: float,
+    ) -> bool:
+        """Append one bar. Returns False if it was not newer than the last stored bar"""
+        ts = to_datetime64(timestamp)
+        day = ts.astype("datetime64[D]").item()
+        with self._lock:
+            writer = self._writer(symbol, day)
+            if writer.last_timestamp is not None and ts <= writer.last_timestamp:
+                return False
+            writer.append(
+                {
+                    "timestamp": ts,
+                    "open": np.float64(open),
+                    "high": np.float64(high),
+                    "low": np.float64(low),
+                    "close": np.float64(close),
+                    "volume": np.float64(volume),
+                }
+            )
+            writer.last_timestamp = ts
+            return True
+
+    def append_bar(self, bar: AlpacaBar) -> bool:
+        return self.append(
+            bar.symbol,
+            bar.timestamp,
+            bar.open,
+            bar.high,
+            bar.low,
+            bar.close,
+            bar.volume,
+        )
+
+    async def on_bar(self, bar: AlpacaBar) -> None:
+        self.append_bar(bar)
+
+    def days(self, symbol: str) -> list[date]:
+        symbol_dir = self.root / symbol.replace("/", "_")
+        if not symbol_dir.is_dir():
+            return []
+        return sorted(date.fromisoformat(p.name) for p in symbol_dir.iterdir())
+
+    def read_day(self, symbol: str, day: date) -> BarWindow:
+        """Memory-mapped (read-only) columns of every stored bar of the day"""
+        directory = self._day_dir(symbol, day)
+        columns = [_read_column(directory, name) for name in COLUMNS]
+        # Columns may be mid-append while we read
+        size = min(len(column) for column in columns)
+        return BarWindow(*(column[:size] for column in columns))
+
+    def read_range(self, symbol: str, start: datetime, end: datetime) -> BarWindow:
+        """Bars with start <= timestamp < end"""
+        start_ts, end_ts = to_datetime64(start), to_datetime64(end)
+        first_day = start_ts.astype("datetime64[D]").item()
+        last_day = end_ts.astype("datetime64[D]").item()
+        windows = []
+        day = first_day
+        while day <= last_day:
+            window = self.read_day(symbol, day)
+            lo, hi = np.searchsorted(window.timestamp, [start_ts, end_ts], side="left")
+            if hi > lo:
+                columns: list[npt.NDArray[Any]] = [column[lo:hi] for column in window]
+                windows.append(BarWindow(*columns))
+            day += timedelta(days=1)
+
+        if not windows:
+            return _empty_window()
+        if len(windows) == 1:
+            return windows[0]
+        return BarWindow(
+            *(np.concatenate(columns) for columns in zip(*windows, strict=True))
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            for writer in self._writers.values():
+                writer.close()
+            self._writers.clear()
+
+
+__all__ = ["MinuteBarStore"]
@@ -0,0 +1,178 @@
+import logging
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import numpy.typing as npt
+from alpaca.data.timeframe import TimeFrame, TimeFrameUnit
+
+from app.clients.my_alpaca_client import AlpacaBar
+from app.market_data.bar_store import BarWindow
+
+logger = logging.getLogger(__name__)
+
+BarHandler = Callable[[AlpacaBar], Awaitable[None]]
+
+DEFAULT_TIMEFRAMES = (
+    TimeFrame(5, TimeFrameUnit.Minute),
+    TimeFrame(15, TimeFrameUnit.Minute),
+    TimeFrame(1, TimeFrameUnit.Hour),
+    TimeFrame(1, TimeFrameUnit.Day),
+)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_MINUTE = timedelta(minutes=1)
+
+
+def timeframe_to_timedelta(timeframe: TimeFrame) -> timedelta:
+    """Length of a fixed-size timeframe (minutes, hours or days)"""
+    unit = {
+        TimeFrameUnit.Minute: timedelta(minutes=1),
+        TimeFrameUnit.Hour: timedelta(hours=1),
+        TimeFrameUnit.Day: timedelta(days=1),
+    }.get(timeframe.unit_value)
+    if unit is None:
+        raise ValueError(f"Can't resample to {timeframe.value} bars")
+    return timeframe.amount_value * unit
+
+
+@dataclass
+class _OpenBar:
+    start: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    trade_count: float
+    vwap_volume: float
+
+    def fold(self, bar: AlpacaBar) -> None:
+        self.high = max(self.high, bar.high)
+        self.low = min(self.low, bar.low)
+        self.close = bar.close
+        self.volume += bar.volume
+        self.trade_count += bar.trade_count or 0
+        self.vwap_volume += (bar.vwap or bar.close) * bar.volume
+
+    def to_bar(self, symbol: str) -> AlpacaBar:
+        return AlpacaBar(
+            symbol,
+            {
+                "t": self.start,
+                "o": self.open,
+                "h": self.high,
+                "l": self.low,
+                "c": self.close,
+                "v": self.volume,
+                "n": self.trade_count,
+                "vw": self.vwap_volume / self.volume if self.volume else self.close,
+            },
+        )
+
+
+def _bucket_start(timestamp: datetime, length: timedelta) -> datetime:
+    # Buckets are aligned to the epoch in UTC, so 1 day bars are UTC days
+    # (the US session, 13:30-20:00 UTC, never crosses one)
+    return _EPOCH + (timestamp - _EPOCH) // length * length
+
+
+class BarResampler:
+    """Folds 1-minute bars into open bars of coarser timeframes, O(1) per bar and
+    timeframe, and hands completed bars to the subscribers of that timeframe.
+
+    A bar is completed by the minute bar that ends its period, or, when that
+    minute has no bar (no trades, market closed), by the first bar of a later
+    period; `flush` completes whatever is still open (e.g. at the close).
+    `on_bar` can be registered with AlpacaStreamManager.subscribe_bars.
+    """
+
+    def __init__(self, timeframes: Iterable[TimeFrame] = DEFAULT_TIMEFRAMES):
+        self.timeframes = {
+            timeframe.value: timeframe_to_timedelta(timeframe)
+            for timeframe in timeframes
+        }
+        self._open: dict[tuple[str, str], _OpenBar] = {}
+        self._handlers: dict[str, list[BarHandler]] = defaultdict(list)
+
+    def subscribe(self, timeframe: TimeFrame, handler: BarHandler) -> None:
+        if timeframe.value not in self.timeframes:
+            raise ValueError(f"{timeframe.value} bars are not resampled")
+        self._handlers[timeframe.value].append(handler)
+
+    def add_bar(self, bar: AlpacaBar) -> list[tuple[str, AlpacaBar]]:
+        """Fold a 1-minute bar in, returns the (timeframe, bar) pairs it completed"""
+        timestamp = bar.timestamp.astimezone(timezone.utc)
+        completed = []
+        for timeframe, length in self.timeframes.items():
+            key = (bar.symbol, timeframe)
+            start = _bucket_start(timestamp, length)
+            open_bar = self._open.get(key)
+            if open_bar is not None and open_bar.start != start:
+                if start < open_bar.start:
+                    # Late bar of an already completed period
+                    continue
+                completed.append((timeframe, open_bar.to_bar(bar.symbol)))
+                open_bar = None
+            if open_bar is None:
+                open_bar = _OpenBar(
+                    start, bar.open, bar.high, bar.low, bar.close, 0.0, 0.0, 0.0
+                )
+                self._open[key] = open_bar
+            open_bar.fold(bar)
+            if timestamp + _ONE_MINUTE >= start + length:
+                completed.append((timeframe, open_bar.to_bar(bar.symbol)))
+                del self._open[key]
+        return completed
+
+    def flush(self, symbol: str | None = None) -> list[tuple[str, AlpacaBar]]:
+        """Complete the open bars (of one symbol, or all)"""
+        keys = [key for key in self._open if symbol is None or key[0] == symbol]
+        return [(key[1], self._open.pop(key).to_bar(key[0])) for key in keys]
+
+    async def publish(self, completed: list[tuple[str, AlpacaBar]]) -> None:
+        for timeframe, bar in completed:
+            for handler in self._handlers.get(timeframe, ()):
+                try:
+                    await handler(bar)
+                except Exception:
+                    logger.exception("Resampled %s bar handler failed", timeframe)
+
+    async def on_bar(self, bar: AlpacaBar) -> None:
+        await self.publish(self.add_bar(bar))
+
+    async def on_close(self) -> None:
+        await self.publish(self.flush())
+
+
+def resample(window: BarWindow, timeframe: TimeFrame) -> BarWindow:
+    """Vectorized resampling of stored 1-minute bars (e.g. a MinuteBarStore
+    range) into `timeframe` bars, with the same bucketing as BarResampler. The
+    last bar may cover a partial period."""
+    if not len(window.timestamp):
+        return window
+    length = timeframe_to_timedelta(timeframe) // timedelta(microseconds=1) * 1000
+    buckets = window.timestamp.astype("datetime64[ns]").astype(np.int64) // length
+    starts = np.flatnonzero(np.r_[True, np.diff(buckets) != 0])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    timestamps: npt.NDArray[np.datetime64] = (buckets[starts] * length).astype(
+        "datetime64[ns]"
+    )
+    return BarWindow(
+        timestamps,
+        window.open[starts],
+        np.maximum.reduceat(window.high, starts),
+        np.minimum.reduceat(window.low, starts),
+        window.close[ends],
+        np.add.reduceat(window.volume, starts),
+    )
+
+
+__all__ = [
+    "DEFAULT_TIMEFRAMES",
+    "BarResampler",
+    "resample",
+    "timeframe_to_timedelta",
+]
@@ -1,17 +1,26 @@
 import logging
 from datetime import datetime, timedelta, timezone
 from enum import Enum
-from typing import Any
+from typing import TYPE_CHECKING, Any
 from uuid import UUID
 
 from pydantic import PrivateAttr
+from sqlalchemy import Index, text
 from sqlmodel import Field, Relationship, SQLModel
 from transitions import EventData, Machine
 
 from app.models.user import User
 
+if TYPE_CHECKING:
+    from transitions.core import TransitionConfigDict
+
 logger = logging.getLogger(__name__)
 
+# Sell rules of a filled buy (see Order.buy_filled), shared with the backtester
+TARGET_PROFIT_RATIO = 1.05
+STOP_LOSS_RATIO = 0.95
+FORCE_SELL_BEFORE_CLOSE = timedelta(minutes=30)
+
 
 class VirtualOrderStatus(str, Enum):
     NEW = "new"
@@ -22,6 +31,21 @@ class VirtualOrderStatus(str, Enum):
     SELL_ACCEPTED = "sell_accepted"
     SELL_FILLED = "sell_filled"
     SELL_FAILED = "sell_failed"
+    # The buy was canceled, expired or rejected by Alpaca before any fill
+    BUY_FAILED = "buy_failed"
+
+
+# Orders in these states are done: there is nothing left to sync or sell
+TERMINAL_STATUSES = (
+    VirtualOrderStatus.SELL_FILLED,
+    VirtualOrderStatus.SELL_FAILED,
+    VirtualOrderStatus.BUY_FAILED,
+)
+# The enum is stored by name; indexes only the active orders, so syncing them
+# does not get slower as the order history grows
+ACTIVE_ORDER_STATUS_INDEX_WHERE = text(
+    "status NOT IN ({})".format(", ".join(f"'{s.name}'" for s in TERMINAL_STATUSES))
+)
 
 
 class OrderCore(SQLModel):
@@ -63,9 +87,21 @@ class OrderBase(OrderCore):
 
 
 class Order(OrderBase, table=True):
+    __table_args__ = (
+        Index(
+            "ix_order_active_status",
+            "status",
+            postgresql_where=ACTIVE_ORDER_STATUS_INDEX_WHERE,
+            sqlite_where=ACTIVE_ORDER_STATUS_INDEX_WHERE,
+        ),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     owner_id: UUID = Field(foreign_key="user.id", nullable=False, ondelete="CASCADE")
     owner: User = Relationship(back_populates="orders")
+    # Set by every status transition (naive UTC like the other timestamps once
+    # stored), None for orders that never changed status since it was added
+    status_changed_at: datetime | None = None
 
     def __init__(self, **data: Any) -> None:
         super().__init__(**data)
@@ -79,6 +115,10 @@ class Order(OrderBase, table=True):
     def buy_accepted(self) -> None:
         self.machine.buy_accepted()
 
+    def buy_failed(self, error_message: str) -> None:
+        self.error_message = error_message
+        self.machine.buy_failed()
+
     def buy_filled(
         self, filled_avg_price: float, buy_filled_qty: float, market_close_at: datetime
     ) -> None:
@@ -86,9 +126,9 @@ class Order(OrderBase, table=True):
             self.buy_accepted()
         self.buy_filled_avg_price = filled_avg_price
         self.buy_filled_qty = buy_filled_qty
-        self.force_sell_at = market_close_at - timedelta(minutes=30)
-        self.target_profit_price = filled_avg_price * 1.05
-        self.stop_loss_price = filled_avg_price * 0.95
+        self.force_sell_at = market_close_at - FORCE_SELL_BEFORE_CLOSE
+        self.target_profit_price = filled_avg_price * TARGET_PROFIT_RATIO
+        self.stop_loss_price = filled_avg_price * STOP_LOSS_RATIO
         self.machine.buy_filled()
 
     def sell_submitted(self, alpaca_order_id: UUID) -> None:
@@ -105,7 +145,9 @@ class Order(OrderBase, table=True):
         self.sell_filled_qty = filled_qty
         self.machine.sell_filled()
 
-    def sell_failed(self) -> None:
+    def sell_failed(self, error_message: str | None = None) -> None:
+        if error_message is not None:
+            self.error_message = error_message
         self.machine.sell_failed()
 
     @staticmethod
@@ -113,12 +155,13 @@ class Order(OrderBase, table=True):
         class MyMachine(Machine):
             def after_state_changed(self, event: EventData) -> None:
                 self._model.status = VirtualOrderStatus(event.state.value)
+                self._model.status_changed_at = datetime.now(timezone.utc)
                 logger.info("Model status was updated to %s", event.state.name)
 
             def set_model(self, model: "Order") -> None:
                 self._model = model
 
-        transitions_def = [
+        transitions_def: list[TransitionConfigDict] = [
             {
                 "trigger": "buy_submitted",
                 "source": VirtualOrderStatus.NEW,
@@ -129,6 +172,14 @@ class Order(OrderBase, table=True):
                 "source": VirtualOrderStatus.BUY_PENDING_NEW,
                 "dest": VirtualOrderStatus.BUY_ACCEPTED,
             },
+            {
+                "trigger": "buy_failed",
+                "source": [
+                    VirtualOrderStatus.BUY_PENDING_NEW,
+                    VirtualOrderStatus.BUY_ACCEPTED,
+                ],
+                "dest": VirtualOrderStatus.BUY_FAILED,
+            },
             {
                 "trigger": "buy_filled",
                 "source": VirtualOrderStatus.BUY_ACCEPTED,
@@ -140,8 +191,13 @@ class Order(OrderBase, table=True):
                 "dest": VirtualOrderStatus.SELL_PENDING_NEW,
             },
             {
+                # The sell could not be placed, or Alpaca canceled/rejected it
                 "trigger": "sell_failed",
-                "source": VirtualOrderStatus.BUY_FILLED,
+                "source": [
+                    VirtualOrderStatus.BUY_FILLED,
+                    VirtualOrderStatus.SELL_PENDING_NEW,
+                    VirtualOrderStatus.SELL_ACCEPTED,
+                ],
                 "dest": VirtualOrderStatus.SELL_FAILED,
             },
             {
@@ -186,3 +242,14 @@ class OrderCreate(OrderCore):
 
 class OrderPublic(OrderBase):
     id: int
+
+
+class OrdersSyncSummary(SQLModel):
+    total: int
+    synced: int
+    failed: int
+    # Orders per status after the sync
+    statuses: dict[VirtualOrderStatus, int]
+    # Error message per failed order id (the first few)
+    errors: dict[int, str]
+    duration_seconds: float
@@ -0,0 +1,15 @@
+from .force_sell_scheduler import DeadlineHeap, ForceSellScheduler
+from .order_sync import OrderBulkSync
+from .sell_rule_evaluator import SellRuleEvaluator, ThresholdIndex
+from .sync_scheduler import OrderSyncScheduler
+from .trade_update_consumer import TradeUpdateConsumer
+
+__all__ = [
+    "DeadlineHeap",
+    "ForceSellScheduler",
+    "OrderBulkSync",
+    "OrderSyncScheduler",
+    "SellRuleEvaluator",
+    "ThresholdIndex",
+    "TradeUpdateConsumer",
+]
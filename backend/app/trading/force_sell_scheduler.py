@@ -0,0 +1,249 @@
+import asyncio
+import heapq
+import logging
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, suppress
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session, col, select
+
+from app.clients.my_alpaca_client import MyAlpacaClient
+from app.core.order_events import OrderEventBroker
+from app.crud.order_crud import OrderCrud
+from app.models.order import Order, OrderPublic, VirtualOrderStatus
+from app.trading.order_sync import DEFAULT_SYNC_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+# Longest sleep between two looks at the clock, however far the next deadline is
+MAX_SLEEP_SECONDS = 60.0
+# Wait after a failed step (e.g. the clock could not be read) before the next,
+# and after a failed sell before trying it again
+RETRY_SECONDS = 5.0
+
+
+def _utc(deadline: datetime) -> datetime:
+    # force_sell_at is stored as naive UTC
+    return deadline.replace(tzinfo=deadline.tzinfo or timezone.utc)
+
+
+class DeadlineHeap:
+    """Order ids in a min-heap by deadline.
+
+    Cancelling an order (or adding it again with another deadline) leaves its old
+    heap entry behind, to be skipped when it reaches the top; so add is O(log n),
+    cancel O(1), and popping the k due orders O(k log n). The heap is rebuilt
+    when stale entries outnumber the live ones.
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[datetime, int]] = []
+        self._deadlines: dict[int, datetime] = {}
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._deadlines
+
+    def add(self, order_id: int, deadline: datetime) -> None:
+        deadline = _utc(deadline)
+        if self._deadlines.get(order_id) == deadline:
+            return
+        self._deadlines[order_id] = deadline
+        heapq.heappush(self._heap, (deadline, order_id))
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(when, id_) for id_, when in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def cancel(self, order_id: int) -> bool:
+        return self._deadlines.pop(order_id, None) is not None
+
+    def _drop_stale(self) -> None:
+        while self._heap:
+            deadline, order_id = self._heap[0]
+            if self._deadlines.get(order_id) == deadline:
+                return
+            heapq.heappop(self._heap)
+
+    def next_deadline(self) -> datetime | None:
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime) -> list[int]:
+        """Take the orders whose deadline is at or before `now` out, earliest first"""
+        due = []
+        while (deadline := self.next_deadline()) is not None and deadline <= now:
+            _, order_id = heapq.heappop(self._heap)
+            del self._deadlines[order_id]
+            due.append(order_id)
+        return due
+
+
+class ForceSellScheduler:
+    """Force sells each BUY_FILLED order at its force_sell_at, instead of when the
+    next sync happens to notice it passed.
+
+    The orders wait in a DeadlineHeap; `run` sleeps until the earliest deadline
+    by the market clock (extrapolated between fetches, so well under a second
+    off) and wakes up early when an earlier deadline is tracked. The orders due
+    together (typically all of the day's, at the same time before the close) are
+    sold concurrently, and those whose sell failed are tried again after
+    RETRY_SECONDS. A sell that races the sell rules or the sync is placed once,
+    as its client order id is the same (see OrderCrud.place_sell).
+
+    `run` loads the BUY_FILLED orders, then follows the status changes committed
+    by any process (the sync, the trade updates consumer, the sell rules) through
+    `order_events`: orders are tracked as they become BUY_FILLED and dropped as
+    they move on. An order whose change is missed (e.g. while the listener
+    reconnects) is still force sold by the sync, only later.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        alpaca_client: MyAlpacaClient,
+        max_concurrency: int = DEFAULT_SYNC_CONCURRENCY,
+        order_events: OrderEventBroker | None = None,
+    ):
+        self.session_factory = session_factory
+        self.alpaca_client = alpaca_client
+        self.max_concurrency = max_concurrency
+        self.order_events = order_events
+        self.deadlines = DeadlineHeap()
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._changed: asyncio.Event | None = None
+
+    def _wake(self) -> None:
+        if self._loop is not None and self._changed is not None:
+            # May be called from another thread (e.g. load in to_thread)
+            with suppress(RuntimeError):
+                self._loop.call_soon_threadsafe(self._changed.set)
+
+    def track(self, order: Order | OrderPublic) -> None:
+        assert order.id is not None
+        if order.force_sell_at is None:
+            return
+        with self._lock:
+            self.deadlines.add(order.id, order.force_sell_at)
+        self._wake()
+
+    def cancel(self, order_id: int) -> None:
+        with self._lock:
+            self.deadlines.cancel(order_id)
+
+    def order_changed(self, order: Order | OrderPublic) -> None:
+        """Track the order if its status changed to BUY_FILLED, drop it otherwise"""
+        if order.status == VirtualOrderStatus.BUY_FILLED:
+            self.track(order)
+        else:
+            assert order.id is not None
+            self.cancel(order.id)
+
+    def load(self) -> int:
+        """Track every BUY_FILLED order, returns how many there are"""
+        with self.session_factory() as session:
+            rows = session.exec(
+                select(Order.id, Order.force_sell_at).where(
+                    Order.status == VirtualOrderStatus.BUY_FILLED,
+                    col(Order.force_sell_at).is_not(None),
+                )
+            ).all()
+        deadlines = DeadlineHeap()
+        for order_id, force_sell_at in rows:
+            assert order_id is not None and force_sell_at is not None
+            deadlines.add(order_id, force_sell_at)
+        with self._lock:
+            self.deadlines = deadlines
+        self._wake()
+        return len(deadlines)
+
+    def sell(self, order_ids: list[int]) -> list[int]:
+        """Force sell the orders still BUY_FILLED, returns the ids of those whose
+        sell failed"""
+        failed = []
+        with self.session_factory() as session:
+            orders = session.exec(
+                select(Order).where(
+                    col(Order.id).in_(order_ids),
+                    # Sold by the sell rules meanwhile
+                    Order.status == VirtualOrderStatus.BUY_FILLED,
+                )
+            ).all()
+            with ThreadPoolExecutor(self.max_concurrency) as executor:
+                futures = [
+                    executor.submit(OrderCrud.place_sell, order, self.alpaca_client)
+                    for order in orders
+                ]
+                for order, future in zip(orders, futures, strict=True):
+                    assert order.id is not None
+                    logger.info("Force selling order id=%s %s", order.id, order.symbol)
+                    try:
+                        OrderCrud.sell_placed(order, future.result())
+                    except Exception:
+                        # Left BUY_FILLED, for the caller to retry
+                        logger.exception("Failed to force sell order id=%s", order.id)
+                        failed.append(order.id)
+                        session.expire(order)
+            session.commit()
+        return failed
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        with ExitStack() as stack:
+            if self.order_events is not None:
+                stack.enter_context(self.order_events.watch(self.order_changed))
+            loaded = False
+            while True:
+                try:
+                    if not loaded:
+                        # Once watching, so no change is missed in between
+                        await asyncio.to_thread(self.load)
+                        loaded = True
+                    await self._step(self._changed)
+                except Exception:
+                    logger.exception("Force sell step failed, retrying")
+                    await asyncio.sleep(RETRY_SECONDS)
+
+    async def _step(self, changed: asyncio.Event) -> None:
+        """Wait for the next deadline (or a change), or sell the orders due"""
+        changed.clear()
+        with self._lock:
+            deadline = self.deadlines.next_deadline()
+        if deadline is None:
+            await changed.wait()
+            return
+
+        clock = await asyncio.to_thread(self.alpaca_client.get_clock)
+        delay = (deadline - clock.timestamp).total_seconds()
+        if delay > 0:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(changed.wait(), min(delay, MAX_SLEEP_SECONDS))
+            return
+
+        with self._lock:
+            order_ids = self.deadlines.pop_due(clock.timestamp)
+        logger.info(
+            "%d orders due for a force sell, %.3fs after the deadline",
+            len(order_ids),
+            -delay,
+        )
+        try:
+            failed = await asyncio.to_thread(self.sell, order_ids)
+        except Exception:
+            logger.exception("Failed to force sell orders %s", order_ids)
+            failed = order_ids
+        if failed:
+            # Still BUY_FILLED, tried again shortly (each sell is placed once, see
+            # OrderCrud.place_sell, so retrying one that did reach Alpaca is safe)
+            retry_at = clock.timestamp + timedelta(seconds=RETRY_SECONDS)
+            with self._lock:
+                for order_id in failed:
+                    self.deadlines.add(order_id, retry_at)
+
+
+__all__ = ["DeadlineHeap", "ForceSellScheduler"]
@@ -0,0 +1,164 @@
+import logging
+import time
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from uuid import UUID
+
+from sqlmodel import Session
+
+from app.clients.my_alpaca_client import AlpacaOrder, MyAlpacaClient
+from app.crud.order_crud import OrderCrud
+from app.models.order import Order, OrdersSyncSummary, VirtualOrderStatus
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYNC_CONCURRENCY = 8
+MAX_REPORTED_ERRORS = 50
+
+
+class OrderBulkSync:
+    """Syncs many orders with Alpaca and applies their sell rules, like
+    /orders/{id}/sync for each of them, in one pass.
+
+    The Alpaca I/O runs first and concurrently (at most `max_concurrency`
+    requests at a time): one listing of the recent alpaca orders, then single
+    fetches of the ones it missed, and later the force sells that became due.
+    The order state changes run in between on this thread, as the session is
+    not thread safe, and are committed once at the end. A failing order is
+    reported and left as it was; it does not stop the others. Pages of orders
+    (run_pages) go through these steps one page at a time.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        alpaca_client: MyAlpacaClient,
+        max_concurrency: int = DEFAULT_SYNC_CONCURRENCY,
+    ):
+        self.session = session
+        self.alpaca_client = alpaca_client
+        self.max_concurrency = max_concurrency
+
+    def run(self, orders: Sequence[Order]) -> OrdersSyncSummary:
+        return self._run([orders], release_pages=False)
+
+    def run_pages(self, pages: Iterable[Sequence[Order]]) -> OrdersSyncSummary:
+        """Like run, over pages of orders (see OrderCrud.active_order_pages). Each
+        page is flushed and dropped from the session once synced, so memory is
+        bounded by the page size rather than the number of orders"""
+        return self._run(pages, release_pages=True)
+
+    def _run(
+        self, pages: Iterable[Sequence[Order]], release_pages: bool
+    ) -> OrdersSyncSummary:
+        started = time.perf_counter()
+        total = 0
+        errors: dict[int, str] = {}
+        statuses: Counter[VirtualOrderStatus] = Counter()
+        with ThreadPoolExecutor(self.max_concurrency) as executor:
+            for orders in pages:
+                # A page's changes go out in one flush at its end, instead of
+                # an autoflush per order on every lazy load
+                with self.session.no_autoflush:
+                    page_errors = self._sync_page(orders, executor)
+                self.session.flush()
+                total += len(orders)
+                errors.update(page_errors)
+                statuses.update(
+                    order.status for order in orders if order.id not in page_errors
+                )
+                if release_pages:
+                    for order in orders:
+                        self.session.expunge(order)
+
+        self.session.commit()
+        return OrdersSyncSummary(
+            total=total,
+            synced=total - len(errors),
+            failed=len(errors),
+            statuses=dict(statuses),
+            errors=dict(list(errors.items())[:MAX_REPORTED_ERRORS]),
+            duration_seconds=time.perf_counter() - started,
+        )
+
+    def _sync_page(
+        self, orders: Sequence[Order], executor: ThreadPoolExecutor
+    ) -> dict[int, str]:
+        errors: dict[int, str] = {}
+        alpaca_orders, fetch_errors = self._fetch_alpaca_orders(orders, executor)
+
+        force_sells = []
+        for order in orders:
+            assert order.id is not None
+            try:
+                for alpaca_order_id in (
+                    order.alpaca_buy_order_id,
+                    order.alpaca_sell_order_id,
+                ):
+                    if alpaca_order_id in fetch_errors:
+                        raise fetch_errors[alpaca_order_id]
+                OrderCrud.sync_order_status(order, self.alpaca_client, alpaca_orders)
+                if OrderCrud.is_force_sell_due(order, self.alpaca_client):
+                    force_sells.append(order)
+            except Exception as error:
+                logger.exception("Failed to sync order id=%s", order.id)
+                errors[order.id] = str(error) or type(error).__name__
+                # Drop whatever the failed sync changed on the order
+                self.session.expire(order)
+
+        futures = [
+            executor.submit(OrderCrud.place_sell, order, self.alpaca_client)
+            for order in force_sells
+        ]
+        for order, future in zip(force_sells, futures, strict=True):
+            assert order.id is not None
+            try:
+                OrderCrud.sell_placed(order, future.result())
+            except Exception as error:
+                # One failed sell doesn't keep the others from being recorded
+                logger.exception("Failed to force sell order id=%s", order.id)
+                errors[order.id] = str(error) or type(error).__name__
+                self.session.expire(order)
+        return errors
+
+    def _fetch_alpaca_orders(
+        self, orders: Sequence[Order], executor: ThreadPoolExecutor
+    ) -> tuple[dict[UUID, AlpacaOrder], dict[UUID, Exception]]:
+        try:
+            alpaca_orders = OrderCrud.fetch_alpaca_orders(orders, self.alpaca_client)
+        except Exception:
+            # Every order falls back to its own fetch below
+            logger.exception("Failed to list alpaca orders")
+            alpaca_orders = {}
+
+        missing = list(
+            {
+                alpaca_order_id
+                for order in orders
+                for alpaca_order_id in (
+                    order.alpaca_buy_order_id,
+                    order.alpaca_sell_order_id,
+                )
+                if alpaca_order_id and alpaca_order_id not in alpaca_orders
+            }
+        )
+
+        def fetch(alpaca_order_id: UUID) -> AlpacaOrder | Exception:
+            try:
+                return self.alpaca_client.get_order_by_id(alpaca_order_id)
+            except Exception as error:
+                return error
+
+        errors: dict[UUID, Exception] = {}
+        for alpaca_order_id, result in zip(
+            missing, executor.map(fetch, missing), strict=True
+        ):
+            if isinstance(result, Exception):
+                errors[alpaca_order_id] = result
+            else:
+                alpaca_orders[alpaca_order_id] = result
+        return alpaca_orders, errors
+
+
+__all__ = ["DEFAULT_SYNC_CONCURRENCY", "OrderBulkSync"]
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import math
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Callable
+
+from alpaca.data.models.quotes import Quote as AlpacaQuote
+from sqlmodel import Session, select
+
+from app.clients.my_alpaca_client import AlpacaBar, MyAlpacaClient
+from app.crud.order_crud import OrderCrud
+from app.models.order import Order, VirtualOrderStatus
+
+logger = logging.getLogger(__name__)
+
+
+class ThresholdIndex:
+    """Open orders of each symbol in two arrays of (price, order id): one sorted
+    by target profit price and one by stop loss price.
+
+    A price move to `high`/`low` triggers the targets at or below `high` (a prefix
+    of the target array) and the stops at or above `low` (a suffix of the stop
+    array), so both are found by binary search in O(log n + k).
+    """
+
+    def __init__(self) -> None:
+        self._targets: dict[str, list[tuple[float, int]]] = {}
+        self._stops: dict[str, list[tuple[float, int]]] = {}
+        self._orders: dict[int, tuple[str, float | None, float | None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._orders
+
+    def add(
+        self,
+        order_id: int,
+        symbol: str,
+        target_profit_price: float | None,
+        stop_loss_price: float | None,
+    ) -> None:
+        self.remove(order_id)
+        self._orders[order_id] = (symbol, target_profit_price, stop_loss_price)
+        if target_profit_price is not None:
+            insort(
+                self._targets.setdefault(symbol, []), (target_profit_price, order_id)
+            )
+        if stop_loss_price is not None:
+            insort(self._stops.setdefault(symbol, []), (stop_loss_price, order_id))
+
+    def remove(self, order_id: int) -> bool:
+        entry = self._orders.pop(order_id, None)
+        if entry is None:
+            return False
+        symbol, target_profit_price, stop_loss_price = entry
+        for thresholds, price in (
+            (self._targets, target_profit_price),
+            (self._stops, stop_loss_price),
+        ):
+            if price is None:
+                continue
+            prices = thresholds[symbol]
+            del prices[bisect_left(prices, (price, order_id))]
+            if not prices:
+                del thresholds[symbol]
+        return True
+
+    def triggered(self, symbol: str, high: float, low: float) -> list[int]:
+        """Ids of the orders whose target is <= high or whose stop is >= low"""
+        targets = self._targets.get(symbol, [])
+        stops = self._stops.get(symbol, [])
+        hit_targets = targets[: bisect_right(targets, (high, math.inf))]
+        hit_stops = stops[bisect_left(stops, (low, -math.inf)) :]
+        return list(
+            dict.fromkeys(order_id for _, order_id in [*hit_targets, *hit_stops])
+        )
+
+    def symbols(self) -> list[str]:
+        return sorted({symbol for symbol, _, _ in self._orders.values()})
+
+
+class SellRuleEvaluator:
+    """Checks the target profit and stop loss prices of BUY_FILLED orders against
+    live bars/quotes and sells the orders that hit one of them.
+
+    `on_bar`/`on_quote` are stream handlers (see AlpacaStreamManager). The index
+    is (re)built from the database with `load`; a triggered order leaves the index
+    right away so later bars don't sell it twice while its sell is submitted.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        alpaca_client: MyAlpacaClient,
+    ):
+        self.session_factory = session_factory
+        self.alpaca_client = alpaca_client
+        self.index = ThresholdIndex()
+        self._selling: set[int] = set()
+        self._lock = threading.Lock()
+
+    def track(self, order: Order) -> None:
+        assert order.id is not None
+        with self._lock:
+            if order.id not in self._selling:
+                self.index.add(
+                    order.id,
+                    order.symbol,
+                    order.target_profit_price,
+                    order.stop_loss_price,
+                )
+
+    def load(self) -> list[str]:
+        """Index every BUY_FILLED order, returns their symbols"""
+        with self.session_factory() as session:
+            orders = session.exec(
+                select(Order).where(Order.status == VirtualOrderStatus.BUY_FILLED)
+            ).all()
+        index = ThresholdIndex()
+        with self._lock:
+            for order in orders:
+                assert order.id is not None
+                if order.id not in self._selling:
+                    index.add(
+                        order.id,
+                        order.symbol,
+                        order.target_profit_price,
+                        order.stop_loss_price,
+                    )
+            self.index = index
+        return index.symbols()
+
+    def evaluate(self, symbol: str, high: float, low: float) -> list[int]:
+        """Take the orders triggered by a price move out of the index"""
+        with self._lock:
+            order_ids = self.index.triggered(symbol, high, low)
+            for order_id in order_ids:
+                self.index.remove(order_id)
+            self._selling.update(order_ids)
+        return order_ids
+
+    def sell(self, order_ids: list[int]) -> None:
+        failed: list[tuple[int, str, float | None, float | None]] = []
+        try:
+            with self.session_factory() as session:
+                for order_id in order_ids:
+                    order = session.get(Order, order_id)
+                    # It may have been sold by the force-sell rule meanwhile
+                    if order is None or order.status != VirtualOrderStatus.BUY_FILLED:
+                        continue
+                    logger.info(
+                        "Order id=%s hit its target/stop price, selling %s",
+                        order.id,
+                        order.symbol,
+                    )
+                    thresholds = (
+                        order_id,
+                        order.symbol,
+                        order.target_profit_price,
+                        order.stop_loss_price,
+                    )
+                    try:
+                        OrderCrud.submit_sell(order, self.alpaca_client)
+                        session.add(order)
+                        session.commit()
+                    except Exception:
+                        # Left BUY_FILLED, the next price move retries it
+                        logger.exception("Failed to sell order id=%s", order_id)
+                        session.rollback()
+                        failed.append(thresholds)
+        finally:
+            with self._lock:
+                self._selling.difference_update(order_ids)
+                for thresholds in failed:
+                    self.index.add(*thresholds)
+
+    async def on_bar(self, bar: AlpacaBar) -> None:
+        order_ids = self.evaluate(bar.symbol, bar.high, bar.low)
+        if order_ids:
+            await asyncio.to_thread(self.sell, order_ids)
+
+    async def on_quote(self, quote: AlpacaQuote) -> None:
+        # Selling happens at the bid
+        order_ids = self.evaluate(quote.symbol, quote.bid_price, quote.bid_price)
+        if order_ids:
+            await asyncio.to_thread(self.sell, order_ids)
+
+
+__all__ = ["SellRuleEvaluator", "ThresholdIndex"]
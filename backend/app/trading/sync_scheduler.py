@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from contextlib import suppress
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session, col, func, select
+
+from app.clients.my_alpaca_client import MyAlpacaClient
+from app.crud.order_crud import OrderCrud
+from app.models.order import Order, OrdersSyncSummary, VirtualOrderStatus
+from app.trading.force_sell_scheduler import ForceSellScheduler
+from app.trading.order_sync import OrderBulkSync
+
+logger = logging.getLogger(__name__)
+
+# While an order waits for Alpaca or a force sell is about to be due
+FAST_INTERVAL_SECONDS = 2.0
+# Orders just submitted to Alpaca, which the next sync is likely to move on
+FAST_SYNC_STATUSES = (
+    VirtualOrderStatus.BUY_PENDING_NEW,
+    VirtualOrderStatus.SELL_PENDING_NEW,
+)
+# How long after its submission an order keeps the sync on the fast interval;
+# one still pending after that is stuck, and synced at the idle interval
+FAST_SYNC_WINDOW = timedelta(minutes=5)
+# Open market, nothing in flight
+IDLE_INTERVAL_SECONDS = 30.0
+# Longest sleep while the market is closed, the clock is read again after it
+MAX_CLOSED_INTERVAL_SECONDS = 15 * 60.0
+
+
+@dataclass
+class SyncCycleStats:
+    started_at: datetime
+    duration_seconds: float
+    # How much later than planned the cycle started (the previous one overran)
+    lag_seconds: float
+    next_interval_seconds: float
+    synced: int = 0
+    failed: int = 0
+    error: str | None = None
+
+
+@dataclass
+class SyncSchedulerStats:
+    cycles: int
+    failed_cycles: int
+    total_duration_seconds: float
+    max_duration_seconds: float
+    max_lag_seconds: float
+    last_cycle: SyncCycleStats | None
+
+
+class OrderSyncScheduler:
+    """Runs the order sync of POST /orders/sync in the background, as often as
+    the orders need it:
+
+    - every `fast_interval` while an order submitted within FAST_SYNC_WINDOW
+      waits for Alpaca (FAST_SYNC_STATUSES), or a force sell is due within
+      `idle_interval`
+    - every `idle_interval` otherwise, while the market is open
+    - not before the next open while the market is closed (re-reading the clock
+      at least every `max_closed_interval`)
+
+    Cycles are planned at a fixed rate from the start of the previous one and run
+    on a worker thread. Each cycle's duration and lag (how late it started, when
+    the previous one took longer than its interval) are logged and kept for
+    `stats`. With `force_sells`, BUY_FILLED orders are force sold at their
+    deadline rather than by a later cycle.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        alpaca_client: MyAlpacaClient,
+        fast_interval: float = FAST_INTERVAL_SECONDS,
+        idle_interval: float = IDLE_INTERVAL_SECONDS,
+        max_closed_interval: float = MAX_CLOSED_INTERVAL_SECONDS,
+        force_sells: ForceSellScheduler | None = None,
+    ):
+        self.session_factory = session_factory
+        self.alpaca_client = alpaca_client
+        self.fast_interval = fast_interval
+        self.idle_interval = idle_interval
+        self.max_closed_interval = max_closed_interval
+        self.force_sells = force_sells
+        self._stats = SyncSchedulerStats(0, 0, 0.0, 0.0, 0.0, None)
+        self._task: asyncio.Task[None] | None = None
+
+    def next_interval(self, session: Session) -> float:
+        clock = self.alpaca_client.get_clock()
+        if not clock.is_open:
+            until_open = (clock.next_open - clock.timestamp).total_seconds()
+            return min(max(until_open, self.fast_interval), self.max_closed_interval)
+
+        # Stored as naive UTC
+        recent = clock.timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        in_flight = session.exec(
+            select(Order.id)
+            .where(
+                col(Order.status).in_(FAST_SYNC_STATUSES),
+                col(Order.status_changed_at) >= recent - FAST_SYNC_WINDOW,
+            )
+            .limit(1)
+        ).first()
+        if in_flight is not None:
+            return self.fast_interval
+
+        next_force_sell: datetime | None = session.exec(
+            select(func.min(Order.force_sell_at)).where(
+                Order.status == VirtualOrderStatus.BUY_FILLED
+            )
+        ).one()
+        if next_force_sell is not None:
+            # Stored as naive UTC
+            until_force_sell = (
+                next_force_sell.replace(tzinfo=timezone.utc) - clock.timestamp
+            ).total_seconds()
+            return min(max(until_force_sell, self.fast_interval), self.idle_interval)
+        return self.idle_interval
+
+    def run_cycle(self) -> tuple[OrdersSyncSummary, float]:
+        """One sync of the active orders, and how long to wait for the next"""
+        with self.session_factory() as session:
+            summary = OrderBulkSync(session, self.alpaca_client).run_pages(
+                OrderCrud.active_order_pages(session)
+            )
+            return summary, self.next_interval(session)
+
+    def _record(self, cycle: SyncCycleStats) -> None:
+        stats = self._stats
+        stats.cycles += 1
+        stats.failed_cycles += cycle.error is not None
+        stats.total_duration_seconds += cycle.duration_seconds
+        stats.max_duration_seconds = max(
+            stats.max_duration_seconds, cycle.duration_seconds
+        )
+        stats.max_lag_seconds = max(stats.max_lag_seconds, cycle.lag_seconds)
+        stats.last_cycle = cycle
+        logger.info(
+            "Order sync cycle took %.2fs, %.2fs behind, %d synced, %d failed, next in %.1fs",
+            cycle.duration_seconds,
+            cycle.lag_seconds,
+            cycle.synced,
+            cycle.failed,
+            cycle.next_interval_seconds,
+        )
+
+    async def run(self) -> None:
+        """The sync cycles, and the force sells at their deadline if given"""
+        if self.force_sells is None:
+            await self._run_cycles()
+            return
+        tasks = [
+            asyncio.create_task(self.force_sells.run()),
+            asyncio.create_task(self._run_cycles()),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # One of them failed, or run was cancelled: stop the other one too
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run_cycles(self) -> None:
+        planned = time.monotonic()
+        while True:
+            started = time.monotonic()
+            started_at = datetime.now(timezone.utc)
+            try:
+                summary, interval = await asyncio.to_thread(self.run_cycle)
+                cycle = SyncCycleStats(
+                    started_at=started_at,
+                    duration_seconds=time.monotonic() - started,
+                    lag_seconds=max(0.0, started - planned),
+                    next_interval_seconds=interval,
+                    synced=summary.synced,
+                    failed=summary.failed,
+                )
+            except Exception as error:
+                logger.exception("Order sync cycle failed")
+                interval = self.idle_interval
+                cycle = SyncCycleStats(
+                    started_at=started_at,
+                    duration_seconds=time.monotonic() - started,
+                    lag_seconds=max(0.0, started - planned),
+                    next_interval_seconds=interval,
+                    error=str(error) or type(error).__name__,
+                )
+            self._record(cycle)
+            planned = started + interval
+            await asyncio.sleep(max(0.0, planned - time.monotonic()))
+
+    def stats(self) -> SyncSchedulerStats:
+        return replace(self._stats)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+__all__ = ["OrderSyncScheduler", "SyncCycleStats", "SyncSchedulerStats"]
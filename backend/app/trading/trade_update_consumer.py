@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from collections.abc import Callable
+
+from alpaca.trading.models import TradeUpdate
+from sqlmodel import Session, col, or_, select
+
+from app.clients.my_alpaca_client import AlpacaOrder, MyAlpacaClient
+from app.crud.order_crud import OrderCrud
+from app.models.order import Order, VirtualOrderStatus
+
+logger = logging.getLogger(__name__)
+
+# Orders still waiting for something to happen at Alpaca
+OPEN_ORDER_STATUSES = (
+    VirtualOrderStatus.BUY_PENDING_NEW,
+    VirtualOrderStatus.BUY_ACCEPTED,
+    VirtualOrderStatus.SELL_PENDING_NEW,
+    VirtualOrderStatus.SELL_ACCEPTED,
+)
+
+
+class TradeUpdateConsumer:
+    """Applies Alpaca's trade updates (order accepted/filled/canceled events of
+    the account) to our orders as they happen, instead of waiting for a sync.
+
+    `on_trade_update` is the TradingStream handler. Updates are applied one at a
+    time, in the order they arrive. Events missed while the stream was down are
+    picked up by `reconcile`, which polls like /orders/sync.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        alpaca_client: MyAlpacaClient,
+        on_buy_filled: Callable[[Order], None] | None = None,
+    ):
+        self.session_factory = session_factory
+        self.alpaca_client = alpaca_client
+        self.on_buy_filled = on_buy_filled
+        self._lock = asyncio.Lock()
+
+    def apply(self, alpaca_order: AlpacaOrder) -> Order | None:
+        with self.session_factory() as session:
+            order = session.exec(
+                select(Order).where(
+                    or_(
+                        col(Order.alpaca_buy_order_id) == alpaca_order.id,
+                        col(Order.alpaca_sell_order_id) == alpaca_order.id,
+                    )
+                )
+            ).first()
+            if order is None:
+                # Placed outside of this app (or a close_position of the symbol)
+                logger.debug("No order for alpaca order id=%s", alpaca_order.id)
+                return None
+
+            status = order.status
+            OrderCrud.apply_alpaca_order_update(order, alpaca_order, self.alpaca_client)
+            session.add(order)
+            session.commit()
+            session.refresh(order)
+            logger.info(
+                "Order id=%s %s -> %s on alpaca order status %s",
+                order.id,
+                status,
+                order.status,
+                alpaca_order.status,
+            )
+
+        if (
+            self.on_buy_filled is not None
+            and status != order.status
+            and order.status == VirtualOrderStatus.BUY_FILLED
+        ):
+            self.on_buy_filled(order)
+        return order
+
+    async def on_trade_update(self, update: TradeUpdate) -> None:
+        async with self._lock:
+            try:
+                await asyncio.to_thread(self.apply, update.order)
+            except Exception:
+                logger.exception("Failed to apply trade update %s", update.event)
+
+    async def reconcile(self) -> None:
+        """Sync every open order from Alpaca's order listing"""
+        async with self._lock:
+            await asyncio.to_thread(self._reconcile)
+
+    def _reconcile(self) -> None:
+        with self.session_factory() as session:
+            orders = session.exec(
+                select(Order).where(col(Order.status).in_(OPEN_ORDER_STATUSES))
+            ).all()
+            alpaca_orders = OrderCrud.fetch_alpaca_orders(orders, self.alpaca_client)
+            for order in orders:
+                waiting_on = order.alpaca_sell_order_id or order.alpaca_buy_order_id
+                for alpaca_order_id in (
+                    order.alpaca_buy_order_id,
+                    order.alpaca_sell_order_id,
+                ):
+                    if alpaca_order_id in alpaca_orders:
+                        OrderCrud.apply_alpaca_order_update(
+                            order, alpaca_orders[alpaca_order_id], self.alpaca_client
+                        )
+                if waiting_on is not None and waiting_on not in alpaca_orders:
+                    # Older than the listing reaches back (ORDER_LISTING_LOOKBACK)
+                    try:
+                        alpaca_order = self.alpaca_client.get_order_by_id(waiting_on)
+                    except Exception:
+                        logger.exception("Failed to fetch alpaca order %s", waiting_on)
+                        continue
+                    OrderCrud.apply_alpaca_order_update(
+                        order, alpaca_order, self.alpaca_client
+                    )
+                session.add(order)
+            session.commit()
+
+
+__all__ = ["OPEN_ORDER_STATUSES", "TradeUpdateConsumer"]
@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.api.deps.alpaca_dep import get_live_price_hub
+from app.clients.live_price_hub import LivePriceHub
+from app.clients.stream_manager import AlpacaStreamManager
+from app.core.config.app_settings import app_settings
+from app.main import app
+from tests.utils.stream import FakeStream, make_bar
+
+URL = f"{app_settings.API_V1_STR}/market/ws"
+
+
+def fake_hub() -> tuple[LivePriceHub, FakeStream]:
+    stocks = FakeStream()
+    hub = LivePriceHub(AlpacaStreamManager(stocks, FakeStream()))  # type: ignore[arg-type]
+    app.dependency_overrides[get_live_price_hub] = lambda: hub
+    return hub, stocks
+
+
+def test_live_prices_websocket(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    hub, stocks = fake_hub()
+    token = normal_user_token_headers["Authorization"].removeprefix("Bearer ")
+
+    with client.websocket_connect(f"{URL}?token={token}") as websocket:
+        websocket.send_text(json.dumps({"action": "subscribe", "bars": ["AAPL"]}))
+        assert websocket.receive_json() == {
+            "type": "subscription",
+            "bars": ["AAPL"],
+            "quotes": [],
+        }
+        websocket.portal.call(stocks._handlers["bars"]["AAPL"], make_bar("AAPL", 1.5))
+        message = websocket.receive_json()
+        assert (message["type"], message["symbol"], message["close"]) == (
+            "bar",
+            "AAPL",
+            1.5,
+        )
+
+        websocket.send_text(json.dumps({"action": "dance"}))
+        assert websocket.receive_json()["type"] == "error"
+
+    # The last client is gone, so is the upstream subscription
+    assert hub.upstream_subscriptions() == {}
+
+
+def test_live_prices_websocket_rejects_invalid_messages(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    hub, _ = fake_hub()
+    token = normal_user_token_headers["Authorization"].removeprefix("Bearer ")
+
+    with client.websocket_connect(f"{URL}?token={token}") as websocket:
+        for text in (
+            "not json",
+            json.dumps(["subscribe"]),
+            json.dumps({"action": "subscribe", "bars": "AAPL"}),
+            json.dumps({"action": "subscribe", "quotes": [1]}),
+            json.dumps({"action": "subscribe", "bars": ["X"] * 101}),
+        ):
+            websocket.send_text(text)
+            assert websocket.receive_json()["type"] == "error"
+
+        websocket.send_text(json.dumps({"action": "subscribe", "bars": [" aapl"]}))
+        assert websocket.receive_json()["bars"] == ["AAPL"]
+
+    assert hub.upstream_subscriptions() == {}
+
+
+def test_live_prices_websocket_requires_a_valid_token(client: TestClient) -> None:
+    fake_hub()
+    with pytest.raises(WebSocketDisconnect) as error:
+        with client.websocket_connect(f"{URL}?token=invalid"):
+            pass
+    assert error.value.code == 1008
+
+
+def test_recent_bars_of_streamed_symbols(client: TestClient) -> None:
+    hub, _ = fake_hub()
+    for close in (1.0, 2.0):
+        bar = make_bar("AAPL", close)
+        bar.timestamp = bar.timestamp.replace(minute=int(close))
+        asyncio.run(hub.on_bar(bar))
+
+    response = client.get(f"{app_settings.API_V1_STR}/market/bars/aapl?limit=1")
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "timestamp": "2025-01-02T15:02:00Z",
+            "open": 2.0,
+            "high": 2.0,
+            "low": 2.0,
+            "close": 2.0,
+            "volume": 100.0,
+        }
+    ]
+    assert client.get(f"{app_settings.API_V1_STR}/market/bars/MSFT").json() == []
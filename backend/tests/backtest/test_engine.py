@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.backtest import BacktestConfig, build_sessions, run_backtest
+from tests.utils.backtest import DAY, session
+
+
+def test_exits_follow_the_order_sell_rules() -> None:
+    config = BacktestConfig()
+    sessions = build_sessions(
+        {
+            ("TARGET", DAY): session(390, {3: (101.0, 105.5, 100.0)}),
+            ("GAP", DAY): session(390, {2: (94.0, 94.5, 93.0)}),
+            ("BOTH", DAY): session(390, {5: (100.0, 106.0, 94.0)}),
+            ("FLAT", DAY): session(390, {}),
+            ("SHORT", DAY): session(30, {}),
+            ("EMPTY", DAY): session(0, {})._replace(
+                timestamp=np.array([], dtype="datetime64[ns]")
+            ),
+        },
+        config,
+    )
+    # The 9:29 bar is before the entry and EMPTY has no bars
+    assert sessions.symbol.tolist() == ["TARGET", "GAP", "BOTH", "FLAT", "SHORT"]
+    assert sessions.length.tolist() == [390, 390, 390, 390, 30]
+
+    result = run_backtest(sessions, config)
+    trades = {trade["symbol"]: trade for trade in result.trades()}
+
+    assert trades["TARGET"]["exit_reason"] == "target_profit"
+    assert trades["TARGET"]["exit_price"] == 105.0
+    assert trades["TARGET"]["pnl"] == 50.0
+    assert trades["GAP"]["exit_reason"] == "stop_loss"
+    assert trades["GAP"]["exit_price"] == 94.0
+    assert trades["BOTH"]["exit_reason"] == "stop_loss"
+    assert trades["BOTH"]["exit_price"] == 95.0
+
+    # Force sold 30 minutes before the 16:00 close
+    assert trades["FLAT"]["exit_reason"] == "force_sell"
+    assert trades["FLAT"]["exit_time"] == datetime(2024, 1, 2, 20, 30)
+    assert trades["FLAT"]["day"] == DAY
+    assert trades["SHORT"]["exit_reason"] == "end_of_data"
+
+    stats = result.stats()
+    assert stats["trades"] == 5
+    assert stats["exit_reasons"] == {
+        "end_of_data": 1,
+        "force_sell": 1,
+        "stop_loss": 2,
+        "target_profit": 1,
+    }
+    assert stats["total_pnl"] == 50.0 - 60.0 - 50.0
+    assert stats["max_drawdown"] == 60.0
+
+
+def test_rules_are_configurable() -> None:
+    windows = {("TARGET", DAY): session(390, {3: (101.0, 105.5, 100.0)})}
+    config = BacktestConfig(
+        target_profit_ratio=1.10, force_sell_before_close=timedelta(0)
+    )
+    result = run_backtest(build_sessions(windows, config), config)
+    assert result.exit_reason.tolist() == ["end_of_data"]
+    assert result.exit_price.tolist() == [100.0]
+
+    empty = run_backtest(build_sessions({}, config), config)
+    assert empty.trades() == []
+    assert empty.stats()["trades"] == 0
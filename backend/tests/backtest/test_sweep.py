@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+import numpy as np
+
+from app.backtest import BacktestConfig, build_sessions, run_sweep, sweep_grid
+from app.backtest.sweep import attach_sessions, shared_sessions
+from tests.utils.backtest import DAY, session
+
+
+def test_shared_sessions_round_trip() -> None:
+    sessions = build_sessions({("AAPL", DAY): session(60, {})}, BacktestConfig())
+    with shared_sessions(sessions) as spec:
+        attached, blocks = attach_sessions(spec)
+        for column, shared in zip(sessions, attached, strict=True):
+            np.testing.assert_array_equal(column, shared)
+        assert not attached.close.flags.writeable
+        del attached
+        for block in blocks:
+            block.close()
+
+
+def test_sweep_ranks_configs_like_sequential_runs() -> None:
+    windows = {
+        (symbol, DAY): session(
+            390, {3: (101.0, 103.5, 100.0), 200: (100.0, 100.5, 96.0)}
+        )
+        for symbol in ("AAPL", "MSFT", "SPY")
+    }
+    sessions = build_sessions(windows, BacktestConfig())
+    configs = sweep_grid(
+        [1.03, 1.05], [0.95, 0.97], [timedelta(minutes=30), timedelta(hours=5)]
+    )
+    assert len(configs) == 8
+
+    ranked = run_sweep(sessions, configs, workers=2)
+    sequential = run_sweep(sessions, configs, workers=1)
+    assert ranked == sequential
+    assert [row["total_pnl"] for row in ranked] == sorted(
+        (row["total_pnl"] for row in ranked), reverse=True
+    )
+    # The 3% target is reached before anything else
+    assert ranked[0]["target_profit_ratio"] == 1.03
+    assert ranked[0]["exit_reasons"] == {"target_profit": 3}
+    # A 97% stop is hit at minute 200 unless force sold 5h before the close
+    worst = ranked[-1]
+    assert (worst["stop_loss_ratio"], worst["force_sell_minutes"]) == (0.97, 30.0)
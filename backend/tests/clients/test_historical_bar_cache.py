@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta, timezone
+
+from alpaca.data.models.bars import Bar as AlpacaBar
+from alpaca.data.timeframe import TimeFrame
+
+from app.clients.historical_bar_cache import HistoricalBarCache
+from app.clients.my_alpaca_client import MyAlpacaClient
+
+START = datetime(2025, 1, 2, 15, 0, tzinfo=timezone.utc)
+
+
+def minute(i: int) -> datetime:
+    return START + timedelta(minutes=i)
+
+
+def make_bar(symbol: str, timestamp: datetime, close: float = 10.0) -> AlpacaBar:
+    return AlpacaBar(
+        symbol,
+        {
+            "t": timestamp,
+            "o": close,
+            "h": close,
+            "l": close,
+            "c": close,
+            "v": 100,
+            "n": 1,
+            "vw": close,
+        },
+    )
+
+
+class FakeBarSource:
+    """One bar per minute, closing at the minute index"""
+
+    def __init__(self) -> None:
+        self.requests: list[tuple[datetime, datetime]] = []
+
+    def __call__(
+        self, symbol: str, timeframe: TimeFrame, start: datetime, end: datetime
+    ) -> list[AlpacaBar]:
+        self.requests.append((start, end))
+        # Alpaca's end is inclusive
+        return [
+            make_bar(symbol, minute(i), i)
+            for i in range(1000)
+            if start <= minute(i) <= end
+        ]
+
+
+def test_only_missing_ranges_are_fetched() -> None:
+    source = FakeBarSource()
+    cache = HistoricalBarCache(source, now=lambda: minute(1000))
+
+    bars = cache.get("AAPL", TimeFrame.Minute, minute(10), minute(20))
+    assert [bar.close for bar in bars] == list(range(10, 20))
+    assert cache.get("AAPL", TimeFrame.Minute, minute(12), minute(18)) == bars[2:8]
+    assert source.requests == [(minute(10), minute(20))]
+
+    bars = cache.get("AAPL", TimeFrame.Minute, minute(0), minute(30))
+    assert [bar.close for bar in bars] == list(range(30))
+    assert source.requests[1:] == [
+        (minute(0), minute(10)),
+        (minute(20), minute(30)),
+    ]
+
+    # Other symbols and timeframes are cached separately
+    cache.get("MSFT", TimeFrame.Minute, minute(0), minute(5))
+    assert len(source.requests) == 4
+    assert cache.stats() == {"hits": 1, "misses": 3, "fetches": 4, "bars_fetched": 35}
+
+
+def test_unfinished_bars_are_fetched_again() -> None:
+    source = FakeBarSource()
+    now = [minute(5) + timedelta(seconds=30)]
+    cache = HistoricalBarCache(source, now=lambda: now[0])
+
+    assert len(cache.get("AAPL", TimeFrame.Minute, minute(0), minute(10))) == 10
+    now[0] = minute(30)
+    assert len(cache.get("AAPL", TimeFrame.Minute, minute(0), minute(10))) == 10
+    # The bar forming at 15:05 and everything after it was not trusted
+    assert source.requests[1] == (minute(4) + timedelta(seconds=30), minute(10))
+
+
+def test_least_recently_used_series_is_dropped() -> None:
+    source = FakeBarSource()
+    cache = HistoricalBarCache(source, now=lambda: minute(1000), max_series=2)
+
+    for symbol in ("AAPL", "MSFT", "AAPL", "TSLA"):
+        cache.get(symbol, TimeFrame.Minute, minute(0), minute(5))
+    assert len(source.requests) == 3
+    # AAPL was used after MSFT, so MSFT made room for TSLA
+    cache.get("AAPL", TimeFrame.Minute, minute(0), minute(5))
+    assert len(source.requests) == 3
+    cache.get("MSFT", TimeFrame.Minute, minute(0), minute(5))
+    assert len(source.requests) == 4
+
+
+def test_get_bars_uses_bar_cache(alpaca_client: MyAlpacaClient) -> None:
+    source = FakeBarSource()
+    alpaca_client.bar_cache = HistoricalBarCache(source, now=lambda: minute(1000))
+
+    bars = alpaca_client.get_bars("AAPL", minute(0), minute(3))
+    assert [bar.timestamp for bar in bars] == [minute(0), minute(1), minute(2)]
+    alpaca_client.get_bars("AAPL", minute(1), minute(2))
+    assert len(source.requests) == 1
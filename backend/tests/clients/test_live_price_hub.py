@@ -0,0 +1,44 @@
+import asyncio
+
+from app.clients.live_price_hub import LivePriceClient, LivePriceHub
+from app.clients.stream_manager import AlpacaStreamManager
+from tests.utils.stream import FakeStream, make_bar
+
+
+def test_one_upstream_subscription_per_symbol() -> None:
+    async def run() -> None:
+        stocks, crypto = FakeStream(), FakeStream()
+        hub = LivePriceHub(AlpacaStreamManager(stocks, crypto))  # type: ignore[arg-type]
+        first, second = LivePriceClient(), LivePriceClient()
+
+        await hub.subscribe(first, "bars", ["AAPL"])
+        await hub.subscribe(second, "bars", ["AAPL", "MSFT"])
+        await asyncio.sleep(0)
+        assert sorted(stocks._handlers["bars"]) == ["AAPL", "MSFT"]
+        assert hub.upstream_subscriptions() == {"bars": ["AAPL", "MSFT"]}
+
+        # Each bar is serialized once and queued for every subscriber
+        await stocks._handlers["bars"]["AAPL"](make_bar("AAPL", 190.0))
+        first_message = first.queue.get_nowait()
+        assert first_message is second.queue.get_nowait()
+        assert '"close": 190.0' in first_message
+        await stocks._handlers["bars"]["MSFT"](make_bar("MSFT", 420.0))
+        assert first.queue.empty()
+        assert second.queue.qsize() == 1
+
+        await hub.unsubscribe(first, "bars", ["AAPL"])
+        assert "AAPL" in stocks._handlers["bars"]
+        await hub.disconnect(second)
+        assert stocks._handlers["bars"] == {}
+        assert hub.upstream_subscriptions() == {}
+        await hub.close()
+
+    asyncio.run(run())
+
+
+def test_slow_clients_drop_their_oldest_messages() -> None:
+    client = LivePriceClient(queue_size=2)
+    for message in ("1", "2", "3"):
+        client.put(message)
+    assert client.dropped == 1
+    assert [client.queue.get_nowait(), client.queue.get_nowait()] == ["2", "3"]
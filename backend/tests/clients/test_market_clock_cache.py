@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+
+from alpaca.trading.models import Clock as AlpacaClock
+
+from app.clients.market_clock_cache import MarketClockCache
+from app.clients.my_alpaca_client import MyAlpacaClient
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_fetch(timestamp: datetime, next_close: datetime):
+    calls = []
+
+    def fetch() -> AlpacaClock:
+        calls.append(1)
+        return AlpacaClock(
+            timestamp=timestamp,
+            is_open=True,
+            next_open=timestamp + timedelta(days=1),
+            next_close=next_close,
+        )
+
+    return fetch, calls
+
+
+def test_clock_cache_extrapolates_between_fetches() -> None:
+    start = datetime(2025, 1, 2, 15, 0, tzinfo=timezone.utc)
+    fetch, calls = make_fetch(start, start + timedelta(hours=6))
+    monotonic = FakeClock()
+    cache = MarketClockCache(fetch, ttl_seconds=60, monotonic=monotonic)
+
+    assert cache.get().timestamp == start
+    monotonic.now += 10
+    assert cache.get().timestamp == start + timedelta(seconds=10)
+    assert len(calls) == 1
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+    monotonic.now += 60
+    cache.get()
+    assert len(calls) == 2
+
+
+def test_clock_cache_refreshes_when_boundary_crossed() -> None:
+    start = datetime(2025, 1, 2, 20, 59, 50, tzinfo=timezone.utc)
+    fetch, calls = make_fetch(start, start + timedelta(seconds=5))
+    monotonic = FakeClock()
+    cache = MarketClockCache(fetch, ttl_seconds=60, monotonic=monotonic)
+
+    cache.get()
+    monotonic.now += 6
+    cache.get()
+    assert len(calls) == 2
+
+
+def test_is_time_passed_uses_cached_clock(alpaca_client: MyAlpacaClient) -> None:
+    start = datetime(2025, 1, 2, 15, 0, tzinfo=timezone.utc)
+    fetch, calls = make_fetch(start, start + timedelta(hours=6))
+    alpaca_client.clock_cache = MarketClockCache(fetch, ttl_seconds=60)
+
+    assert alpaca_client.is_time_passed(datetime(2025, 1, 2, 14, 0))
+    assert not alpaca_client.is_time_passed(datetime(2025, 1, 2, 16, 0))
+    assert alpaca_client.is_next_close_today()
+    assert len(calls) == 1
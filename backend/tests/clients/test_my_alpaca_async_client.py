@@ -0,0 +1,91 @@
+import asyncio
+import json
+from uuid import uuid4
+
+import httpx
+import pytest
+from alpaca.common.exceptions import APIError
+
+from app.clients.my_alpaca_async_client import MyAlpacaAsyncClient
+
+CREDENTIALS = {
+    "api-key": "NOTREAL6A5W029JXQH4D",
+    "secret-key": "NOTREALt5wcgRbktip0fLx4vTneRoBoeOJCjBuLI",
+    "paper": True,
+}
+
+
+def order_json(order_id: str) -> dict[str, object]:
+    return {
+        "id": order_id,
+        "client_order_id": "",
+        "created_at": "2025-01-02T15:00:00Z",
+        "updated_at": "2025-01-02T15:00:01Z",
+        "submitted_at": "2025-01-02T15:00:00Z",
+        "time_in_force": "day",
+        "status": "filled",
+        "extended_hours": False,
+        "filled_avg_price": "101.123456",
+        "filled_qty": "2",
+    }
+
+
+def make_client(handler) -> MyAlpacaAsyncClient:
+    client = MyAlpacaAsyncClient(CREDENTIALS, retry_wait_seconds=0)
+    client.trading_http = httpx.AsyncClient(
+        base_url="https://paper-api.test/v2", transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+def test_get_orders_by_ids_and_cached_clock() -> None:
+    paths: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        paths.append(request.url.path)
+        if request.url.path == "/v2/clock":
+            return httpx.Response(
+                200,
+                json={
+                    "timestamp": "2025-01-02T10:00:00-05:00",
+                    "is_open": True,
+                    "next_open": "2025-01-03T09:30:00-05:00",
+                    "next_close": "2025-01-02T16:00:00-05:00",
+                },
+            )
+        return httpx.Response(200, json=order_json(request.url.path.split("/")[-1]))
+
+    async def run() -> None:
+        client = make_client(handler)
+        order_ids = [uuid4(), uuid4()]
+        alpaca_orders = await client.get_orders_by_ids(order_ids)
+        assert set(alpaca_orders) == set(order_ids)
+        assert alpaca_orders[order_ids[0]].filled_avg_price == 101.1235
+        assert await client.is_next_close_today()
+        assert (await client.get_next_close()).hour == 21
+        await client.aclose()
+
+    asyncio.run(run())
+    assert paths.count("/v2/clock") == 1
+
+
+def test_errors_are_raised_as_api_error() -> None:
+    calls: list[int] = []
+
+    def handler(_request: httpx.Request) -> httpx.Response:
+        calls.append(1)
+        if len(calls) == 1:
+            return httpx.Response(429, text="rate limited")
+        return httpx.Response(
+            404, text=json.dumps({"code": 40410000, "message": "position not found"})
+        )
+
+    async def run() -> None:
+        client = make_client(handler)
+        with pytest.raises(APIError) as exc_info:
+            await client.close_position("AAPL")
+        assert exc_info.value.status_code == 404
+        await client.aclose()
+
+    asyncio.run(run())
+    assert len(calls) == 2
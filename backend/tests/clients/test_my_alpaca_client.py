@@ -0,0 +1,28 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.clients.my_alpaca_client import MyAlpacaClient
+
+
+def test_http_pool_is_sized_for_concurrency(alpaca_client: MyAlpacaClient) -> None:
+    session = MyAlpacaClient._http_session(alpaca_client.trading_client)
+    assert isinstance(session, requests.Session)
+    adapter = session.get_adapter("https://paper-api.alpaca.markets")
+    assert isinstance(adapter, HTTPAdapter)
+    assert adapter._pool_maxsize == 10
+
+
+def test_http_pool_tuning_skipped_without_session(
+    alpaca_client: MyAlpacaClient, monkeypatch
+) -> None:
+    # As with an alpaca-py version that no longer keeps a requests.Session
+    monkeypatch.delattr(alpaca_client.trading_client, "_session")
+    monkeypatch.delattr(alpaca_client.data_client, "_session")
+
+    assert MyAlpacaClient._http_session(alpaca_client.trading_client) is None
+    MyAlpacaClient._mount_http_adapter(alpaca_client.trading_client, 4)
+    assert alpaca_client.connection_stats() == {
+        "connections": 0,
+        "requests": 0,
+        "reused": 0,
+    }
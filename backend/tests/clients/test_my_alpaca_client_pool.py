@@ -0,0 +1,28 @@
+from app.clients.my_alpaca_client_pool import MyAlpacaClientPool
+
+CREDENTIALS = {
+    "api-key": "NOTREAL6A5W029JXQH4D",
+    "secret-key": "NOTREALt5wcgRbktip0fLx4vTneRoBoeOJCjBuLI",
+    "paper": True,
+}
+
+
+def test_pool_reuses_client_per_credentials() -> None:
+    pool = MyAlpacaClientPool()
+    first = pool.get(CREDENTIALS)
+    assert pool.get(dict(CREDENTIALS)) is first
+    other = pool.get({**CREDENTIALS, "api-key": "NOTREALOTHERKEY"})
+    assert other is not first
+
+    stats = pool.stats()
+    assert stats.clients == 2
+    assert stats.created == 2
+    assert stats.reused == 1
+    assert stats.connections == 0
+
+
+def test_streams_are_created_lazily() -> None:
+    client = MyAlpacaClientPool().get(CREDENTIALS)
+    assert "stocks_stream" not in vars(client)
+    assert "crypto_stream" not in vars(client)
+    assert client.crypto_stream is client.crypto_stream
@@ -0,0 +1,81 @@
+import threading
+from datetime import datetime, timezone
+
+from alpaca.data.models.quotes import Quote as AlpacaQuote
+
+from app.clients.my_alpaca_client import MyAlpacaClient
+from app.clients.quote_cache import QuoteCache
+
+
+def make_quote(symbol: str, ask_price: float) -> AlpacaQuote:
+    return AlpacaQuote(
+        symbol,
+        {
+            "t": datetime(2025, 1, 2, 15, 0, tzinfo=timezone.utc),
+            "ap": ask_price,
+            "as": 1,
+            "bp": ask_price - 0.01,
+            "bs": 1,
+        },
+    )
+
+
+def test_get_current_prices_fetches_all_symbols_in_one_call(
+    alpaca_client: MyAlpacaClient,
+) -> None:
+    requests: list[list[str]] = []
+
+    def fetch(symbols: list[str]) -> dict[str, AlpacaQuote]:
+        requests.append(symbols)
+        return {symbol: make_quote(symbol, 10.0) for symbol in symbols}
+
+    alpaca_client.quote_cache = QuoteCache(fetch, ttl_seconds=60)
+
+    prices = alpaca_client.get_current_prices(["AAPL", "MSFT", "AAPL"])
+    assert prices == {"AAPL": 10.0, "MSFT": 10.0}
+    assert alpaca_client.get_current_price("MSFT") == 10.0
+    assert requests == [["AAPL", "MSFT"]]
+
+
+def test_quote_cache_expires_after_ttl() -> None:
+    now = [0.0]
+    requests: list[list[str]] = []
+
+    def fetch(symbols: list[str]) -> dict[str, AlpacaQuote]:
+        requests.append(symbols)
+        return {symbol: make_quote(symbol, 10.0) for symbol in symbols}
+
+    cache = QuoteCache(fetch, ttl_seconds=0.25, monotonic=lambda: now[0])
+    cache.get_many(["AAPL"])
+    now[0] = 0.1
+    cache.get_many(["AAPL", "TSLA"])
+    now[0] = 0.5
+    cache.get_many(["AAPL"])
+    assert requests == [["AAPL"], ["TSLA"], ["AAPL"]]
+
+
+def test_quote_cache_single_flight() -> None:
+    release = threading.Event()
+    started = threading.Event()
+    requests: list[list[str]] = []
+
+    def fetch(symbols: list[str]) -> dict[str, AlpacaQuote]:
+        requests.append(symbols)
+        started.set()
+        release.wait(timeout=5)
+        return {symbol: make_quote(symbol, 12.5) for symbol in symbols}
+
+    cache = QuoteCache(fetch, ttl_seconds=60)
+    results: list[dict[str, AlpacaQuote]] = []
+    first = threading.Thread(target=lambda: results.append(cache.get_many(["AAPL"])))
+    first.start()
+    started.wait(timeout=5)
+    second = threading.Thread(target=lambda: results.append(cache.get_many(["AAPL"])))
+    second.start()
+    release.set()
+    first.join()
+    second.join()
+
+    assert requests == [["AAPL"]]
+    assert [r["AAPL"].ask_price for r in results] == [12.5, 12.5]
+    assert cache.stats()["coalesced"] == 1
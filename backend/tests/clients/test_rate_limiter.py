@@ -0,0 +1,93 @@
+import threading
+import time
+from pathlib import Path
+
+from app.api.deps.alpaca_dep import create_alpaca_rate_limiter
+from app.clients.rate_limiter import (
+    AlpacaRateLimiter,
+    LocalTokenBucket,
+    RequestPriority,
+    SharedTokenBucket,
+)
+from app.core.config.alpaca_settings import AlpacaSettings
+
+
+def test_local_bucket_refills_over_time() -> None:
+    now = [0.0]
+    bucket = LocalTokenBucket(rate_per_minute=60, capacity=2, monotonic=lambda: now[0])
+    assert bucket.try_acquire(0) == 0
+    assert bucket.try_acquire(0) == 0
+    assert bucket.try_acquire(0) == 1.0
+    now[0] = 1.0
+    assert bucket.try_acquire(0) == 0
+
+
+def test_lower_lanes_leave_a_reserve() -> None:
+    limiter = AlpacaRateLimiter(LocalTokenBucket(rate_per_minute=1, capacity=10))
+    # market info must leave 40% of the bucket: 6 of 10 tokens are usable
+    granted = 0
+    while limiter.try_acquire(RequestPriority.MARKET_INFO):
+        granted += 1
+    assert granted == 6
+    assert limiter.try_acquire(RequestPriority.LIQUIDATION)
+    assert limiter.stats()["market_info"].acquired == 6
+
+
+def test_waiting_callers_are_served_by_priority() -> None:
+    limiter = AlpacaRateLimiter(
+        LocalTokenBucket(rate_per_minute=600, capacity=1),
+        reserves={},
+    )
+    limiter.acquire(RequestPriority.MARKET_INFO)
+    served: list[RequestPriority] = []
+
+    def worker(priority: RequestPriority) -> None:
+        limiter.acquire(priority)
+        served.append(priority)
+
+    threads = [
+        threading.Thread(target=worker, args=(priority,))
+        for priority in (RequestPriority.MARKET_INFO, RequestPriority.STATUS_POLLING)
+    ]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    liquidation = threading.Thread(target=worker, args=(RequestPriority.LIQUIDATION,))
+    liquidation.start()
+    for thread in [*threads, liquidation]:
+        thread.join(timeout=5)
+
+    assert served[0] == RequestPriority.LIQUIDATION
+    assert served[1:] == [RequestPriority.STATUS_POLLING, RequestPriority.MARKET_INFO]
+    assert limiter.stats()["liquidation"].max_wait_seconds > 0
+
+
+def test_shared_bucket_budget_is_shared_between_instances(tmp_path: Path) -> None:
+    path = str(tmp_path / "bucket")
+    first = SharedTokenBucket(path, rate_per_minute=1, capacity=3)
+    second = SharedTokenBucket(path, rate_per_minute=1, capacity=3)
+    assert first.try_acquire(0) == 0
+    assert second.try_acquire(0) == 0
+    assert first.try_acquire(0) == 0
+    assert second.try_acquire(0) > 0
+    first.close()
+    second.close()
+
+
+def test_rate_limiter_bucket_follows_the_shared_setting(tmp_path: Path) -> None:
+    def settings(shared: bool) -> AlpacaSettings:
+        return AlpacaSettings(
+            ALPACA_API_KEY="NOTREAL",
+            ALPACA_SECRET_KEY="NOTREAL",
+            ALPACA_NAME="test",
+            ALPACA_PAPER=True,
+            ALPACA_RATE_LIMIT_SHARED=shared,
+            ALPACA_RATE_LIMIT_SHARED_DIR=str(tmp_path),
+        )
+
+    shared = create_alpaca_rate_limiter(settings(True)).bucket
+    assert isinstance(shared, SharedTokenBucket)
+    shared.close()
+    assert isinstance(
+        create_alpaca_rate_limiter(settings(False)).bucket, LocalTokenBucket
+    )
@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any
+
+from app.clients.stream_manager import AlpacaStreamManager
+from tests.utils.stream import FakeStream
+
+
+def test_stream_manager_multiplexes_handlers() -> None:
+    async def run() -> None:
+        stocks, crypto = FakeStream(), FakeStream()
+        manager = AlpacaStreamManager(stocks, crypto)  # type: ignore[arg-type]
+        received: list[tuple[str, str]] = []
+
+        async def first(bar: Any) -> None:
+            received.append(("first", bar))
+
+        async def second(_bar: Any) -> None:
+            raise RuntimeError("broken handler")
+
+        async def third(bar: Any) -> None:
+            received.append(("third", bar))
+
+        await manager.subscribe_bars(["AAPL", "BTC/USD"], first)
+        await asyncio.sleep(0)
+        assert stocks._running and crypto._running
+
+        # Added while running: one upstream subscribe message for the batch
+        await manager.subscribe_bars(["AAPL", "MSFT"], second)
+        await manager.subscribe_bars(["AAPL"], third)
+        assert stocks.sent == [("subscribe", {"bars": ["AAPL", "MSFT"]})]
+
+        await stocks._handlers["bars"]["AAPL"]("bar-1")
+        assert received == [("first", "bar-1"), ("third", "bar-1")]
+
+        await manager.unsubscribe("bars", ["MSFT"], second)
+        await manager.unsubscribe("bars", ["AAPL"], first)
+        assert stocks.sent[-1] == ("unsubscribe", {"bars": ["MSFT"]})
+        assert manager.subscriptions() == {"bars": ["AAPL", "BTC/USD"]}
+
+        await manager.stop()
+        assert stocks.stopped.is_set() and crypto.stopped.is_set()
+
+    asyncio.run(run())
@@ -0,0 +1,40 @@
+import asyncio
+
+from sqlmodel import Session
+
+from app.core.leader_election import LeaderElection
+
+
+def test_single_process_leads_and_hands_off(db: Session) -> None:
+    runs: list[str] = []
+
+    async def lead() -> None:
+        runs.append("started")
+        try:
+            if len(runs) == 1:
+                raise RuntimeError("sync loop crashed")
+            await asyncio.Event().wait()
+        finally:
+            runs.append("stopped")
+
+    election = LeaderElection(
+        db.get_bind(), "order-sync", lead, identity="worker-1", check_seconds=0.01
+    )
+
+    async def run() -> None:
+        election.start()
+        while runs.count("started") < 2:
+            await asyncio.sleep(0.01)
+        status = election.status()
+        assert status.is_leader and status.leader == "worker-1"
+        await election.stop()
+
+    asyncio.run(run())
+    # The crashed loop was restarted, and stopped with the leadership
+    assert runs == ["started", "stopped", "started", "stopped"]
+    status = election.status()
+    assert not status.is_leader and status.leader is None
+    assert [(c.identity, c.elected, c.reason) for c in status.handoffs] == [
+        ("worker-1", True, "lock acquired"),
+        ("worker-1", False, "stopped"),
+    ]
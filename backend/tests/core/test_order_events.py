@@ -0,0 +1,81 @@
+import asyncio
+import json
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.api.routes.orders import order_events
+from app.core.config.app_settings import app_settings
+from app.core.order_events import order_event_broker
+from app.models.order import Order, VirtualOrderStatus
+from tests.utils.user import create_random_user
+
+
+def test_committed_status_changes_reach_the_owner(db: Session) -> None:
+    owner, other = create_random_user(db), create_random_user(db)
+    order = Order(symbol="AAPL", amount=100, owner_id=owner.id)
+    db.add(order)
+    db.commit()
+    order_id = order.id
+
+    def change_status(rollback: bool = False) -> None:
+        with Session(db.get_bind()) as session:
+            fresh = session.get(Order, order_id)
+            assert fresh is not None
+            fresh.buy_submitted(alpaca_order_id=uuid4())
+            session.add(fresh)
+            session.flush()
+            if rollback:
+                session.rollback()
+            else:
+                session.commit()
+
+    async def run() -> None:
+        async with (
+            order_event_broker.subscribe(owner.id) as queue,
+            order_event_broker.subscribe(other.id) as other_queue,
+        ):
+            await asyncio.to_thread(change_status, rollback=True)
+            await asyncio.to_thread(change_status)
+            message = json.loads(await asyncio.wait_for(queue.get(), 1))
+            assert message["id"] == order_id
+            assert message["status"] == VirtualOrderStatus.BUY_PENDING_NEW
+            # Only the committed change, and only to its owner
+            assert queue.empty()
+            assert other_queue.empty()
+
+    asyncio.run(run())
+
+
+def test_events_endpoint_streams_order_changes(client: TestClient, db: Session) -> None:
+    # The test client buffers whole responses, so the endless stream itself is
+    # read straight from the endpoint
+    response = client.get(f"{app_settings.API_V1_STR}/orders/events")
+    assert response.status_code == 401
+
+    user = create_random_user(db)
+    order = Order(symbol="MSFT", amount=100, owner_id=user.id)
+    db.add(order)
+    db.commit()
+
+    def change_status() -> None:
+        order.buy_submitted(alpaca_order_id=uuid4())
+        db.add(order)
+        db.commit()
+
+    async def run() -> list[str]:
+        response = await order_events(current_user=user)
+        assert response.media_type == "text/event-stream"
+        stream = aiter(response.body_iterator)
+        chunks = [await anext(stream)]
+        await asyncio.to_thread(change_status)
+        chunks.append(await asyncio.wait_for(anext(stream), 1))
+        await stream.aclose()
+        return [str(chunk) for chunk in chunks]
+
+    connected, event = asyncio.run(run())
+    assert connected == ": connected\n\n"
+    name, data = event.strip().split("\n")
+    assert name == "event: order"
+    assert json.loads(data.removeprefix("data: "))["symbol"] == "MSFT"
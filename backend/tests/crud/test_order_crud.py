@@ -2,8 +2,10 @@ from app.clients.my_alpaca_client import MyAlpacaClient, AlpacaOrder, AlpacaOrde
 from sqlmodel import Session
 from app.crud.order_crud import OrderCrud, OrderSyncData
 from app.models.order import Order, VirtualOrderStatus
-from uuid import UUID
-from datetime import datetime
+from app.models.user import User
+from uuid import UUID, uuid4
+from datetime import datetime, timedelta, timezone
+from tests.utils.order import make_alpaca_order
 
 def test_handle_buy_pending_new(alpaca_client: MyAlpacaClient) -> None:
     order = Order(status=VirtualOrderStatus.BUY_PENDING_NEW)
@@ -21,3 +23,130 @@ def test_handle_buy_pending_new(alpaca_client: MyAlpacaClient) -> None:
     OrderCrud._handle_buy_pending_new(order=order, sync_data=sync_data, alpaca_client=alpaca_client)
     assert order.status == VirtualOrderStatus.BUY_ACCEPTED
 
+
+
+def test_get_orders_after_paginates(alpaca_client: MyAlpacaClient, monkeypatch) -> None:
+    start = datetime(2025, 1, 2, 15, 0, tzinfo=timezone.utc)
+    all_orders = [make_alpaca_order(uuid4(), AlpacaOrderStatus.FILLED, start + timedelta(seconds=i)) for i in range(5)]
+    requests = []
+
+    def get_orders(filter):
+        requests.append(filter)
+        return [o for o in all_orders if o.submitted_at > filter.after][:filter.limit]
+
+    monkeypatch.setattr(alpaca_client.trading_client, "get_orders", get_orders)
+    alpaca_orders = alpaca_client.get_orders_after(start - timedelta(seconds=1), page_size=2)
+    assert list(alpaca_orders) == [o.id for o in all_orders]
+    # Each page starts again at the last order of the previous one
+    assert len(requests) == 5
+
+
+def test_get_orders_after_keeps_orders_at_page_boundary(alpaca_client: MyAlpacaClient, monkeypatch) -> None:
+    start = datetime(2025, 1, 2, 15, 0, tzinfo=timezone.utc)
+    # The 2nd and 3rd orders share a timestamp, across the first page boundary
+    submitted = [start, start + timedelta(seconds=1), start + timedelta(seconds=1), start + timedelta(seconds=2)]
+    all_orders = [make_alpaca_order(uuid4(), AlpacaOrderStatus.FILLED, at) for at in submitted]
+
+    def get_orders(filter):
+        return [o for o in all_orders if o.submitted_at > filter.after][:filter.limit]
+
+    monkeypatch.setattr(alpaca_client.trading_client, "get_orders", get_orders)
+    alpaca_orders = alpaca_client.get_orders_after(start - timedelta(seconds=1), page_size=2)
+    assert sorted(alpaca_orders) == sorted(o.id for o in all_orders)
+
+
+def test_fetch_alpaca_orders_bounds_the_listing(alpaca_client: MyAlpacaClient, monkeypatch) -> None:
+    now = datetime.now(timezone.utc)
+    stuck = Order(alpaca_buy_order_id=uuid4(), created_at=now - timedelta(days=30))
+    recent = Order(alpaca_buy_order_id=uuid4(), created_at=now - timedelta(hours=1))
+    listed_after = []
+    monkeypatch.setattr(alpaca_client, "get_orders_after", lambda after: listed_after.append(after) or {})
+
+    OrderCrud.fetch_alpaca_orders([recent], alpaca_client)
+    OrderCrud.fetch_alpaca_orders([stuck, recent], alpaca_client)
+    assert listed_after[0] == recent.created_at - timedelta(minutes=5)
+    # Not back to the stuck order, it is fetched by id instead
+    assert listed_after[1] >= now - timedelta(days=1)
+
+
+def test_sync_order_status_uses_prefetched_orders(alpaca_client: MyAlpacaClient, monkeypatch) -> None:
+    buy_order = make_alpaca_order(uuid4(), AlpacaOrderStatus.ACCEPTED, datetime.now(timezone.utc))
+    order = Order(status=VirtualOrderStatus.BUY_PENDING_NEW, alpaca_buy_order_id=buy_order.id)
+    order.owner = User(email="prefetched@test.com", hashed_password="")
+
+    def get_order_by_id(_order_id):
+        raise AssertionError("should not be called for prefetched orders")
+
+    monkeypatch.setattr(alpaca_client, "get_order_by_id", get_order_by_id)
+    OrderCrud.sync_order_status(order=order, alpaca_client=alpaca_client, alpaca_orders={buy_order.id: buy_order})
+    assert order.status == VirtualOrderStatus.BUY_ACCEPTED
+
+
+def test_sync_order_status_fills_accepted_sell(alpaca_client: MyAlpacaClient) -> None:
+    now = datetime.now(timezone.utc)
+    buy_order = make_alpaca_order(uuid4(), AlpacaOrderStatus.FILLED, now)
+    sell_order = make_alpaca_order(uuid4(), AlpacaOrderStatus.FILLED, now)
+    sell_order.filled_avg_price, sell_order.filled_qty = 105.0, 1.0
+    order = Order(status=VirtualOrderStatus.SELL_ACCEPTED,
+                  alpaca_buy_order_id=buy_order.id,
+                  alpaca_sell_order_id=sell_order.id)
+    order.owner = User(email="sell-accepted@test.com", hashed_password="")
+
+    OrderCrud.sync_order_status(order=order, alpaca_client=alpaca_client,
+                                alpaca_orders={buy_order.id: buy_order, sell_order.id: sell_order})
+    assert order.status == VirtualOrderStatus.SELL_FILLED
+    assert order.sell_filled_avg_price == 105.0
+
+
+def test_sync_order_status_fails_canceled_orders(alpaca_client: MyAlpacaClient, monkeypatch) -> None:
+    now = datetime.now(timezone.utc)
+    monkeypatch.setattr(alpaca_client, "get_next_close", lambda: now + timedelta(hours=1))
+
+    def sync(status: VirtualOrderStatus, buy_order, sell_order=None) -> Order:
+        order = Order(status=status,
+                      alpaca_buy_order_id=buy_order.id,
+                      alpaca_sell_order_id=sell_order.id if sell_order else None)
+        order.owner = User(email="canceled@test.com", hashed_password="")
+        alpaca_orders = {o.id: o for o in (buy_order, sell_order) if o is not None}
+        OrderCrud.sync_order_status(order=order, alpaca_client=alpaca_client, alpaca_orders=alpaca_orders)
+        return order
+
+    canceled = make_alpaca_order(uuid4(), AlpacaOrderStatus.CANCELED, now)
+    order = sync(VirtualOrderStatus.BUY_ACCEPTED, canceled)
+    assert order.status == VirtualOrderStatus.BUY_FAILED
+    assert order.error_message == "Alpaca buy order canceled"
+
+    rejected = make_alpaca_order(uuid4(), AlpacaOrderStatus.REJECTED, now)
+    assert sync(VirtualOrderStatus.BUY_PENDING_NEW, rejected).status == VirtualOrderStatus.BUY_FAILED
+
+    # Canceled after a partial fill: the shares bought are kept and sold later
+    partial = make_alpaca_order(uuid4(), AlpacaOrderStatus.CANCELED, now)
+    partial.filled_avg_price, partial.filled_qty = 100.0, 0.5
+    order = sync(VirtualOrderStatus.BUY_ACCEPTED, partial)
+    assert (order.status, order.buy_filled_qty) == (VirtualOrderStatus.BUY_FILLED, 0.5)
+
+    filled = make_alpaca_order(uuid4(), AlpacaOrderStatus.FILLED, now)
+    for status in (VirtualOrderStatus.SELL_PENDING_NEW, VirtualOrderStatus.SELL_ACCEPTED):
+        sell = make_alpaca_order(uuid4(), AlpacaOrderStatus.EXPIRED, now)
+        order = sync(status, filled, sell)
+        assert order.status == VirtualOrderStatus.SELL_FAILED
+        assert order.error_message == "Alpaca sell order expired"
+
+
+def test_active_order_pages_skips_done_orders(db: Session) -> None:
+    user = User(email="active-orders@test.com", hashed_password="")
+    db.add(user)
+    db.commit()
+    orders = [Order(symbol="AAPL", amount=100, owner_id=user.id, status=status)
+              for status in VirtualOrderStatus]
+    db.add_all(orders)
+    db.commit()
+
+    pages = list(OrderCrud.active_order_pages(db, page_size=4))
+
+    assert [len(page) for page in pages] == [4, 2]
+    assert [order.status for page in pages for order in page] == [
+        status for status in VirtualOrderStatus
+        if status not in (VirtualOrderStatus.SELL_FILLED, VirtualOrderStatus.SELL_FAILED,
+                          VirtualOrderStatus.BUY_FAILED)
+    ]
@@ -0,0 +1,148 @@
+import asyncio
+import time
+from collections.abc import Generator
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from alpaca.common.exceptions import APIError
+from alpaca.trading.models import TradeUpdate
+from sqlmodel import Session, select
+
+from app.clients.my_alpaca_client import AlpacaOrderStatus, MyAlpacaClient
+from app.crud import crud
+from app.crud.order_crud import OrderCrud
+from app.fake_alpaca import FakeAlpacaThread, FakeBroker, FakeBrokerConfig
+from app.models.order import Order, OrderCreate, VirtualOrderStatus
+from app.models.user import UserCreate
+
+
+@pytest.fixture(name="fake_alpaca")
+def fake_alpaca_fixture() -> Generator[FakeAlpacaThread, None, None]:
+    config = FakeBrokerConfig(fill_latency_seconds=0.05, partial_fill_ratio=0.3, seed=1)
+    with FakeAlpacaThread(FakeBroker(config)) as fake_alpaca:
+        yield fake_alpaca
+
+
+def test_create_and_sync_orders_against_fake_alpaca(
+    db: Session, fake_alpaca: FakeAlpacaThread
+) -> None:
+    alpaca_client = MyAlpacaClient(fake_alpaca.credentials())
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email="fake-alpaca@test.com", password="12345678"),
+    )
+    for i in range(50):
+        OrderCrud.create_order_with_alpaca_order(
+            user, OrderCreate(symbol=f"SYM{i % 5}", amount=100), db, alpaca_client
+        )
+    time.sleep(0.1)
+
+    orders = db.exec(select(Order)).all()
+    alpaca_orders = OrderCrud.fetch_alpaca_orders(orders, alpaca_client)
+    assert len(alpaca_orders) == 50
+    for order in orders:
+        OrderCrud.sync_order_status(order, alpaca_client, alpaca_orders)
+    assert {order.status for order in orders} == {VirtualOrderStatus.BUY_FILLED}
+    assert orders[0].buy_filled_avg_price == 100.0
+    assert orders[0].buy_filled_qty == 1.0
+    assert alpaca_client.get_position("SYM0").qty == "10"
+
+    order = orders[0]
+    OrderCrud.submit_sell(order, alpaca_client)
+    assert order.status == VirtualOrderStatus.SELL_PENDING_NEW
+    time.sleep(0.1)
+    OrderCrud.sync_order_status(order, alpaca_client)
+    assert order.status == VirtualOrderStatus.SELL_FILLED
+    assert fake_alpaca.broker.stats()["order_statuses"] == {"filled": 51}
+
+
+def test_sell_survives_a_lost_commit(
+    db: Session, fake_alpaca: FakeAlpacaThread
+) -> None:
+    alpaca_client = MyAlpacaClient(fake_alpaca.credentials())
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email="lost-commit@test.com", password="12345678"),
+    )
+    order = OrderCrud.create_order_with_alpaca_order(
+        user, OrderCreate(symbol="AAPL", amount=100), db, alpaca_client
+    )
+    time.sleep(0.1)
+    OrderCrud.sync_order_status(order, alpaca_client)
+    db.commit()
+    assert order.status == VirtualOrderStatus.BUY_FILLED
+
+    OrderCrud.submit_sell(order, alpaca_client)
+    sell_order_id = order.alpaca_sell_order_id
+    assert sell_order_id is not None
+    # The commit recording the sell fails
+    db.rollback()
+
+    # The next sync sees a BUY_FILLED order and sells it again
+    with Session(db.get_bind()) as session:
+        retried = session.get(Order, order.id)
+        assert retried is not None
+        assert retried.status == VirtualOrderStatus.BUY_FILLED
+        OrderCrud.submit_sell(retried, alpaca_client)
+        session.commit()
+        assert retried.status == VirtualOrderStatus.SELL_PENDING_NEW
+        assert retried.alpaca_sell_order_id == sell_order_id
+    sells = [o for o in fake_alpaca.broker.orders.values() if o.side == "sell"]
+    assert len(sells) == 1
+
+
+def test_clock_quotes_and_bars(fake_alpaca: FakeAlpacaThread) -> None:
+    alpaca_client = MyAlpacaClient(fake_alpaca.credentials())
+    fake_alpaca.broker.set_price("AAPL", 150.0)
+
+    assert alpaca_client.get_clock().is_open
+    assert alpaca_client.get_current_prices(["AAPL", "MSFT"]) == {
+        "AAPL": 150.01,
+        "MSFT": 100.01,
+    }
+    end = datetime.now(timezone.utc) - timedelta(hours=1)
+    bars = alpaca_client.get_bars("AAPL", end - timedelta(hours=3), end)
+    assert len(bars) == 180
+
+
+def test_rejects_and_rate_limits(fake_alpaca: FakeAlpacaThread) -> None:
+    alpaca_client = MyAlpacaClient(fake_alpaca.credentials())
+    with pytest.raises(APIError) as error:
+        alpaca_client.submit_sell_qty_order("AAPL", 1)
+    assert error.value.status_code == 403
+
+    fake_alpaca.broker.config.reject_ratio = 1.0
+    alpaca_order = alpaca_client.submit_buy_order("AAPL", 100)
+    time.sleep(0.1)
+    assert (
+        alpaca_client.get_order_by_id(alpaca_order.id).status
+        == AlpacaOrderStatus.REJECTED
+    )
+
+    fake_alpaca.broker.config.rate_limit_ratio = 1.0
+    response = httpx.get(f"{fake_alpaca.url}/v2/clock")
+    assert response.status_code == 429
+
+
+def test_trade_updates_stream(fake_alpaca: FakeAlpacaThread) -> None:
+    alpaca_client = MyAlpacaClient(fake_alpaca.credentials())
+    trading_stream = alpaca_client.trading_stream
+    updates: list[TradeUpdate] = []
+
+    async def on_trade_update(update: TradeUpdate) -> None:
+        updates.append(update)
+        if update.event == "fill":
+            await trading_stream.stop_ws()
+
+    async def run() -> None:
+        trading_stream.subscribe_trade_updates(on_trade_update)
+        task = asyncio.create_task(trading_stream._run_forever())
+        while not trading_stream._running:
+            await asyncio.sleep(0.01)
+        await asyncio.to_thread(alpaca_client.submit_buy_order, "AAPL", 100)
+        await asyncio.wait_for(task, timeout=10)
+
+    asyncio.run(run())
+    assert [update.event for update in updates][-1] == "fill"
+    assert updates[-1].order.filled_qty == "1"
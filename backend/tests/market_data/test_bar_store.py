@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.market_data import BarRingBuffer, BarStore
+
+START = datetime(2025, 1, 2, 14, 30, tzinfo=timezone.utc)
+
+
+def test_ring_buffer_keeps_last_bars_as_contiguous_views() -> None:
+    buffer = BarRingBuffer(capacity=3)
+    for i in range(5):
+        buffer.append(START + timedelta(minutes=i), i, i + 1, i - 1, i + 0.5, 100 * i)
+
+    window = buffer.window()
+    assert len(buffer) == 3
+    assert window.close.tolist() == [2.5, 3.5, 4.5]
+    assert window.timestamp[-1] == np.datetime64("2025-01-02T14:34:00", "ns")
+    # Views into the buffer, not copies
+    assert np.shares_memory(window.close, buffer.window(2).close)
+    assert not window.close.flags.writeable
+    assert buffer.window(2).volume.tolist() == [300, 400]
+
+
+def test_ring_buffer_replaces_same_timestamp_and_ignores_older() -> None:
+    buffer = BarRingBuffer(capacity=3)
+    buffer.append(START, 1, 1, 1, 1, 10)
+    buffer.append(START + timedelta(minutes=1), 2, 2, 2, 2, 20)
+    buffer.append(START + timedelta(minutes=1), 2, 3, 2, 3, 30)
+    buffer.append(START, 9, 9, 9, 9, 90)
+    assert buffer.window().close.tolist() == [1, 3]
+
+
+def test_bar_store_per_symbol() -> None:
+    store = BarStore(capacity=10)
+    store._buffer("AAPL").append(START, 1, 1, 1, 1, 1)
+    assert store.symbols() == ["AAPL"]
+    assert len(store.window("AAPL").close) == 1
+    assert len(store.window("MSFT").close) == 0
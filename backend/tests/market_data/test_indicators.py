@@ -0,0 +1,102 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.clients.my_alpaca_client import AlpacaBar
+from app.market_data import (
+    ATR,
+    EMA,
+    RSI,
+    SMA,
+    VWAP,
+    BarRingBuffer,
+    IndicatorEngine,
+)
+
+START = datetime(2024, 1, 2, 20, 0, tzinfo=timezone.utc)
+
+
+def random_bars(count: int) -> list[AlpacaBar]:
+    rng = np.random.default_rng(7)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, count)))
+    bars = []
+    for i, price in enumerate(close.tolist()):
+        spread = float(rng.uniform(0.01, 0.5))
+        bars.append(
+            AlpacaBar(
+                "AAPL",
+                {
+                    # Crosses midnight UTC, VWAP starts over
+                    "t": START + timedelta(minutes=10 * i),
+                    "o": price,
+                    "h": price + spread,
+                    "l": price - spread,
+                    "c": price,
+                    # Some bars without volume
+                    "v": float(rng.integers(0, 3) * 100),
+                    "n": 1,
+                    "vw": price,
+                },
+            )
+        )
+    return bars
+
+
+def test_streaming_values_equal_batch_values() -> None:
+    engine = IndicatorEngine(
+        {
+            "sma": lambda: SMA(20),
+            "ema": lambda: EMA(12),
+            "rsi": lambda: RSI(14),
+            "atr": lambda: ATR(14),
+            "vwap": VWAP,
+        }
+    )
+    bars = random_bars(300)
+    buffer = BarRingBuffer(len(bars))
+    streamed: dict[str, list[float]] = {name: [] for name in engine.indicators}
+    for bar in bars:
+        buffer.append_bar(bar)
+        for name, value in engine.update(bar).items():
+            streamed[name].append(math.nan if value is None else value)
+
+    batch = engine.batch(buffer.window())
+    for name, values in streamed.items():
+        # Exactly equal, NaN while warming up
+        np.testing.assert_array_equal(batch[name], values, err_msg=name)
+
+    assert np.isnan(batch["sma"][:19]).all() and not np.isnan(batch["sma"][19:]).any()
+    assert np.isnan(batch["rsi"][:14]).all() and not np.isnan(batch["rsi"][14:]).any()
+    assert engine.latest("AAPL")["ema"] == streamed["ema"][-1]
+    assert engine.latest("MSFT") == dict.fromkeys(engine.indicators)
+
+
+def test_indicator_values() -> None:
+    bars = random_bars(30)
+    closes = [bar.close for bar in bars]
+
+    sma = SMA(3)
+    values = [sma.update(bar) for bar in bars[:4]]
+    assert values[:2] == [None, None]
+    assert values[3] is not None
+    assert math.isclose(values[3], sum(closes[1:4]) / 3)
+
+    rsi = RSI(5)
+    rising = [
+        AlpacaBar(
+            "AAPL",
+            {
+                "t": bar.timestamp,
+                "o": 100.0 + i,
+                "h": 100.0 + i,
+                "l": 100.0 + i,
+                "c": 100.0 + i,
+                "v": 100.0,
+                "n": 1,
+                "vw": 100.0 + i,
+            },
+        )
+        for i, bar in enumerate(bars)
+    ]
+    assert [rsi.update(bar) for bar in rising][-1] == 100.0
@@ -0,0 +1,67 @@
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+from app.market_data import MinuteBarStore
+
+START = datetime(2024, 1, 2, 23, 55, tzinfo=timezone.utc)
+
+
+def fill(store: MinuteBarStore, symbol: str, count: int) -> None:
+    for i in range(count):
+        price = 100.0 + i
+        store.append(
+            symbol,
+            START + timedelta(minutes=i),
+            price,
+            price + 1,
+            price - 1,
+            price + 0.5,
+            10.0 * i,
+        )
+
+
+def test_append_splits_bars_by_utc_day(tmp_path: Path) -> None:
+    store = MinuteBarStore(tmp_path)
+    fill(store, "BTC/USD", 10)
+    assert store.days("BTC/USD") == [date(2024, 1, 2), date(2024, 1, 3)]
+
+    day = store.read_day("BTC/USD", date(2024, 1, 2))
+    assert isinstance(day.close, np.memmap)
+    assert day.close.tolist() == [100.5, 101.5, 102.5, 103.5, 104.5]
+    assert len(store.read_day("BTC/USD", date(2024, 1, 3)).close) == 5
+    store.close()
+
+
+def test_append_rejects_older_bars(tmp_path: Path) -> None:
+    store = MinuteBarStore(tmp_path)
+    fill(store, "AAPL", 3)
+    assert not store.append("AAPL", START, 1, 1, 1, 1, 1)
+    assert store.append("AAPL", START + timedelta(minutes=3), 1, 1, 1, 1, 1)
+    store.close()
+
+    # The last stored timestamp is recovered when the store is reopened
+    reopened = MinuteBarStore(tmp_path)
+    assert not reopened.append("AAPL", START + timedelta(minutes=3), 2, 2, 2, 2, 2)
+    assert len(reopened.read_day("AAPL", date(2024, 1, 2)).close) == 4
+    reopened.close()
+
+
+def test_read_range(tmp_path: Path) -> None:
+    store = MinuteBarStore(tmp_path)
+    fill(store, "AAPL", 10)
+
+    inside_day = store.read_range(
+        "AAPL", START + timedelta(minutes=1), START + timedelta(minutes=3)
+    )
+    assert inside_day.open.tolist() == [101.0, 102.0]
+
+    across_days = store.read_range(
+        "AAPL", START + timedelta(minutes=3), START + timedelta(minutes=7)
+    )
+    assert across_days.open.tolist() == [103.0, 104.0, 105.0, 106.0]
+    assert across_days.timestamp[0] == np.datetime64("2024-01-02T23:58", "ns")
+
+    assert len(store.read_range("MSFT", START, START + timedelta(days=1)).close) == 0
+    store.close()
@@ -0,0 +1,102 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from alpaca.data.timeframe import TimeFrame, TimeFrameUnit
+
+from app.clients.my_alpaca_client import AlpacaBar
+from app.market_data import BarResampler, MinuteBarStore, resample, to_datetime64
+
+START = datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc)
+FIVE_MINUTES = TimeFrame(5, TimeFrameUnit.Minute)
+ONE_HOUR = TimeFrame(1, TimeFrameUnit.Hour)
+
+
+def minute_bar(symbol: str, minute: int) -> AlpacaBar:
+    price = 100.0 + (minute * 7) % 11
+    return AlpacaBar(
+        symbol,
+        {
+            "t": START + timedelta(minutes=minute),
+            "o": price,
+            "h": price + 1,
+            "l": price - 1,
+            "c": price + 0.5,
+            "v": 10.0 + minute,
+            "n": 1,
+            "vw": price,
+        },
+    )
+
+
+def test_completed_bars_are_published_to_subscribers() -> None:
+    resampler = BarResampler([FIVE_MINUTES, ONE_HOUR])
+    five_minute_bars: list[AlpacaBar] = []
+    hour_bars: list[AlpacaBar] = []
+
+    async def on_five_minutes(bar: AlpacaBar) -> None:
+        five_minute_bars.append(bar)
+
+    async def on_hour(bar: AlpacaBar) -> None:
+        hour_bars.append(bar)
+
+    resampler.subscribe(FIVE_MINUTES, on_five_minutes)
+    resampler.subscribe(ONE_HOUR, on_hour)
+
+    async def run() -> None:
+        for minute in range(32):
+            await resampler.on_bar(minute_bar("AAPL", minute))
+
+    asyncio.run(run())
+
+    # 14:30 to 15:00 completes the 14:xx hour
+    assert len(five_minute_bars) == 6
+    first = five_minute_bars[0]
+    assert first.timestamp == START
+    assert first.open == minute_bar("AAPL", 0).open
+    assert first.close == minute_bar("AAPL", 4).close
+    assert first.high == max(minute_bar("AAPL", m).high for m in range(5))
+    assert first.volume == sum(10.0 + m for m in range(5))
+    assert [bar.timestamp for bar in hour_bars] == [START.replace(minute=0)]
+
+    asyncio.run(resampler.on_close())
+    assert len(five_minute_bars) == 7
+    assert hour_bars[-1].timestamp == START.replace(hour=15, minute=0)
+
+
+def test_gap_completes_the_open_bar_and_late_bars_are_skipped() -> None:
+    resampler = BarResampler([FIVE_MINUTES])
+    assert resampler.add_bar(minute_bar("AAPL", 0)) == []
+    assert resampler.add_bar(minute_bar("AAPL", 1)) == []
+
+    # No bars for 14:32-14:34, the 14:40 bar closes the 14:30 one
+    completed = resampler.add_bar(minute_bar("AAPL", 10))
+    assert [(tf, bar.timestamp) for tf, bar in completed] == [("5Min", START)]
+    assert completed[0][1].volume == 21.0
+
+    assert resampler.add_bar(minute_bar("AAPL", 3)) == []
+    assert resampler.add_bar(minute_bar("MSFT", 3)) == []
+    assert [bar.symbol for _, bar in resampler.flush("MSFT")] == ["MSFT"]
+    assert [bar.symbol for _, bar in resampler.flush()] == ["AAPL"]
+
+
+def test_resample_matches_streaming(tmp_path: Path) -> None:
+    store = MinuteBarStore(tmp_path)
+    resampler = BarResampler([FIVE_MINUTES])
+    streamed: list[AlpacaBar] = []
+    for minute in [*range(0, 12), *range(15, 50), 58, 59, 61]:
+        bar = minute_bar("AAPL", minute)
+        store.append_bar(bar)
+        streamed.extend(bar for _, bar in resampler.add_bar(bar))
+    streamed.extend(bar for _, bar in resampler.flush())
+
+    history = store.read_range("AAPL", START, START + timedelta(hours=2))
+    batch = resample(history, FIVE_MINUTES)
+    store.close()
+
+    assert list(batch.timestamp) == [to_datetime64(bar.timestamp) for bar in streamed]
+    assert batch.open.tolist() == [bar.open for bar in streamed]
+    assert batch.high.tolist() == [bar.high for bar in streamed]
+    assert batch.low.tolist() == [bar.low for bar in streamed]
+    assert batch.close.tolist() == [bar.close for bar in streamed]
+    assert batch.volume.tolist() == [bar.volume for bar in streamed]
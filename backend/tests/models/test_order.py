@@ -20,4 +20,5 @@ def test_buy_submitted(db: Session) -> None:
     db.add(order)
     db.commit()
     db.refresh(order)
-    assert order.status == VirtualOrderStatus.BUY_PENDING_NEW
\ No newline at end of file
+    assert order.status == VirtualOrderStatus.BUY_PENDING_NEW
+    assert order.status_changed_at is not None
\ No newline at end of file
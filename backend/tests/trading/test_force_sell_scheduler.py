@@ -0,0 +1,238 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from sqlmodel import Session, select
+
+from app.clients.market_clock_cache import ClockSnapshot
+from app.clients.my_alpaca_client import AlpacaOrderStatus, MyAlpacaClient
+from app.core.order_events import order_event_broker
+from app.crud import crud
+from app.models.order import FORCE_SELL_BEFORE_CLOSE, Order, VirtualOrderStatus
+from app.models.user import UserCreate
+from app.trading import DeadlineHeap, ForceSellScheduler, force_sell_scheduler
+from tests.utils.order import make_alpaca_order
+
+T0 = datetime(2025, 1, 2, 20, 30, tzinfo=timezone.utc)
+
+
+def test_deadline_heap() -> None:
+    heap = DeadlineHeap()
+    heap.add(1, T0 + timedelta(seconds=3))
+    heap.add(2, T0 + timedelta(seconds=1))
+    heap.add(3, T0 + timedelta(seconds=2))
+    # Naive deadlines are UTC, like force_sell_at
+    heap.add(4, (T0 + timedelta(seconds=4)).replace(tzinfo=None))
+    assert heap.cancel(3)
+    assert not heap.cancel(3)
+    heap.add(1, T0 + timedelta(seconds=5))
+
+    assert len(heap) == 3
+    assert heap.next_deadline() == T0 + timedelta(seconds=1)
+    assert heap.pop_due(T0) == []
+    assert heap.pop_due(T0 + timedelta(seconds=4)) == [2, 4]
+    assert heap.next_deadline() == T0 + timedelta(seconds=5)
+    assert heap.pop_due(T0 + timedelta(seconds=10)) == [1]
+    assert heap.next_deadline() is None and len(heap) == 0
+
+    # Stale entries don't pile up
+    for i in range(1000):
+        heap.add(7, T0 + timedelta(seconds=i))
+    assert len(heap._heap) < 200
+    assert heap.pop_due(T0 + timedelta(hours=1)) == [7]
+
+
+def test_force_sells_at_the_deadline(
+    db: Session, alpaca_client: MyAlpacaClient, monkeypatch
+) -> None:
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email="force-sell@test.com", password="12345678"),
+    )
+
+    def add_filled_order(symbol: str, force_sell_at: datetime) -> Order:
+        order = Order(symbol=symbol, amount=100, owner_id=user.id)
+        order.buy_submitted(alpaca_order_id=uuid4())
+        order.buy_filled(
+            100.0,
+            1.0,
+            market_close_at=force_sell_at.replace(tzinfo=None)
+            + FORCE_SELL_BEFORE_CLOSE,
+        )
+        db.add(order)
+        db.commit()
+        return order
+
+    monkeypatch.setattr(
+        alpaca_client,
+        "get_clock",
+        lambda: ClockSnapshot(
+            timestamp=datetime.now(timezone.utc),
+            is_open=True,
+            next_open=T0 + timedelta(days=1),
+            next_close=T0 + timedelta(hours=1),
+        ),
+    )
+    sold: dict[str, datetime] = {}
+
+    def submit_sell_qty_order(symbol, *_args, **_kwargs):
+        sold[symbol] = datetime.now(timezone.utc)
+        return make_alpaca_order(uuid4(), AlpacaOrderStatus.ACCEPTED, T0)
+
+    monkeypatch.setattr(alpaca_client, "submit_sell_qty_order", submit_sell_qty_order)
+
+    later = add_filled_order("MSFT", datetime.now(timezone.utc) + timedelta(hours=1))
+    scheduler = ForceSellScheduler(lambda: Session(db.get_bind()), alpaca_client)
+    assert scheduler.load() == 1
+
+    async def run() -> datetime:
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.05)
+        # Wakes up the scheduler sleeping until the MSFT deadline
+        deadline = datetime.now(timezone.utc) + timedelta(seconds=0.2)
+        scheduler.track(add_filled_order("AAPL", deadline))
+        started = time.monotonic()
+        while "AAPL" not in sold and time.monotonic() - started < 5:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        return deadline
+
+    deadline = asyncio.run(run())
+    assert list(sold) == ["AAPL"]
+    assert timedelta(0) <= sold["AAPL"] - deadline < timedelta(seconds=0.5)
+    with Session(db.get_bind()) as session:
+        statuses = {order.symbol: order.status for order in session.exec(select(Order))}
+    assert statuses == {
+        "AAPL": VirtualOrderStatus.SELL_PENDING_NEW,
+        "MSFT": VirtualOrderStatus.BUY_FILLED,
+    }
+    assert later.id in scheduler.deadlines
+
+
+def test_run_survives_clock_errors(
+    db: Session, alpaca_client: MyAlpacaClient, monkeypatch
+) -> None:
+    monkeypatch.setattr(force_sell_scheduler, "RETRY_SECONDS", 0.01)
+    clock_calls: list[int] = []
+
+    def get_clock() -> ClockSnapshot:
+        clock_calls.append(1)
+        if len(clock_calls) == 1:
+            raise ConnectionError("clock unavailable")
+        return ClockSnapshot(
+            timestamp=T0 + timedelta(minutes=1),
+            is_open=True,
+            next_open=T0 + timedelta(days=1),
+            next_close=T0 + timedelta(hours=1),
+        )
+
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email="clock-errors@test.com", password="12345678"),
+    )
+    order = Order(symbol="AAPL", amount=100, owner_id=user.id)
+    order.buy_submitted(alpaca_order_id=uuid4())
+    order.buy_filled(100.0, 1.0, market_close_at=T0 + FORCE_SELL_BEFORE_CLOSE)
+    db.add(order)
+    db.commit()
+
+    monkeypatch.setattr(alpaca_client, "get_clock", get_clock)
+    scheduler = ForceSellScheduler(lambda: Session(db.get_bind()), alpaca_client)
+    sold: list[list[int]] = []
+    monkeypatch.setattr(scheduler, "sell", sold.append)
+
+    async def run() -> None:
+        task = asyncio.create_task(scheduler.run())
+        started = time.monotonic()
+        while not sold and time.monotonic() - started < 5:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(run())
+    assert sold == [[order.id]]
+    assert len(clock_calls) == 2
+
+
+def test_failed_sells_are_retried(
+    db: Session, alpaca_client: MyAlpacaClient, monkeypatch
+) -> None:
+    monkeypatch.setattr(force_sell_scheduler, "RETRY_SECONDS", 0.01)
+    monkeypatch.setattr(
+        alpaca_client,
+        "get_clock",
+        lambda: ClockSnapshot(
+            timestamp=datetime.now(timezone.utc),
+            is_open=True,
+            next_open=T0 + timedelta(days=1),
+            next_close=T0 + timedelta(hours=1),
+        ),
+    )
+    attempts: list[str] = []
+
+    def submit_sell_qty_order(symbol, *_args, **_kwargs):
+        attempts.append(symbol)
+        if len(attempts) == 1:
+            raise ConnectionError("connection reset")
+        return make_alpaca_order(uuid4(), AlpacaOrderStatus.ACCEPTED, T0)
+
+    monkeypatch.setattr(alpaca_client, "submit_sell_qty_order", submit_sell_qty_order)
+
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email="failed-sells@test.com", password="12345678"),
+    )
+    order = Order(symbol="AAPL", amount=100, owner_id=user.id)
+    order.buy_submitted(alpaca_order_id=uuid4())
+    order.buy_filled(100.0, 1.0, market_close_at=T0 + FORCE_SELL_BEFORE_CLOSE)
+    db.add(order)
+    db.commit()
+    scheduler = ForceSellScheduler(lambda: Session(db.get_bind()), alpaca_client)
+
+    async def run() -> None:
+        task = asyncio.create_task(scheduler.run())
+        started = time.monotonic()
+        while len(attempts) < 2 and time.monotonic() - started < 5:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(run())
+    assert attempts == ["AAPL", "AAPL"]
+    db.refresh(order)
+    assert order.status == VirtualOrderStatus.SELL_PENDING_NEW
+    assert order.id not in scheduler.deadlines
+
+
+def test_follows_order_status_changes(
+    db: Session, alpaca_client: MyAlpacaClient
+) -> None:
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email="order-changes@test.com", password="12345678"),
+    )
+    order = Order(symbol="AAPL", amount=100, owner_id=user.id)
+    order.buy_submitted(alpaca_order_id=uuid4())
+    db.add(order)
+    db.commit()
+    scheduler = ForceSellScheduler(
+        lambda: Session(db.get_bind()), alpaca_client, order_events=order_event_broker
+    )
+
+    async def run() -> tuple[bool, bool]:
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.05)
+        # Committed elsewhere, e.g. by the trade updates consumer
+        order.buy_filled(100.0, 1.0, market_close_at=T0 + timedelta(days=365))
+        db.add(order)
+        db.commit()
+        tracked = order.id in scheduler.deadlines
+        # Sold by the sell rules
+        order.sell_submitted(alpaca_order_id=uuid4())
+        db.add(order)
+        db.commit()
+        dropped = order.id not in scheduler.deadlines
+        task.cancel()
+        return tracked, dropped
+
+    assert asyncio.run(run()) == (True, True)
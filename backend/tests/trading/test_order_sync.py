@@ -0,0 +1,202 @@
+from datetime import datetime, timedelta, timezone
+from uuid import UUID, uuid4
+
+from sqlmodel import Session, select
+
+from app.clients.my_alpaca_client import AlpacaOrderStatus, MyAlpacaClient
+from app.crud import crud
+from app.crud.order_crud import OrderCrud
+from app.models.order import Order, VirtualOrderStatus
+from app.models.user import UserCreate
+from app.trading import OrderBulkSync
+from tests.utils.order import make_alpaca_order
+
+NOW = datetime(2025, 1, 2, 20, 45, tzinfo=timezone.utc)
+
+
+def test_bulk_sync_isolates_failing_orders(
+    db: Session, alpaca_client: MyAlpacaClient, monkeypatch
+) -> None:
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email="bulk-sync@test.com", password="12345678"),
+    )
+
+    def add_order(buy_order_id: UUID | None, **fields) -> Order:
+        order = Order(symbol="AAPL", amount=100, owner_id=user.id, **fields)
+        if buy_order_id:
+            order.buy_submitted(alpaca_order_id=buy_order_id)
+        db.add(order)
+        db.commit()
+        return order
+
+    listed_id, fetched_id, broken_id = uuid4(), uuid4(), uuid4()
+    listed = add_order(listed_id)
+    fetched = add_order(fetched_id)
+    broken = add_order(broken_id)
+    never_submitted = add_order(None)
+    due = add_order(uuid4())
+    due.buy_filled(100.0, 1.0, market_close_at=NOW)
+    db.add(due)
+    db.commit()
+
+    filled = make_alpaca_order(fetched_id, AlpacaOrderStatus.FILLED, NOW)
+    filled.filled_avg_price, filled.filled_qty = 100.0, 1.0
+    monkeypatch.setattr(
+        alpaca_client,
+        "get_orders_after",
+        lambda after: {
+            listed_id: make_alpaca_order(listed_id, AlpacaOrderStatus.ACCEPTED, NOW)
+        },
+    )
+
+    def get_order_by_id(order_id: UUID):
+        if order_id == broken_id:
+            raise RuntimeError("alpaca is down")
+        if order_id == fetched_id:
+            return filled
+        return make_alpaca_order(order_id, AlpacaOrderStatus.FILLED, NOW)
+
+    sell_order_id = uuid4()
+    monkeypatch.setattr(alpaca_client, "get_order_by_id", get_order_by_id)
+    monkeypatch.setattr(
+        alpaca_client, "get_next_close", lambda: NOW + timedelta(hours=1)
+    )
+    monkeypatch.setattr(
+        alpaca_client,
+        "is_time_passed",
+        lambda time: time.replace(tzinfo=timezone.utc) <= NOW,
+    )
+    monkeypatch.setattr(
+        alpaca_client,
+        "submit_sell_qty_order",
+        lambda symbol, qty, client_order_id: make_alpaca_order(
+            sell_order_id, AlpacaOrderStatus.ACCEPTED, NOW
+        ),
+    )
+
+    orders = [listed, fetched, broken, never_submitted, due]
+    summary = OrderBulkSync(db, alpaca_client, max_concurrency=4).run(orders)
+
+    assert (summary.total, summary.synced, summary.failed) == (5, 3, 2)
+    assert summary.statuses == {
+        VirtualOrderStatus.BUY_ACCEPTED: 1,
+        VirtualOrderStatus.BUY_FILLED: 1,
+        VirtualOrderStatus.SELL_PENDING_NEW: 1,
+    }
+    assert summary.errors == {
+        broken.id: "alpaca is down",
+        never_submitted.id: "Order was created but no matching alpaca buy order",
+    }
+
+    # Committed, failed orders are left as they were
+    with Session(db.get_bind()) as session:
+        statuses = {
+            order.id: order.status
+            for order in (session.get(Order, o.id) for o in orders)
+            if order is not None
+        }
+    assert statuses == {
+        listed.id: VirtualOrderStatus.BUY_ACCEPTED,
+        fetched.id: VirtualOrderStatus.BUY_FILLED,
+        broken.id: VirtualOrderStatus.BUY_PENDING_NEW,
+        never_submitted.id: VirtualOrderStatus.NEW,
+        due.id: VirtualOrderStatus.SELL_PENDING_NEW,
+    }
+    with Session(db.get_bind()) as session:
+        sold = session.get(Order, due.id)
+        assert sold is not None and sold.alpaca_sell_order_id == sell_order_id
+
+
+def test_run_pages_releases_synced_pages(
+    db: Session, alpaca_client: MyAlpacaClient, monkeypatch
+) -> None:
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email="paged-sync@test.com", password="12345678"),
+    )
+    alpaca_ids = [uuid4() for _ in range(5)]
+    for alpaca_order_id in alpaca_ids:
+        order = Order(symbol="AAPL", amount=100, owner_id=user.id)
+        order.buy_submitted(alpaca_order_id=alpaca_order_id)
+        db.add(order)
+    db.add(
+        Order(
+            symbol="AAPL",
+            amount=100,
+            owner_id=user.id,
+            status=VirtualOrderStatus.SELL_FILLED,
+        )
+    )
+    db.commit()
+    db.expunge_all()
+
+    monkeypatch.setattr(
+        alpaca_client,
+        "get_orders_after",
+        lambda after: {
+            alpaca_order_id: make_alpaca_order(
+                alpaca_order_id, AlpacaOrderStatus.ACCEPTED, NOW
+            )
+            for alpaca_order_id in alpaca_ids
+        },
+    )
+    monkeypatch.setattr(alpaca_client, "is_time_passed", lambda time: False)
+    pages = OrderCrud.active_order_pages(db, page_size=2)
+    summary = OrderBulkSync(db, alpaca_client).run_pages(pages)
+
+    assert (summary.total, summary.synced, summary.failed) == (5, 5, 0)
+    assert summary.statuses == {VirtualOrderStatus.BUY_ACCEPTED: 5}
+    assert not any(isinstance(instance, Order) for instance in db.identity_map.values())
+    with Session(db.get_bind()) as session:
+        statuses = session.exec(select(Order.status)).all()
+    assert sorted(statuses) == sorted(
+        [VirtualOrderStatus.BUY_ACCEPTED] * 5 + [VirtualOrderStatus.SELL_FILLED]
+    )
+
+
+def test_failed_force_sell_does_not_stop_the_others(
+    db: Session, alpaca_client: MyAlpacaClient, monkeypatch
+) -> None:
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email="force-sells@test.com", password="12345678"),
+    )
+    orders = []
+    for symbol in ("AAPL", "MSFT", "NVDA"):
+        order = Order(symbol=symbol, amount=100, owner_id=user.id)
+        order.buy_submitted(alpaca_order_id=uuid4())
+        order.buy_filled(100.0, 1.0, market_close_at=NOW)
+        db.add(order)
+        orders.append(order)
+    db.commit()
+
+    monkeypatch.setattr(alpaca_client, "get_orders_after", lambda after: {})
+    monkeypatch.setattr(
+        alpaca_client,
+        "get_order_by_id",
+        lambda order_id: make_alpaca_order(order_id, AlpacaOrderStatus.FILLED, NOW),
+    )
+    monkeypatch.setattr(
+        alpaca_client,
+        "is_time_passed",
+        lambda time: time.replace(tzinfo=timezone.utc) <= NOW,
+    )
+
+    def submit_sell_qty_order(symbol: str, *_args: object, **_kwargs: object):
+        if symbol == "MSFT":
+            raise RuntimeError("connection reset")
+        return make_alpaca_order(uuid4(), AlpacaOrderStatus.ACCEPTED, NOW)
+
+    monkeypatch.setattr(alpaca_client, "submit_sell_qty_order", submit_sell_qty_order)
+    summary = OrderBulkSync(db, alpaca_client, max_concurrency=3).run(orders)
+
+    assert (summary.synced, summary.failed) == (2, 1)
+    assert summary.errors == {orders[1].id: "connection reset"}
+    with Session(db.get_bind()) as session:
+        statuses = [session.get(Order, order.id).status for order in orders]
+    assert statuses == [
+        VirtualOrderStatus.SELL_PENDING_NEW,
+        VirtualOrderStatus.BUY_FILLED,
+        VirtualOrderStatus.SELL_PENDING_NEW,
+    ]
@@ -0,0 +1,139 @@
+import asyncio
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from sqlmodel import Session
+
+from app.clients.my_alpaca_client import AlpacaBar, AlpacaOrderStatus, MyAlpacaClient
+from app.crud import crud
+from app.models.order import Order, VirtualOrderStatus
+from app.models.user import UserCreate
+from app.trading import SellRuleEvaluator, ThresholdIndex
+from tests.utils.order import make_alpaca_order
+
+
+def test_threshold_index_finds_triggered_orders() -> None:
+    index = ThresholdIndex()
+    index.add(1, "AAPL", target_profit_price=105, stop_loss_price=95)
+    index.add(2, "AAPL", target_profit_price=110, stop_loss_price=90)
+    index.add(3, "AAPL", target_profit_price=None, stop_loss_price=99)
+    index.add(4, "MSFT", target_profit_price=105, stop_loss_price=95)
+
+    assert index.triggered("AAPL", high=104, low=100) == []
+    assert index.triggered("AAPL", high=105, low=100) == [1]
+    assert index.triggered("AAPL", high=100, low=95) == [1, 3]
+    assert index.triggered("AAPL", high=120, low=80) == [1, 2, 3]
+
+    assert index.remove(1)
+    assert not index.remove(1)
+    assert index.triggered("AAPL", high=120, low=80) == [2, 3]
+    assert index.symbols() == ["AAPL", "MSFT"]
+
+
+def make_bar(symbol: str, high: float, low: float) -> AlpacaBar:
+    return AlpacaBar(
+        symbol,
+        {
+            "t": datetime(2025, 1, 2, 15, 0, tzinfo=timezone.utc),
+            "o": low,
+            "h": high,
+            "l": low,
+            "c": low,
+            "v": 100,
+            "n": 1,
+            "vw": low,
+        },
+    )
+
+
+def test_bars_sell_orders_hitting_their_thresholds(
+    db: Session, alpaca_client: MyAlpacaClient, monkeypatch
+) -> None:
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email="sell-rules@test.com", password="12345678"),
+    )
+    orders = []
+    for symbol, price in (("AAPL", 100.0), ("AAPL", 200.0), ("MSFT", 100.0)):
+        order = Order(symbol=symbol, amount=100, owner_id=user.id)
+        order.buy_submitted(alpaca_order_id=uuid4())
+        order.buy_filled(price, 1.0, datetime(2025, 1, 2, 21, 0))
+        db.add(order)
+        orders.append(order)
+    db.commit()
+
+    sold: list[tuple[str, float]] = []
+
+    def submit_sell_qty_order(symbol, qty, **_kwargs):
+        sold.append((symbol, qty))
+        return make_alpaca_order(
+            uuid4(), AlpacaOrderStatus.ACCEPTED, datetime.now(timezone.utc)
+        )
+
+    monkeypatch.setattr(alpaca_client, "submit_sell_qty_order", submit_sell_qty_order)
+    evaluator = SellRuleEvaluator(lambda: Session(db.get_bind()), alpaca_client)
+    assert evaluator.load() == ["AAPL", "MSFT"]
+
+    # Hits the 105 target of the first AAPL order and the 190 stop of the second
+    asyncio.run(evaluator.on_bar(make_bar("AAPL", high=106, low=101)))
+    assert sold == [("AAPL", 1.0), ("AAPL", 1.0)]
+    asyncio.run(evaluator.on_bar(make_bar("AAPL", high=106, low=101)))
+    assert len(sold) == 2
+
+    for order in orders:
+        db.refresh(order)
+    assert [order.status for order in orders] == [
+        VirtualOrderStatus.SELL_PENDING_NEW,
+        VirtualOrderStatus.SELL_PENDING_NEW,
+        VirtualOrderStatus.BUY_FILLED,
+    ]
+    assert evaluator.load() == ["MSFT"]
+
+
+def test_failed_sell_does_not_stop_the_others(
+    db: Session, alpaca_client: MyAlpacaClient, monkeypatch
+) -> None:
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email="sell-rules-fail@test.com", password="12345678"),
+    )
+    orders = []
+    for symbol in ("AAPL", "MSFT"):
+        order = Order(symbol=symbol, amount=100, owner_id=user.id)
+        order.buy_submitted(alpaca_order_id=uuid4())
+        order.buy_filled(100.0, 1.0, datetime(2025, 1, 2, 21, 0))
+        db.add(order)
+        orders.append(order)
+    db.commit()
+
+    sold: list[str] = []
+
+    def submit_sell_qty_order(symbol, *_args, **_kwargs):
+        if symbol == "AAPL" and "AAPL" not in sold:
+            sold.append(symbol)
+            raise RuntimeError("rejected")
+        sold.append(symbol)
+        return make_alpaca_order(
+            uuid4(), AlpacaOrderStatus.ACCEPTED, datetime.now(timezone.utc)
+        )
+
+    monkeypatch.setattr(alpaca_client, "submit_sell_qty_order", submit_sell_qty_order)
+    evaluator = SellRuleEvaluator(lambda: Session(db.get_bind()), alpaca_client)
+    evaluator.load()
+
+    order_ids = evaluator.evaluate("AAPL", 106, 101) + evaluator.evaluate(
+        "MSFT", 106, 101
+    )
+    evaluator.sell(order_ids)
+    for order in orders:
+        db.refresh(order)
+    assert [order.status for order in orders] == [
+        VirtualOrderStatus.BUY_FILLED,
+        VirtualOrderStatus.SELL_PENDING_NEW,
+    ]
+
+    # The failed order is back in the index, and sold on the next price move
+    asyncio.run(evaluator.on_bar(make_bar("AAPL", high=106, low=101)))
+    db.refresh(orders[0])
+    assert orders[0].status == VirtualOrderStatus.SELL_PENDING_NEW
+    assert sold == ["AAPL", "MSFT", "AAPL"]
@@ -0,0 +1,167 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from sqlmodel import Session
+
+from app.clients.market_clock_cache import ClockSnapshot
+from app.clients.my_alpaca_client import MyAlpacaClient
+from app.crud import crud
+from app.models.order import Order, OrdersSyncSummary, VirtualOrderStatus
+from app.models.user import UserCreate
+from app.trading import ForceSellScheduler, OrderSyncScheduler
+
+NOW = datetime(2025, 1, 2, 18, 0, tzinfo=timezone.utc)
+
+
+def clock(is_open: bool, next_open: datetime) -> ClockSnapshot:
+    return ClockSnapshot(
+        timestamp=NOW,
+        is_open=is_open,
+        next_open=next_open,
+        next_close=NOW + timedelta(hours=3),
+    )
+
+
+def test_next_interval(db: Session, alpaca_client: MyAlpacaClient, monkeypatch) -> None:
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email="scheduler@test.com", password="12345678"),
+    )
+    scheduler = OrderSyncScheduler(lambda: db, alpaca_client)
+    market_open = clock(True, NOW + timedelta(days=1))
+    monkeypatch.setattr(alpaca_client, "get_clock", lambda: market_open)
+
+    assert scheduler.next_interval(db) == scheduler.idle_interval
+
+    # Force sell at 18:10, the market is open
+    filled = Order(symbol="AAPL", amount=100, owner_id=user.id)
+    filled.buy_submitted(alpaca_order_id=uuid4())
+    filled.buy_filled(100.0, 1.0, market_close_at=datetime(2025, 1, 2, 18, 40))
+    db.add(filled)
+    db.commit()
+    assert scheduler.next_interval(db) == scheduler.idle_interval
+    monkeypatch.setattr(
+        alpaca_client,
+        "get_clock",
+        lambda: ClockSnapshot(
+            timestamp=NOW + timedelta(minutes=9, seconds=50),
+            is_open=True,
+            next_open=NOW + timedelta(days=1),
+            next_close=NOW + timedelta(hours=3),
+        ),
+    )
+    assert scheduler.next_interval(db) == 10.0
+
+    # Stuck waiting for Alpaca, or waiting for a fill the sync can't hurry
+    now = (NOW + timedelta(minutes=9, seconds=50)).replace(tzinfo=None)
+    stuck = Order(
+        symbol="MSFT",
+        amount=100,
+        owner_id=user.id,
+        status=VirtualOrderStatus.SELL_PENDING_NEW,
+        status_changed_at=now - timedelta(minutes=10),
+    )
+    accepted = Order(
+        symbol="MSFT",
+        amount=100,
+        owner_id=user.id,
+        status=VirtualOrderStatus.BUY_ACCEPTED,
+        status_changed_at=now,
+    )
+    db.add_all([stuck, accepted])
+    db.commit()
+    assert scheduler.next_interval(db) == 10.0
+
+    pending = Order(
+        symbol="MSFT",
+        amount=100,
+        owner_id=user.id,
+        status=VirtualOrderStatus.SELL_PENDING_NEW,
+        status_changed_at=now - timedelta(minutes=1),
+    )
+    db.add(pending)
+    db.commit()
+    assert scheduler.next_interval(db) == scheduler.fast_interval
+
+    # Closed market: wait for the open, re-reading the clock now and then
+    monkeypatch.setattr(
+        alpaca_client, "get_clock", lambda: clock(False, NOW + timedelta(seconds=90))
+    )
+    assert scheduler.next_interval(db) == 90.0
+    monkeypatch.setattr(
+        alpaca_client, "get_clock", lambda: clock(False, NOW + timedelta(hours=15))
+    )
+    assert scheduler.next_interval(db) == scheduler.max_closed_interval
+
+
+def test_run_reports_duration_and_lag(alpaca_client: MyAlpacaClient) -> None:
+    scheduler = OrderSyncScheduler(lambda: Session(), alpaca_client)
+    calls: list[int] = []
+
+    def run_cycle() -> tuple[OrdersSyncSummary, float]:
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("database is down")
+        # Takes longer than its interval, so the next cycle starts late
+        time.sleep(0.05)
+        summary = OrdersSyncSummary(
+            total=1,
+            synced=1,
+            failed=0,
+            statuses={VirtualOrderStatus.BUY_FILLED: 1},
+            errors={},
+            duration_seconds=0.05,
+        )
+        return summary, 0.01
+
+    scheduler.run_cycle = run_cycle  # type: ignore[method-assign]
+    scheduler.idle_interval = 0.01
+
+    async def run() -> None:
+        scheduler.start()
+        while scheduler.stats().cycles < 4:
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+
+    asyncio.run(run())
+    stats = scheduler.stats()
+    assert stats.cycles >= 4
+    assert stats.failed_cycles == 1
+    assert stats.max_duration_seconds >= 0.05
+    assert 0.03 <= stats.max_lag_seconds < 1
+    assert stats.last_cycle is not None
+    assert stats.last_cycle.synced == 1
+    assert stats.last_cycle.next_interval_seconds == 0.01
+
+
+def test_run_stops_the_cycles_with_the_force_sells(
+    alpaca_client: MyAlpacaClient,
+) -> None:
+    force_sells = ForceSellScheduler(lambda: Session(), alpaca_client)
+    scheduler = OrderSyncScheduler(
+        lambda: Session(), alpaca_client, force_sells=force_sells
+    )
+    cycles_stopped = asyncio.Event()
+
+    async def failing_force_sells() -> None:
+        await asyncio.sleep(0.01)
+        raise RuntimeError("force sells failed")
+
+    async def run_cycles() -> None:
+        try:
+            await asyncio.sleep(10)
+        finally:
+            cycles_stopped.set()
+
+    force_sells.run = failing_force_sells  # type: ignore[method-assign]
+    scheduler._run_cycles = run_cycles  # type: ignore[method-assign]
+
+    async def run() -> bool:
+        with pytest.raises(RuntimeError, match="force sells failed"):
+            await scheduler.run()
+        return cycles_stopped.is_set()
+
+    assert asyncio.run(run())
@@ -0,0 +1,157 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from alpaca.trading.models import TradeUpdate
+from sqlmodel import Session
+
+from app.clients.my_alpaca_client import AlpacaOrderStatus, MyAlpacaClient
+from app.crud import crud
+from app.models.order import Order, VirtualOrderStatus
+from app.models.user import UserCreate
+from app.trading import TradeUpdateConsumer
+from tests.utils.order import make_alpaca_order
+
+NEXT_CLOSE = datetime(2025, 1, 2, 21, 0, tzinfo=timezone.utc)
+
+
+def make_update(order_id, status: AlpacaOrderStatus, **fields) -> TradeUpdate:
+    alpaca_order = make_alpaca_order(order_id, status, datetime.now(timezone.utc))
+    return TradeUpdate(
+        event=status.value,
+        order=alpaca_order.model_copy(update=fields),
+        timestamp=datetime.now(timezone.utc),
+    )
+
+
+def test_trade_updates_move_orders_along(
+    db: Session, alpaca_client: MyAlpacaClient, monkeypatch
+) -> None:
+    monkeypatch.setattr(alpaca_client, "get_next_close", lambda: NEXT_CLOSE)
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email="trade-updates@test.com", password="12345678"),
+    )
+    buy_order_id, sell_order_id = uuid4(), uuid4()
+    order = Order(symbol="AAPL", amount=100, owner_id=user.id)
+    order.buy_submitted(alpaca_order_id=buy_order_id)
+    db.add(order)
+    db.commit()
+
+    filled: list[int | None] = []
+    consumer = TradeUpdateConsumer(
+        lambda: Session(db.get_bind()),
+        alpaca_client,
+        on_buy_filled=lambda o: filled.append(o.id),
+    )
+
+    def push(update: TradeUpdate) -> None:
+        asyncio.run(consumer.on_trade_update(update))
+        db.refresh(order)
+
+    push(make_update(buy_order_id, AlpacaOrderStatus.ACCEPTED))
+    assert order.status == VirtualOrderStatus.BUY_ACCEPTED
+
+    push(
+        make_update(
+            buy_order_id,
+            AlpacaOrderStatus.FILLED,
+            filled_avg_price="100.0",
+            filled_qty="2",
+        )
+    )
+    assert order.status == VirtualOrderStatus.BUY_FILLED
+    assert order.buy_filled_qty == 2.0
+    assert order.target_profit_price == 105.0
+    assert filled == [order.id]
+
+    # A repeated fill is ignored
+    push(make_update(buy_order_id, AlpacaOrderStatus.FILLED, filled_avg_price="1"))
+    assert order.buy_filled_avg_price == 100.0
+
+    with Session(db.get_bind()) as session:
+        sold_order = session.get(Order, order.id)
+        assert sold_order is not None
+        sold_order.sell_submitted(alpaca_order_id=sell_order_id)
+        session.add(sold_order)
+        session.commit()
+    push(
+        make_update(
+            sell_order_id,
+            AlpacaOrderStatus.FILLED,
+            filled_avg_price="106.0",
+            filled_qty="2",
+        )
+    )
+    assert order.status == VirtualOrderStatus.SELL_FILLED
+    assert order.sell_filled_avg_price == 106.0
+    assert filled == [order.id]
+
+    # Orders placed outside the app are skipped
+    assert consumer.apply(make_update(uuid4(), AlpacaOrderStatus.FILLED).order) is None
+
+
+def test_canceled_buy_fails_the_order(
+    db: Session, alpaca_client: MyAlpacaClient
+) -> None:
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email="canceled-buy@test.com", password="12345678"),
+    )
+    buy_order_id = uuid4()
+    order = Order(symbol="AAPL", amount=100, owner_id=user.id)
+    order.buy_submitted(alpaca_order_id=buy_order_id)
+    db.add(order)
+    db.commit()
+
+    consumer = TradeUpdateConsumer(lambda: Session(db.get_bind()), alpaca_client)
+    update = make_update(buy_order_id, AlpacaOrderStatus.CANCELED, filled_qty="0")
+    asyncio.run(consumer.on_trade_update(update))
+    db.refresh(order)
+
+    assert order.status == VirtualOrderStatus.BUY_FAILED
+    assert order.error_message == "Alpaca buy order canceled"
+
+
+def test_reconcile_fetches_orders_older_than_the_listing(
+    db: Session, alpaca_client: MyAlpacaClient, monkeypatch
+) -> None:
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email="reconcile-old@test.com", password="12345678"),
+    )
+    old_id, recent_id = uuid4(), uuid4()
+    old_order = Order(
+        symbol="AAPL",
+        amount=100,
+        owner_id=user.id,
+        created_at=datetime.now(timezone.utc) - timedelta(days=30),
+    )
+    old_order.buy_submitted(alpaca_order_id=old_id)
+    recent_order = Order(symbol="MSFT", amount=100, owner_id=user.id)
+    recent_order.buy_submitted(alpaca_order_id=recent_id)
+    db.add_all([old_order, recent_order])
+    db.commit()
+
+    now = datetime.now(timezone.utc)
+    monkeypatch.setattr(
+        alpaca_client,
+        "get_orders_after",
+        lambda _after: {
+            recent_id: make_alpaca_order(recent_id, AlpacaOrderStatus.ACCEPTED, now)
+        },
+    )
+    fetched = []
+
+    def get_order_by_id(order_id):
+        fetched.append(order_id)
+        return make_alpaca_order(order_id, AlpacaOrderStatus.ACCEPTED, now)
+
+    monkeypatch.setattr(alpaca_client, "get_order_by_id", get_order_by_id)
+    consumer = TradeUpdateConsumer(lambda: Session(db.get_bind()), alpaca_client)
+    asyncio.run(consumer.reconcile())
+
+    assert fetched == [old_id]
+    for order in (old_order, recent_order):
+        db.refresh(order)
+        assert order.status == VirtualOrderStatus.BUY_ACCEPTED
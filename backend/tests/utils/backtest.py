@@ -0,0 +1,27 @@
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from app.market_data import BarWindow, to_datetime64
+
+DAY = date(2024, 1, 2)
+# 9:30 in New York (EST)
+OPEN = datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc)
+
+
+def session(minutes: int, changes: dict[int, tuple[float, float, float]]) -> BarWindow:
+    """Flat bars at 100 from 9:29, `changes` maps a minute after the open to
+    (open, high, low)"""
+    offsets = range(-1, minutes)
+    bars = [changes.get(i, (100.0, 100.5, 99.5)) for i in offsets]
+    return BarWindow(
+        np.array(
+            [to_datetime64(OPEN + timedelta(minutes=i)) for i in offsets],
+            dtype="datetime64[ns]",
+        ),
+        np.array([bar[0] for bar in bars]),
+        np.array([bar[1] for bar in bars]),
+        np.array([bar[2] for bar in bars]),
+        np.array([bar[0] for bar in bars]),
+        np.full(len(bars), 100.0),
+    )
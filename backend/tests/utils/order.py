@@ -0,0 +1,19 @@
+from datetime import datetime
+from uuid import UUID
+
+from app.clients.my_alpaca_client import AlpacaOrder, AlpacaOrderStatus
+
+
+def make_alpaca_order(
+    order_id: UUID, status: AlpacaOrderStatus, submitted_at: datetime
+) -> AlpacaOrder:
+    return AlpacaOrder(
+        id=order_id,
+        client_order_id="",
+        created_at=submitted_at,
+        updated_at=submitted_at,
+        submitted_at=submitted_at,
+        time_in_force="day",
+        status=status,
+        extended_hours=False,
+    )
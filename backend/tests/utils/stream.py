@@ -0,0 +1,48 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Any
+
+from app.clients.my_alpaca_client import AlpacaBar
+
+
+class FakeStream:
+    def __init__(self) -> None:
+        self._handlers: dict[str, dict[str, Any]] = {
+            "bars": {},
+            "quotes": {},
+            "trades": {},
+        }
+        self._running = False
+        self.sent: list[tuple[str, Any]] = []
+        self.stopped = asyncio.Event()
+
+    async def _run_forever(self) -> None:
+        self._running = True
+        await self.stopped.wait()
+
+    async def _send_subscribe_msg(self) -> None:
+        self.sent.append(
+            ("subscribe", {k: sorted(v) for k, v in self._handlers.items() if v})
+        )
+
+    async def _send_unsubscribe_msg(self, channel: str, symbols: list[str]) -> None:
+        self.sent.append(("unsubscribe", {channel: symbols}))
+
+    async def stop_ws(self) -> None:
+        self.stopped.set()
+
+
+def make_bar(symbol: str, close: float) -> AlpacaBar:
+    return AlpacaBar(
+        symbol,
+        {
+            "t": datetime(2025, 1, 2, 15, 0, tzinfo=timezone.utc),
+            "o": close,
+            "h": close,
+            "l": close,
+            "c": close,
+            "v": 100.0,
+            "n": 1,
+            "vw": close,
+        },
+    )
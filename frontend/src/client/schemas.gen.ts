@@ -739,6 +739,6 @@ export const ValidationErrorSchema = {
 
 export const VirtualOrderStatusSchema = {
     type: 'string',
-    enum: ['new', 'buy_pending_new', 'buy_accepted', 'buy_filled', 'sell_pending_new', 'sell_accepted', 'sell_filled', 'sell_failed'],
+    enum: ['new', 'buy_pending_new', 'buy_accepted', 'buy_filled', 'sell_pending_new', 'sell_accepted', 'sell_filled', 'sell_failed', 'buy_failed'],
     title: 'VirtualOrderStatus'
 } as const;
\ No newline at end of file
@@ -135,7 +135,7 @@ export type ValidationError = {
     type: string;
 };
 
-export type VirtualOrderStatus = 'new' | 'buy_pending_new' | 'buy_accepted' | 'buy_filled' | 'sell_pending_new' | 'sell_accepted' | 'sell_filled' | 'sell_failed';
+export type VirtualOrderStatus = 'new' | 'buy_pending_new' | 'buy_accepted' | 'buy_filled' | 'sell_pending_new' | 'sell_accepted' | 'sell_filled' | 'sell_failed' | 'buy_failed';
 
 export type ItemsReadItemsData = {
     limit?: number;
@@ -137,6 +137,7 @@ function OrdersTable() {
       case "sell_filled":
         return <Badge colorPalette="green">{formattedStatus}</Badge>
       case "sell_failed":
+      case "buy_failed":
         return <Badge colorPalette="red">{formattedStatus}</Badge>
       default:
         return <Badge colorPalette="gray">{formattedStatus}</Badge>